@@ -40,7 +40,7 @@ import sys
 import argparse
 import os.path
 from pathlib import Path
-from omniperf_analyze.utils import parser, file_io
+from omniperf_analyze.utils import parser, file_io, self_profile
 
 
 def initialize_run(args, normalization_filter=None):
@@ -64,12 +64,14 @@ def initialize_run(args, normalization_filter=None):
             arch_panel_config = (
                 args.config_dir if single_panel_config else args.config_dir.joinpath(arch)
             )
-            ac.panel_configs = file_io.load_panel_configs(arch_panel_config)
+            with self_profile.stage("load_panel_configs"):
+                ac.panel_configs = file_io.load_panel_configs(arch_panel_config)
 
         # TODO: filter_metrics should/might be one per arch
         # print(ac)
 
-        parser.build_dfs(ac, args.filter_metrics)
+        with self_profile.stage("build_dfs"):
+            parser.build_dfs(ac, args.filter_metrics)
 
         archConfigs[arch] = ac
 
@@ -89,12 +91,13 @@ def initialize_run(args, normalization_filter=None):
         sys.exit(0)
 
     # Use original normalization or user input from GUI
-    if not normalization_filter:
-        for k, v in archConfigs.items():
-            parser.build_metric_value_string(v.dfs, v.dfs_type, args.normal_unit)
-    else:
-        for k, v in archConfigs.items():
-            parser.build_metric_value_string(v.dfs, v.dfs_type, normalization_filter)
+    with self_profile.stage("build_metric_value_string"):
+        if not normalization_filter:
+            for k, v in archConfigs.items():
+                parser.build_metric_value_string(v.dfs, v.dfs_type, args.normal_unit)
+        else:
+            for k, v in archConfigs.items():
+                parser.build_metric_value_string(v.dfs, v.dfs_type, normalization_filter)
 
     runs = OrderedDict()
 
@@ -141,10 +144,12 @@ def run_gui(args, runs):
             runs[args.path[0][0]].filter_dispatch_ids,
             args.time_unit,
             num_results,
+            kernel_verbose=args.kernel_verbose,
         )
-        runs[args.path[0][0]].raw_pmc = file_io.create_df_pmc(
-            args.path[0][0]
-        )  # create mega df
+        with self_profile.stage("create_df_pmc"):
+            runs[args.path[0][0]].raw_pmc = file_io.create_df_pmc(
+                args.path[0][0], args.kernel_verbose
+            )  # create mega df
         parser.load_kernel_top(runs[args.path[0][0]], args.path[0][0])
 
         input_filters = {
@@ -181,29 +186,35 @@ def run_cli(args, runs):
     # After decide to how to manage kernels display patterns, we can revisit it.
     for d in args.path:
         num_results = 10
-        file_io.create_df_kernel_top_stats(
-            d[0],
-            runs[d[0]].filter_gpu_ids,
-            runs[d[0]].filter_dispatch_ids,
-            args.time_unit,
-            num_results,
-        )
-        runs[d[0]].raw_pmc = file_io.create_df_pmc(d[0])  # creates mega dataframe
+        with self_profile.stage("create_df_kernel_top_stats"):
+            file_io.create_df_kernel_top_stats(
+                d[0],
+                runs[d[0]].filter_gpu_ids,
+                runs[d[0]].filter_dispatch_ids,
+                args.time_unit,
+                num_results,
+                kernel_verbose=args.kernel_verbose,
+            )
+        with self_profile.stage("create_df_pmc"):
+            runs[d[0]].raw_pmc = file_io.create_df_pmc(
+                d[0], args.kernel_verbose
+            )  # creates mega dataframe
         is_gui = False
         parser.load_table_data(
             runs[d[0]], d[0], is_gui, args.g, args.verbose
         )  # create the loaded table
-    if args.list_kernels:
-        tty.show_kernels(runs, archConfigs["gfx90a"], output, args.decimal)
-    else:
-        tty.show_all(
-            runs,
-            archConfigs["gfx90a"],
-            output,
-            args.decimal,
-            args.time_unit,
-            args.cols,
-        )
+    with self_profile.stage("tty"):
+        if args.list_kernels:
+            tty.show_kernels(runs, archConfigs["gfx90a"], output, args.decimal)
+        else:
+            tty.show_all(
+                runs,
+                archConfigs["gfx90a"],
+                output,
+                args.decimal,
+                args.time_unit,
+                args.cols,
+            )
 
 
 def analyze(args):
@@ -215,8 +226,12 @@ def analyze(args):
     global output
     output = open(args.output_file, "w+") if args.output_file else sys.stdout
 
+    if args.profile_self is not None:
+        self_profile.enable()
+
     # Initalize archConfigs and runs[]
-    runs = initialize_run(args)
+    with self_profile.stage("initialize_run"):
+        runs = initialize_run(args)
 
     # Filtering
     if args.gpu_kernel:
@@ -248,3 +263,9 @@ def analyze(args):
         run_gui(args, runs)
     else:
         run_cli(args, runs)
+
+    profiler = self_profile.disable()
+    if profiler:
+        profiler.show()
+        if args.profile_self:
+            profiler.write_chrome_trace(args.profile_self)
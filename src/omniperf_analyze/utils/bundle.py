@@ -0,0 +1,203 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+"""
+Export bundles: a whole workload in one compressed, columnar archive.
+
+A bundle is a compressed npz holding every csv table of a workload column by
+column, strings as categorical codes as in the merged pmc store, so loading
+one needs no csv parsing and no pickling. A json manifest records the
+workload, the omniperf version and a sha256 of each table, verified on load.
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from omniperf_analyze.utils import file_io, schema
+
+################################################
+# Global vars
+################################################
+
+BUNDLE_SUFFIX = ".omniperf.npz"
+BUNDLE_FORMAT = 1
+
+
+################################################
+# Helper funcs
+################################################
+def is_bundle(path):
+    return str(path).endswith(BUNDLE_SUFFIX) and os.path.isfile(path)
+
+
+def bundle_name(workload_dir):
+    """
+    Default bundle file name of a workload, e.g. vcopy_mi200.omniperf.npz.
+    """
+    sys_info = pd.read_csv(os.path.join(workload_dir, "sysinfo.csv"))
+    name = sys_info["workload_name"][0]
+    soc = os.path.basename(os.path.normpath(workload_dir))
+    return "{}_{}{}".format(name, soc, BUNDLE_SUFFIX)
+
+
+def encode_table(df, prefix):
+    """
+    Column arrays of a table, keyed by prefix and column position.
+    """
+    arrays = OrderedDict()
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i]
+        key = "{}c{}".format(prefix, i)
+        # NB: not only object, strings may also have pandas' string dtype
+        if not pd.api.types.is_numeric_dtype(values):
+            cat = pd.Categorical(values)
+            arrays[key] = cat.codes
+            arrays["{}s{}".format(prefix, i)] = cat.categories.astype(str).to_numpy(
+                dtype=str
+            )
+        else:
+            arrays[key] = values.to_numpy()
+    return arrays
+
+
+def checksum(arrays):
+    h = hashlib.sha256()
+    for key, values in arrays.items():
+        h.update(key.encode())
+        h.update(np.ascontiguousarray(values).tobytes())
+    return h.hexdigest()
+
+
+def write_bundle(workload_dir, fname, version=""):
+    """
+    Pack every csv table of a workload into bundle fname.
+    Returns the manifest.
+    """
+    arrays = OrderedDict()
+    tables = []
+    for f in sorted(glob.glob(os.path.join(workload_dir, "*.csv"))):
+        try:
+            df = pd.read_csv(f)
+        except pd.errors.EmptyDataError:
+            continue
+        name = os.path.basename(f)[:-4]
+        table = encode_table(df, "t{}".format(len(tables)))
+        tables.append(
+            {
+                "name": name,
+                "columns": [str(c) for c in df.columns],
+                "rows": len(df.index),
+                "sha256": checksum(table),
+            }
+        )
+        arrays.update(table)
+
+    sys_info = pd.read_csv(os.path.join(workload_dir, "sysinfo.csv"))
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "workload_name": str(sys_info["workload_name"][0]),
+        "gpu_soc": str(sys_info["gpu_soc"][0]),
+        "omniperf_version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tables": tables,
+    }
+    arrays["manifest"] = np.array(json.dumps(manifest))
+
+    # Write then rename, so a partial bundle is never picked up
+    tmp = fname + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, fname)
+    return manifest
+
+
+def read_manifest(fname):
+    with np.load(fname, allow_pickle=False) as store:
+        return json.loads(str(store["manifest"]))
+
+
+def read_bundle(fname, names=None):
+    """
+    Load the tables of bundle fname, or only those in names, after checking
+    them against the manifest. Returns the manifest and {name: df}.
+    """
+    dfs = OrderedDict()
+    with np.load(fname, allow_pickle=False) as store:
+        manifest = json.loads(str(store["manifest"]))
+        if manifest["format"] > BUNDLE_FORMAT:
+            raise ValueError(
+                "{} needs a newer omniperf (bundle format {})".format(
+                    fname, manifest["format"]
+                )
+            )
+        for t, table in enumerate(manifest["tables"]):
+            if names is not None and table["name"] not in names:
+                continue
+            prefix = "t{}".format(t)
+            arrays = OrderedDict()
+            data = {}
+            for i in range(len(table["columns"])):
+                key = "{}c{}".format(prefix, i)
+                arrays[key] = values = store[key]
+                if "{}s{}".format(prefix, i) in store.files:
+                    arrays["{}s{}".format(prefix, i)] = store["{}s{}".format(prefix, i)]
+                    values = pd.Categorical.from_codes(
+                        values, arrays["{}s{}".format(prefix, i)].astype(object)
+                    ).to_numpy(dtype=object)
+                data[i] = values
+            if checksum(arrays) != table["sha256"]:
+                raise ValueError(
+                    "{}: checksum mismatch in {}".format(fname, table["name"])
+                )
+            df = pd.DataFrame(data, copy=False)
+            df.columns = table["columns"]
+            dfs[table["name"]] = df
+    return manifest, dfs
+
+
+def extract_bundle(fname, dest):
+    """
+    Write the tables of bundle fname as csv files of workload dir dest,
+    along with the merged pmc store analyze loads instead of the csv files.
+    """
+    manifest, dfs = read_bundle(fname)
+    os.makedirs(dest, exist_ok=True)
+    for name, df in dfs.items():
+        df.to_csv(os.path.join(dest, name + ".csv"), index=False)
+
+    passes = OrderedDict(
+        (name, df)
+        for name, df in dfs.items()
+        if name.startswith("SQ") or name == schema.pmc_perf_file_prefix
+    )
+    if passes:
+        final_df, issues = file_io.join_pmc_passes(passes)
+        file_io.write_pmc_store(dest, final_df, passes.keys(), issues)
+    return manifest
@@ -21,6 +21,8 @@
 ################################################################################
 
 import os
+import json
+import numpy as np
 import pandas as pd
 import re
 import yaml
@@ -28,7 +30,7 @@ import yaml
 import collections
 from collections import OrderedDict
 from pathlib import Path
-from omniperf_analyze.utils import schema
+from omniperf_analyze.utils import schema, kernel_name
 
 # TODO: use pandas chunksize or dask to read really large csv file
 # from dask import dataframe as dd
@@ -51,6 +53,15 @@ supported_arch = {"gfx906": "mi50", "gfx908": "mi100", "gfx90a": "mi200"}
 
 time_units = {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}
 
+# Dispatches are matched across pass outputs on these columns
+DISPATCH_KEYS = ["Index", "KernelName", "gpu-id"]
+
+# All pass outputs of a workload, joined, written by profile mode
+MERGED_PMC_FILE = "pmc_merged.npz"
+
+# Sampled dispatches and their weights, written by profile --sample
+SAMPLING_FILE = "sampling.csv"
+
 
 def load_sys_info(f):
     """
@@ -111,13 +122,21 @@ def create_df_kernel_top_stats(
     time_unit,
     num_results,
     sortby="sum",
+    kernel_verbose=kernel_name.DISABLED_LEVEL,
 ):
     """
     Create top stats info by grouping kernels with user's filters.
+    Kernels are grouped by their names shortened to kernel_verbose.
     """
     # NB:
     #   We even don't have to create pmc_kernel_top.csv explictly
-    df = pd.read_csv(os.path.join(raw_data_dir, schema.pmc_perf_file_prefix + ".csv"))
+    fname = os.path.join(raw_data_dir, schema.pmc_perf_file_prefix + ".csv")
+    store = None if os.path.isfile(fname) else read_merged_pmc(raw_data_dir, False)
+    if store is not None:
+        # Profiling in progress, time dispatches with the passes streamed so far
+        df = store[schema.pmc_perf_file_prefix].copy()
+    else:
+        df = pd.read_csv(fname)
 
     # The logic below for filters are the same as in parser.apply_filters(),
     # which can be merged together if need it.
@@ -133,6 +152,11 @@ def create_df_kernel_top_stats(
         else:
             df = df.loc[df["Index"].astype(str).isin(filter_dispatch_ids)]
 
+    weights = load_sample_weights(raw_data_dir, df)
+    if kernel_verbose < kernel_name.DISABLED_LEVEL:
+        df = kernel_name.kernel_name_shortener(df.copy(), kernel_verbose)
+        kernel_name.default_cache().save()
+
     # First, create a dispatches file used to populate global vars
     dispatch_info = df.loc[:, ["Index", "KernelName", "gpu-id"]]
     dispatch_info.to_csv(os.path.join(raw_data_dir, "pmc_dispatch_info.csv"), index=False)
@@ -147,6 +171,21 @@ def create_df_kernel_top_stats(
         {"ExeTime": ["count", "sum", "mean", "median"]}
     )
 
+    if weights is not None:
+        # Sampled workload: rescale to all dispatches, the median stays sampled
+        weighted = (
+            pd.concat(
+                [df["KernelName"], weights, time_stats["ExeTime"] * weights],
+                keys=["KernelName", "Weight", "ExeTime"],
+                axis=1,
+            )
+            .groupby(by=["KernelName"])[["Weight", "ExeTime"]]
+            .sum()
+        )
+        grouped[("ExeTime", "count")] = weighted["Weight"].round().astype(int)
+        grouped[("ExeTime", "sum")] = weighted["ExeTime"]
+        grouped[("ExeTime", "mean")] = weighted["ExeTime"] / weighted["Weight"]
+
     time_unit_str = "(" + time_unit + ")"
     grouped.columns = [
         x.capitalize() + time_unit_str if x != "count" else x.capitalize()
@@ -180,26 +219,211 @@ def create_df_kernel_top_stats(
         grouped.to_csv(os.path.join(raw_data_dir, "pmc_kernel_top.csv"), index=False)
 
 
-def create_df_pmc(raw_data_dir):
+def dispatch_index(df, keys=DISPATCH_KEYS):
     """
-    Load all raw pmc counters and join into one df.
+    Hash index of the dispatches of a pass output. Repeated keys, if any, are
+    told apart by their occurrence.
     """
-    dfs = []
-    coll_levels = []
+    arrays = [df[k] for k in keys]
+    arrays.append(df.groupby(keys, sort=False, dropna=False).cumcount())
+    return pd.MultiIndex.from_arrays(arrays)
 
-    df = pd.DataFrame()
-    new_df = pd.DataFrame()
+
+def load_pmc_passes(raw_data_dir):
+    """
+    Load the raw pmc counters of each pass output into one df per file.
+    """
+    dfs = OrderedDict()
     for root, dirs, files in os.walk(raw_data_dir):
         for f in files:
-            # print("file ", f)
             if (f.endswith(".csv") and f.startswith("SQ")) or (
                 f == schema.pmc_perf_file_prefix + ".csv"
             ):
-                tmp_df = pd.read_csv(os.path.join(root, f))
-                dfs.append(tmp_df)
-                coll_levels.append(f[:-4])
-    final_df = pd.concat(dfs, keys=coll_levels, axis=1, copy=False)
-    # TODO: join instead of concat!
+                dfs[f[:-4]] = pd.read_csv(os.path.join(root, f))
+    return dfs
+
+
+def join_pmc_passes(dfs):
+    """
+    Join the pass outputs into one df, matching dispatches on DISPATCH_KEYS
+    rather than by row position. Rows follow pmc_perf. Returns the df and,
+    per pass, the number of dispatches missing (filled with NaN), extra
+    (dropped) and out of order.
+    """
+    ref = (
+        schema.pmc_perf_file_prefix
+        if schema.pmc_perf_file_prefix in dfs
+        else next(iter(dfs))
+    )
+    # NB: older rocprof versions don't write gpu-id
+    keys = [k for k in DISPATCH_KEYS if all(k in df.columns for df in dfs.values())]
+    ref_keys = dfs[ref][keys]
+    ref_index = None
+
+    aligned = []
+    issues = OrderedDict()
+    for name, df in dfs.items():
+        # Fast path: same dispatches in the same order
+        if name == ref or not keys or df[keys].equals(ref_keys):
+            aligned.append(df)
+            continue
+
+        if ref_index is None:
+            ref_index = dispatch_index(dfs[ref], keys)
+        index = dispatch_index(df, keys)
+
+        common = index.intersection(ref_index, sort=False)
+        issues[name] = {
+            "missing": len(ref_index) - len(common),
+            "extra": len(index) - len(common),
+            "misaligned": int(
+                (ref_index.get_indexer(common) != index.get_indexer(common)).sum()
+            ),
+        }
+        df = df.set_axis(index, axis=0).reindex(ref_index)
+        aligned.append(df.reset_index(drop=True))
+
+    final_df = pd.concat(aligned, keys=list(dfs.keys()), axis=1, copy=False)
+    return final_df, issues
+
+
+def report_pmc_issues(issues):
+    for name, issue in issues.items():
+        print(
+            "WARNING: {}.csv doesn't match the dispatches of {}.csv: {} missing, "
+            "{} extra, {} out of order".format(
+                name,
+                schema.pmc_perf_file_prefix,
+                issue["missing"],
+                issue["extra"],
+                issue["misaligned"],
+            )
+        )
+
+
+def pmc_sources(raw_data_dir, names):
+    """
+    Size and mtime of the pass outputs, to tell if a merged store is stale.
+    """
+    sources = {}
+    for name in names:
+        st = os.stat(os.path.join(raw_data_dir, name + ".csv"))
+        sources[name] = [st.st_size, st.st_mtime_ns]
+    return sources
+
+
+def write_pmc_store(raw_data_dir, final_df, sources, issues, pending=None, compress=True):
+    """
+    Save joined pass outputs in one store, loaded by create_df_pmc() instead of
+    the csv files while the sources are unchanged. Strings are stored as
+    categorical codes, so no pickling is involved. Passes still being profiled,
+    if any, are listed in pending.
+    """
+    arrays = {}
+    columns = []
+    for i, (level, column) in enumerate(final_df.columns):
+        values = final_df.iloc[:, i]
+        # NB: not only object, strings may also have pandas' string dtype
+        if not pd.api.types.is_numeric_dtype(values):
+            cat = pd.Categorical(values)
+            arrays["c{}".format(i)] = cat.codes
+            arrays["s{}".format(i)] = cat.categories.astype(str).to_numpy(dtype=str)
+        else:
+            arrays["c{}".format(i)] = values.to_numpy()
+        columns.append([level, column])
+    meta = {
+        "columns": columns,
+        "sources": pmc_sources(raw_data_dir, sources),
+        "issues": issues,
+        "pending": list(pending or []),
+    }
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    # Write then rename, so a partial store is never picked up
+    tmp = os.path.join(raw_data_dir, "tmp_" + MERGED_PMC_FILE)
+    with open(tmp, "wb") as f:
+        (np.savez_compressed if compress else np.savez)(f, **arrays)
+    os.replace(tmp, os.path.join(raw_data_dir, MERGED_PMC_FILE))
+
+
+def write_merged_pmc(raw_data_dir):
+    """
+    Join all pass outputs of a workload and save them in one compressed store.
+    """
+    dfs = load_pmc_passes(raw_data_dir)
+    if not dfs:
+        return None
+    final_df, issues = join_pmc_passes(dfs)
+    report_pmc_issues(issues)
+    write_pmc_store(raw_data_dir, final_df, dfs.keys(), issues)
+    return final_df
+
+
+def read_merged_pmc(raw_data_dir, warn=True):
+    """
+    Load the merged store of a workload, or None if missing or stale.
+    """
+    fname = os.path.join(raw_data_dir, MERGED_PMC_FILE)
+    if not os.path.isfile(fname):
+        return None
+    with np.load(fname, allow_pickle=False) as store:
+        meta = json.loads(str(store["meta"]))
+        try:
+            if pmc_sources(raw_data_dir, meta["sources"].keys()) != meta["sources"]:
+                return None
+        except FileNotFoundError:
+            return None
+        data = {}
+        for i in range(len(meta["columns"])):
+            values = store["c{}".format(i)]
+            if "s{}".format(i) in store.files:
+                values = pd.Categorical.from_codes(
+                    values, store["s{}".format(i)].astype(object)
+                ).to_numpy(dtype=object)
+            data[i] = values
+    if warn and meta.get("pending"):
+        # Streamed while profiling (profile --stream)
+        print(
+            "WARNING: Partial results, profiling of {} is still in progress".format(
+                ", ".join(meta["pending"])
+            )
+        )
+    final_df = pd.DataFrame(data, copy=False)
+    final_df.columns = pd.MultiIndex.from_tuples([tuple(c) for c in meta["columns"]])
+    return final_df
+
+
+def load_sample_weights(raw_data_dir, df):
+    """
+    Weights of the dispatches of df (pmc_perf) if the workload was sampled
+    (profile --sample), else None.
+    """
+    fname = os.path.join(raw_data_dir, SAMPLING_FILE)
+    if not os.path.isfile(fname):
+        return None
+    weights = pd.read_csv(fname, usecols=["Index", "Weight"])
+    weights = weights.drop_duplicates("Index").set_index("Index")["Weight"]
+    return df["Index"].map(weights).fillna(1.0).rename("Weight")
+
+
+def create_df_pmc(raw_data_dir, kernel_verbose=kernel_name.DISABLED_LEVEL):
+    """
+    Load all raw pmc counters and join into one df, with KernelNames
+    shortened to kernel_verbose.
+    """
+    final_df = read_merged_pmc(raw_data_dir)
+    if final_df is None:
+        final_df, issues = join_pmc_passes(load_pmc_passes(raw_data_dir))
+        report_pmc_issues(issues)
+
+    weights = load_sample_weights(raw_data_dir, final_df[schema.pmc_perf_file_prefix])
+    if weights is not None:
+        final_df[(schema.sampling_prefix, "Weight")] = weights
+
+    if kernel_verbose < kernel_name.DISABLED_LEVEL:
+        key = (schema.pmc_perf_file_prefix, "KernelName")
+        final_df[key] = kernel_name.shorten_names(final_df[key], kernel_verbose)
+        kernel_name.default_cache().save()
 
     # print("pmc_raw_data final_df ", final_df.info())
     return final_df
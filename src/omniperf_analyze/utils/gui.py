@@ -23,7 +23,6 @@
 from selectors import EpollSelector
 import sys
 import copy
-from matplotlib.axis import XAxis
 import pandas as pd
 from dash.dash_table import FormatTemplate
 from dash.dash_table.Format import Format, Scheme, Symbol
@@ -349,7 +348,9 @@ def build_layout(
         base_data = initialize_run(args, norm_filt)  # Re-initalize everything
         panel_configs = copy.deepcopy(archConfigs.panel_configs)
         # Generate original raw df
-        base_data[base_run].raw_pmc = file_io.create_df_pmc(path_to_dir)
+        base_data[base_run].raw_pmc = file_io.create_df_pmc(
+            path_to_dir, args.kernel_verbose
+        )
         if verbose >= 1:
             print("disp-filter is ", disp_filt)
             print("kernel-filter is ", kernel_filter)
@@ -365,6 +366,7 @@ def build_layout(
             base_data[base_run].filter_dispatch_ids,
             time_unit,
             num_results,
+            kernel_verbose=args.kernel_verbose,
         )
         is_gui = True
         # Only display basic metrics if no filters are applied
@@ -0,0 +1,216 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+"""
+Kernel name shortening, shared by database --import and analyze.
+
+Templated C++ kernel names (Kokkos, rocBLAS, ...) are long and repeated over
+thousands of dispatches and many workloads. Names are shortened once per
+unique (name, level), and the results are kept in an on-disk cache reused by
+later runs.
+"""
+
+import os
+import re
+import json
+import tempfile
+import threading
+
+################################################
+# Global vars
+################################################
+
+# Verbose level from which names are left untouched
+DISABLED_LEVEL = 5
+
+CACHE_ENV = "OMNIPERF_KERNEL_NAME_CACHE"
+CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join("~", ".cache")),
+    "omniperf",
+    "kernel_names.json",
+)
+
+# works for name Kokkos::namespace::init_lock_array_kernel_threadid(int) [clone .kd]
+NAMES_AND_ARGS = re.compile(r"(?P<name>[( )A-Za-z0-9_]+)([ ,*<>()]+)(::)?")
+# Works for first case  '__amd_rocclr_fillBuffer.kd'
+FIRST_CASE = re.compile(r"([^\s]+)(.kd)")
+MOD_NAME_AND_ARGS = re.compile(r"(?P<name>[( )A-Za-z0-9_]+)([ ,*<>()]*)")
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+################################################
+# Helper funcs
+################################################
+def shorten_name(original_name, level):
+    """
+    Shorten a single kernel name to level nested template/argument levels.
+    """
+    new_name = ""
+    if NAMES_AND_ARGS.search(original_name):
+        matches = NAMES_AND_ARGS.findall(original_name)
+    else:
+        # remove .kd and then parse through original regex
+        first = FIRST_CASE.search(original_name)
+        if first is None:
+            return original_name
+        matches = MOD_NAME_AND_ARGS.findall(first.group(1))
+
+    current_level = 0
+    for name in matches:
+        ##can cause errors if a function name or argument is equal to 'clone'
+        if name[0] == "clone":
+            continue
+        if len(name) == 3:
+            if name[2] == "::":
+                continue
+
+        if current_level < level:
+            new_name += name[0]
+        # closing '>' is to be taken account by the while loop
+        if name[1].count(">") == 0:
+            if current_level < level:
+                if not (current_level == level - 1 and name[1].count("<") > 0):
+                    new_name += name[1]
+            current_level += name[1].count("<")
+
+        curr_index = 0
+        # cases include '>'  '> >, ' have to go in depth here to not lose account of commas and current level
+        while name[1].count(">") > 0 and curr_index < len(name[1]):
+            if current_level < level:
+                new_name += name[1][curr_index:]
+                current_level -= name[1][curr_index:].count(">")
+                curr_index = len(name[1])
+            elif name[1][curr_index] == (">"):
+                current_level -= 1
+            curr_index += 1
+
+    return new_name if new_name else original_name
+
+
+class NameCache:
+    """
+    Memo of shortened names keyed by (name, level), persisted as json.
+    Entries are only ever added, so concurrent writers merge their additions
+    with what is on disk and the last rename wins without losing entries.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = {}
+        self.added = {}
+        self.lock = threading.Lock()
+        if path:
+            self.names = self.read()
+
+    def read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        names = {}
+        for level, entries in data.items():
+            for name, short in entries.items():
+                names[(name, int(level))] = short
+        return names
+
+    def lookup(self, names, level):
+        """
+        Return a {name: short name} mapping for an iterable of unique names.
+        """
+        mapping = {}
+        for name in names:
+            short = self.names.get((name, level))
+            if short is None:
+                short = shorten_name(name, level)
+                with self.lock:
+                    self.names[(name, level)] = short
+                    self.added[(name, level)] = short
+            mapping[name] = short
+        return mapping
+
+    def save(self):
+        """
+        Merge names shortened since the last save into the cache file.
+        Failing to write (e.g. read-only home) only costs a later recompute.
+        """
+        with self.lock:
+            if not self.path or not self.added:
+                return
+            merged = self.read()
+            merged.update(self.added)
+            data = {}
+            for (name, level), short in merged.items():
+                data.setdefault(str(level), {})[name] = short
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                return
+            self.added = {}
+
+
+def default_cache():
+    """
+    Process wide cache backed by $OMNIPERF_KERNEL_NAME_CACHE, or by
+    kernel_names.json in the user cache dir. Setting it empty disables the file.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            path = os.environ.get(CACHE_ENV, os.path.expanduser(CACHE_FILE))
+            _default_cache = NameCache(path if path else None)
+        return _default_cache
+
+
+def shorten_names(names, level, cache=None):
+    """
+    Return a copy of the names series shortened to level. Only unique names
+    are looked up, then mapped back over all rows.
+    """
+    cache = cache if cache is not None else default_cache()
+    mapping = cache.lookup([n for n in names.unique() if isinstance(n, str)], level)
+    short = names.map(mapping)
+    return short.where(short.notna(), names)
+
+
+def kernel_name_shortener(df, level, cache=None):
+    """
+    Shorten the KernelName (or Name) column of df in place.
+    """
+    if level >= DISABLED_LEVEL:
+        return df
+
+    columnName = ""
+    if "KernelName" in df:
+        columnName = "KernelName"
+    if "Name" in df:
+        columnName = "Name"
+    if columnName:
+        df[columnName] = shorten_names(df[columnName], level, cache)
+    return df
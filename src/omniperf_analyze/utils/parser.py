@@ -25,11 +25,10 @@ import sys
 import astunparse
 import re
 import os
-from matplotlib.pyplot import axis
 import pandas as pd
 import numpy as np
 from tabulate import tabulate
-from omniperf_analyze.utils import schema
+from omniperf_analyze.utils import schema, self_profile
 
 # ------------------------------------------------------------------------------
 # Internal global definitions
@@ -44,6 +43,10 @@ from omniperf_analyze.utils import schema
 # 001 is ID of pmc_kernel_top.csv table
 pmc_kernel_top_table_id = 1
 
+# Per dispatch weights of a sampled workload (profile --sample), set by
+# eval_metric() for AVG to rescale to all dispatches
+sample_weights = None
+
 # Build-in $denom defined in mongodb query:
 #       "denom": {
 #              "$switch" : {
@@ -120,9 +123,15 @@ def to_max(*args):
 def to_avg(a):
     if str(type(a)) == "<class 'NoneType'>":
         return np.nan
+    elif isinstance(a, (int, float, np.number)):
+        # e.g. a constant metric with $denom = 1 (per_kernel)
+        return a
     elif a.empty:
         return np.nan
     elif isinstance(a, pd.core.series.Series):
+        if sample_weights is not None:
+            w = sample_weights.reindex(a.index)[a.notna()]
+            return (a[a.notna()] * w).sum() / w.sum()
         return a.mean()
     else:
         raise Exception("to_avg: unsupported type.")
@@ -460,6 +469,9 @@ def eval_metric(dfs, dfs_type, sys_info, soc_spec, raw_pmc_df, debug):
     """
     Execute the expr string for each metric in the df.
     """
+    global sample_weights
+    sampling = raw_pmc_df.get(schema.sampling_prefix)
+    sample_weights = sampling["Weight"] if sampling is not None else None
 
     # NB:
     #  Following with Omniperf 0.2.0, we are using HW spec from sys_info instead.
@@ -498,9 +510,12 @@ def eval_metric(dfs, dfs_type, sys_info, soc_spec, raw_pmc_df, debug):
 
     # Hmmm... apply + lambda should just work
     # df['Value'] = df['Value'].apply(lambda s: eval(compile(str(s), '<string>', 'eval')))
+    profiler = self_profile.get_profiler()
     for id, df in dfs.items():
         if dfs_type[id] == "metric_table":
             for idx, row in df.iterrows():
+                if profiler:
+                    metric_start = profiler.now()
                 for expr in df.columns:
                     if expr in schema.supported_field:
                         if expr.lower() != "alias":
@@ -591,6 +606,9 @@ def eval_metric(dfs, dfs_type, sys_info, soc_spec, raw_pmc_df, debug):
                                 # as string but not nubmer if there is NONE
                                 row[expr] = ""
 
+                if profiler:
+                    profiler.add_metric(id, idx, row.iloc[0], metric_start)
+
             # print(tabulate(df, headers='keys', tablefmt='fancy_grid'))
 
 
@@ -703,16 +721,27 @@ def load_table_data(workload, dir, is_gui, debug, verbose):
     """
     load_kernel_top(workload, dir)
 
-    eval_metric(
-        workload.dfs,
-        workload.dfs_type,
-        workload.sys_info.iloc[0],
-        workload.soc_spec,
-        apply_filters(workload, is_gui, debug),
-        debug,
-    )
+    with self_profile.stage("apply_filters"):
+        filtered_pmc = apply_filters(workload, is_gui, debug)
+
+    with self_profile.stage("eval_metric"):
+        eval_metric(
+            workload.dfs,
+            workload.dfs_type,
+            workload.sys_info.iloc[0],
+            workload.soc_spec,
+            filtered_pmc,
+            debug,
+        )
+
+    with self_profile.stage("save_analysis"):
+        save_analysis(workload, dir, verbose)
 
-    # Save workload
+
+def save_analysis(workload, dir, verbose):
+    """
+    Save all evaluated tables of the workload to dir/saved_analysis.
+    """
     name = "saved_analysis"
     out_path = os.path.join(dir, name)
     try:
@@ -732,7 +761,7 @@ def build_comparable_columns(time_unit):
     """
     Build comparable columns/headers for display
     """
-    comparable_columns = schema.supported_field
+    comparable_columns = list(schema.supported_field)
     top_stat_base = ["Count", "Sum", "Mean", "Median"]
 
     for h in top_stat_base:
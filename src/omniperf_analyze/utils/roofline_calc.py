@@ -28,11 +28,8 @@ import sys
 from pathlib import Path
 
 import numpy
-import matplotlib.pyplot as plt
-from matplotlib.pyplot import get, text
 from math import log, pi, sqrt
 import pandas as pd
-import pylab
 
 from dataclasses import dataclass
 import csv
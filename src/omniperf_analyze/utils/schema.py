@@ -106,3 +106,6 @@ supported_field = [
 
 # The prefix of raw pmc_perf.csv
 pmc_perf_file_prefix = "pmc_perf"
+
+# The prefix of the dispatch weights of a sampled workload in the raw pmc df
+sampling_prefix = "sampling"
@@ -0,0 +1,232 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+"""
+Self instrumentation of analyze mode (--profile-self).
+
+Stages are wrapped with stage(name). Nothing is recorded until enable() is
+called, so stage() hands back a shared no-op context manager and the cost of
+a disabled build is a single global lookup per call site.
+"""
+
+import os
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+from tabulate import tabulate
+
+_NULL_STAGE = nullcontext()
+_profiler = None
+
+# Number of slowest metrics listed in the summary table
+TOP_METRICS = 10
+
+
+def _rss_bytes():
+    """
+    Current resident set size, or None if the platform doesn't expose it.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SelfProfiler:
+    """
+    Record wall time, tracemalloc peak and RSS of nested analyze stages, plus
+    the evaluation time of every single metric.
+    """
+
+    def __init__(self, trace_memory=True):
+        # NB: without reset_peak() (python < 3.9) the peak of a stage can't be
+        #     told from earlier ones, leave it out rather than report those
+        self.trace_memory = trace_memory and hasattr(tracemalloc, "reset_peak")
+        self.origin = time.perf_counter()
+        self.events = []  # (name, category, start_s, duration_s, args)
+        self.metrics = {}  # metric key -> accumulated seconds
+        self._stack = []  # peak memory seen so far by each open stage
+
+    def now(self):
+        return time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            # Fold the peak so far into the enclosing stage before resetting it
+            # for this one
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._stack:
+                self._stack[-1] = max(self._stack[-1], peak)
+            tracemalloc.reset_peak()
+        self._stack.append(0)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            peak = self._stack.pop()
+            args = {"depth": len(self._stack)}
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1] = max(self._stack[-1], peak)
+                args["peak_mem_bytes"] = peak
+            rss = _rss_bytes()
+            if rss is not None:
+                args["rss_bytes"] = rss
+            self.events.append((name, "stage", start, duration, args))
+
+    def add_metric(self, table_id, metric_id, metric_name, start):
+        """
+        Record a metric evaluated since start (taken from now()).
+        """
+        duration = time.perf_counter() - start
+        key = "{} {}".format(metric_id, metric_name)
+        self.metrics[key] = self.metrics.get(key, 0.0) + duration
+        self.events.append((key, "metric", start, duration, {"table": str(table_id)}))
+
+    def summary(self):
+        """
+        Per stage totals in the order stages were first entered.
+        """
+        stages = {}
+        for name, cat, start, duration, args in sorted(self.events, key=lambda e: e[2]):
+            if cat != "stage":
+                continue
+            s = stages.setdefault(
+                name,
+                {"calls": 0, "time_s": 0.0, "peak_mem_bytes": 0, "rss_bytes": 0},
+            )
+            s["calls"] += 1
+            s["time_s"] += duration
+            s["peak_mem_bytes"] = max(s["peak_mem_bytes"], args.get("peak_mem_bytes", 0))
+            s["rss_bytes"] = max(s["rss_bytes"], args.get("rss_bytes", 0))
+        return stages
+
+    def show(self, output=None):
+        output = output if output else sys.stdout
+        to_mb = lambda b: b / (1024 * 1024)
+        rows = [
+            [
+                name,
+                s["calls"],
+                s["time_s"] * 1000,
+                to_mb(s["peak_mem_bytes"]) if self.trace_memory else "",
+                to_mb(s["rss_bytes"]),
+            ]
+            for name, s in self.summary().items()
+        ]
+        print("\n" + "-" * 80, file=output)
+        print("Omniperf analyze self profile", file=output)
+        print(
+            tabulate(
+                rows,
+                headers=["Stage", "Calls", "Time(ms)", "Peak Mem(MB)", "RSS(MB)"],
+                tablefmt="fancy_grid",
+                floatfmt=".2f",
+            ),
+            file=output,
+        )
+
+        if self.metrics:
+            slowest = sorted(self.metrics.items(), key=lambda m: m[1], reverse=True)
+            print(
+                tabulate(
+                    [[k, v * 1000] for k, v in slowest[:TOP_METRICS]],
+                    headers=[
+                        "Slowest metrics ({} evaluated)".format(len(self.metrics)),
+                        "Time(ms)",
+                    ],
+                    tablefmt="fancy_grid",
+                    floatfmt=".3f",
+                ),
+                file=output,
+            )
+
+    def write_chrome_trace(self, path):
+        """
+        Dump all events in Chrome trace format (chrome://tracing, Perfetto).
+        """
+        pid = os.getpid()
+        trace = []
+        for name, cat, start, duration, args in self.events:
+            trace.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": args,
+                }
+            )
+            if "rss_bytes" in args:
+                trace.append(
+                    {
+                        "name": "RSS(MB)",
+                        "ph": "C",
+                        "ts": (start + duration - self.origin) * 1e6,
+                        "pid": pid,
+                        "args": {"rss": args["rss_bytes"] / (1024 * 1024)},
+                    }
+                )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        print("Self profile trace written to {}".format(path))
+
+
+def enable(trace_memory=True):
+    global _profiler
+    _profiler = SelfProfiler(trace_memory)
+    if _profiler.trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _profiler
+
+
+def disable():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler and profiler.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler
+
+
+def get_profiler():
+    """
+    Return the active profiler, or None when --profile-self isn't in use.
+    """
+    return _profiler
+
+
+def stage(name):
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name)
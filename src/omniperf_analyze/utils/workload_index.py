@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+"""
+Index of many workload directories, for lookups across all of them.
+
+Each workload is scanned once for its sysinfo fields, the duration stats of
+each kernel and its System Speed-of-Light metrics. The index is a SQLite
+file, refreshed incrementally: only workloads whose directory changed since
+the last scan are read again.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from omniperf_analyze.utils import parser, file_io, schema
+
+################################################
+# Global vars
+################################################
+
+DEFAULT_INDEX = "omniperf_index.db"
+SOL_PANEL = "2"  # panel 200, System Speed-of-Light
+SOL_TABLE = 201
+NORMAL_UNIT = "per_wave"
+TIME_UNIT = "ns"
+
+# sysinfo fields kept as columns, the whole row is kept as json too
+SYSINFO_FIELDS = ["workload_name", "gpu_soc", "name", "host_name", "date"]
+KERNEL_COLUMNS = ["KernelName", "Count", "Sum(ns)", "Mean(ns)", "Median(ns)", "Pct"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workloads (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,
+    mtime REAL,
+    workload_name TEXT,
+    gpu_soc TEXT,
+    name TEXT,
+    host_name TEXT,
+    date TEXT,
+    sysinfo TEXT
+);
+CREATE TABLE IF NOT EXISTS kernels (
+    workload INTEGER,
+    kernel TEXT,
+    count INTEGER,
+    sum_ns REAL,
+    mean_ns REAL,
+    median_ns REAL,
+    pct REAL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    workload INTEGER,
+    metric TEXT,
+    value REAL,
+    unit TEXT,
+    peak REAL,
+    pop REAL
+);
+CREATE INDEX IF NOT EXISTS kernels_kernel ON kernels (kernel, workload);
+CREATE INDEX IF NOT EXISTS metrics_metric ON metrics (metric, workload);
+"""
+
+KERNEL_QUERY = """
+SELECT w.path, w.workload_name, w.gpu_soc, k.kernel, k.count,
+       k.sum_ns, k.mean_ns, k.median_ns, k.pct
+FROM kernels k JOIN workloads w ON w.id = k.workload
+WHERE k.kernel GLOB ?
+ORDER BY w.mtime, w.path, k.kernel
+"""
+
+METRIC_QUERY = """
+SELECT w.path, w.workload_name, w.gpu_soc, m.metric, m.value, m.unit, m.peak, m.pop
+FROM metrics m JOIN workloads w ON w.id = m.workload
+WHERE m.metric GLOB ?
+ORDER BY w.mtime, w.path, m.metric
+"""
+
+
+################################################
+# Helper funcs
+################################################
+def find_workloads(roots):
+    """
+    Workload directories, holding sysinfo.csv and pmc_perf.csv, under roots.
+    """
+    workloads = []
+    for root in roots:
+        for dir, subdirs, files in os.walk(root):
+            if "sysinfo.csv" in files and "pmc_perf.csv" in files:
+                workloads.append(os.path.abspath(dir))
+                subdirs.clear()
+            else:
+                subdirs.sort()
+    return sorted(workloads)
+
+
+def signature(path):
+    """
+    Latest mtime of a workload dir and of its inputs. Files being added or
+    removed change the dir, files rewritten in place only change themselves.
+    """
+    return max(
+        os.stat(os.path.join(path, f)).st_mtime
+        for f in ["", "sysinfo.csv", schema.pmc_perf_file_prefix + ".csv"]
+    )
+
+
+def to_builtin(value):
+    # NB: sqlite3 only binds builtin types, not numpy scalars
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def to_number(value):
+    """
+    Evaluated metric value as a float, None if it couldn't be evaluated.
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+
+def scan_workload(path):
+    """
+    Read the index rows of one workload. Runs inside pool workers.
+    """
+    sys_info = file_io.load_sys_info(Path(path, "sysinfo.csv"))
+    arch = sys_info.iloc[0]["gpu_soc"]
+    configs = Path(__file__).resolve().parent.parent / "configs"
+    soc_spec_df = file_io.load_soc_params(configs.parent.parent / "soc_params")
+
+    # NB: the top stats csv is written in the workload dir, as analyze does
+    file_io.create_df_kernel_top_stats(path, None, None, TIME_UNIT, sys.maxsize)
+    top = pd.read_csv(os.path.join(path, "pmc_kernel_top.csv"))
+    top = top[KERNEL_COLUMNS].astype({"Count": int})
+    kernels = [
+        tuple(to_builtin(v) for v in row)
+        for row in top.itertuples(index=False, name=None)
+    ]
+
+    ac = schema.ArchConfig()
+    ac.panel_configs = file_io.load_panel_configs(configs.joinpath(arch))
+    parser.build_dfs(ac, [SOL_PANEL])
+    parser.build_metric_value_string(ac.dfs, ac.dfs_type, NORMAL_UNIT)
+    # NB: eval_metric() writes results through iterrows() rows, which only
+    #     reach a frame held in one block. Copy after building the strings, as
+    #     analyze does, to consolidate the columns they replaced.
+    dfs = copy.deepcopy(ac.dfs)
+    raw_pmc = file_io.create_df_pmc(path)
+    parser.eval_metric(
+        dfs,
+        ac.dfs_type,
+        sys_info.iloc[0],
+        file_io.get_soc_params(soc_spec_df, arch),
+        raw_pmc,
+        False,
+    )
+    sol = dfs[SOL_TABLE]
+    metrics = [
+        (
+            row["Metric"],
+            to_number(row.get("Value", row.get("Avg"))),
+            row.get("Unit"),
+            to_number(row.get("Peak")),
+            to_number(row.get("PoP")),
+        )
+        for _, row in sol.iterrows()
+    ]
+
+    info = sys_info.iloc[0].to_dict()
+    info = {k: to_builtin(v) for k, v in info.items()}
+    return {
+        "sysinfo": info,
+        "kernels": kernels,
+        "metrics": metrics,
+        "mtime": signature(path),
+    }
+
+
+def connect(index):
+    conn = sqlite3.connect(index)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def store_workload(conn, path, entry):
+    info = entry["sysinfo"]
+    with conn:
+        remove_workload(conn, path)
+        cursor = conn.execute(
+            "INSERT INTO workloads (path, mtime, {}, sysinfo) VALUES (?, ?, {}, ?)".format(
+                ", ".join(SYSINFO_FIELDS), ", ".join("?" for _ in SYSINFO_FIELDS)
+            ),
+            [path, entry["mtime"]]
+            + [info.get(f) for f in SYSINFO_FIELDS]
+            + [json.dumps(info)],
+        )
+        id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO kernels VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(id,) + k for k in entry["kernels"]],
+        )
+        conn.executemany(
+            "INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)",
+            [(id,) + m for m in entry["metrics"]],
+        )
+
+
+def remove_workload(conn, path):
+    row = conn.execute("SELECT id FROM workloads WHERE path = ?", (path,)).fetchone()
+    if row:
+        conn.execute("DELETE FROM kernels WHERE workload = ?", row)
+        conn.execute("DELETE FROM metrics WHERE workload = ?", row)
+        conn.execute("DELETE FROM workloads WHERE id = ?", row)
+
+
+def refresh(index, roots, num_jobs=0):
+    """
+    Scan the workloads under roots that are new or changed since the last
+    refresh of index, spreading them over num_jobs processes, and forget the
+    workloads that are gone. Returns the number of workloads scanned,
+    unchanged, removed and failed.
+    """
+    conn = connect(index)
+    known = dict(conn.execute("SELECT path, mtime FROM workloads").fetchall())
+    workloads = find_workloads(roots)
+    stale = [w for w in workloads if known.get(w) != signature(w)]
+
+    gone = [p for p in known if not os.path.isdir(p)]
+    with conn:
+        for path in gone:
+            remove_workload(conn, path)
+
+    failed = 0
+    num_jobs = num_jobs if num_jobs > 0 else (os.cpu_count() or 1)
+    num_jobs = max(1, min(num_jobs, len(stale)))
+    with ProcessPoolExecutor(max_workers=num_jobs) as pool:
+        futures = {w: pool.submit(scan_workload, w) for w in stale}
+        for i, (path, future) in enumerate(futures.items(), 1):
+            try:
+                entry = future.result()
+            except Exception as error:
+                # NB: e.g. roofline only workloads have no metrics to index
+                print("[{}/{}] {}: skipped {!r}".format(i, len(stale), path, error))
+                failed += 1
+                continue
+            store_workload(conn, path, entry)
+            print("[{}/{}] {}: indexed".format(i, len(stale), path))
+    conn.close()
+    return len(stale) - failed, len(workloads) - len(stale), len(gone), failed
+
+
+def query(index, sql, pattern):
+    conn = connect(index)
+    try:
+        return pd.read_sql_query(sql, conn, params=(pattern,))
+    finally:
+        conn.close()
+
+
+def query_kernels(index, pattern):
+    """
+    Duration stats of the kernels matching a glob pattern, in every workload.
+    """
+    return query(index, KERNEL_QUERY, pattern)
+
+
+def query_metrics(index, pattern):
+    """
+    Speed-of-Light metrics matching a glob pattern, in every workload.
+    """
+    return query(index, METRIC_QUERY, pattern)
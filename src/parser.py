@@ -92,7 +92,14 @@ def parse(my_parser):
         required=True,
         help="\t\t\tAssign a name to workload.",
     )
-    profile_group.add_argument("--target", type=str, default=None, help=argparse.SUPPRESS)
+    profile_group.add_argument(
+        "--target",
+        type=str,
+        metavar="",
+        default=None,
+        choices=SOC_LIST,
+        help="\t\t\tTarget SoC to plan for when no GPU is present:\n\t\t\t   mi50\n\t\t\t   mi100\n\t\t\t   mi200",
+    )
     profile_group.add_argument(
         "-p",
         "--path",
@@ -144,6 +151,70 @@ def parse(my_parser):
         action="store_true",
         help="\t\t\tProfile without collecting roofline data.",
     )
+    profile_group.add_argument(
+        "--gpus",
+        type=str,
+        dest="gpus",
+        metavar="",
+        nargs="+",
+        required=False,
+        default=None,
+        help="\t\t\tDistribute profiling passes over these GPU device IDs.\n\t\t\tFor single GPU applications.",
+    )
+    profile_group.add_argument(
+        "--resume",
+        required=False,
+        default=False,
+        action="store_true",
+        help="\t\t\tResume an interrupted profiling run, skipping completed passes.",
+    )
+    profile_group.add_argument(
+        "--pass-timestamps",
+        dest="pass_timestamps",
+        metavar="",
+        nargs="?",
+        const="median",
+        default=None,
+        choices=["median", "min", "light"],
+        help="\t\t\tDerive kernel timestamps from the counter passes (median, min or light)\n\t\t\tinstead of replaying the app once more. (DEFAULT: median)",
+    )
+    profile_group.add_argument(
+        "--sample",
+        dest="sample",
+        metavar="",
+        type=int,
+        nargs="?",
+        const=20,
+        default=None,
+        help="\t\t\tOnly collect counters on a sample of about N dispatches per kernel,\n\t\t\tpicked from a timestamps pass. (DEFAULT: 20)",
+    )
+    profile_group.add_argument(
+        "--stream",
+        dest="stream",
+        metavar="",
+        type=float,
+        nargs="?",
+        const=5.0,
+        default=None,
+        help="\t\t\tStream finished passes into the merged store every N seconds,\n\t\t\tso analyze can show partial results while profiling. (DEFAULT: 5)",
+    )
+    profile_group.add_argument(
+        "--plan",
+        "--dry-run",
+        dest="plan",
+        required=False,
+        default=False,
+        action="store_true",
+        help="\t\t\tPrint the profiling passes and exit without profiling.",
+    )
+    profile_group.add_argument(
+        "--baseline-time",
+        dest="baseline_time",
+        metavar="",
+        type=float,
+        default=None,
+        help="\t\t\tRuntime in seconds of one run of the app, used by --plan\n\t\t\tto estimate the profiling wall time.",
+    )
     profile_group.add_argument(
         "remaining",
         metavar="-- [ ...]",
@@ -172,11 +243,39 @@ def parse(my_parser):
         "-m",
         "--mem-level",
         required=False,
-        choices=["HBM", "L2", "vL1D", "LDS"],
+        choices=["HBM", "L2", "vL1D", "LDS", "ALL"],
         metavar="",
         type=str,
-        default="ALL",
-        help="\t\t\tFilter by memory level: (DEFAULT: ALL)\n\t\t\t   HBM\n\t\t\t   L2\n\t\t\t   vL1D\n\t\t\t   LDS",
+        nargs="+",
+        default=["ALL"],
+        help="\t\t\tFilter by memory level: (DEFAULT: ALL)\n\t\t\t   HBM\n\t\t\t   L2\n\t\t\t   vL1D\n\t\t\t   LDS\n\t\t\tMultiple levels render one plot per level.",
+    )
+    roofline_group.add_argument(
+        "--roof-dtype",
+        required=False,
+        choices=["FP32", "FP64", "FP16", "I8"],
+        metavar="",
+        type=str,
+        nargs="+",
+        default=None,
+        help="\t\t\tRender one plot per datatype: (DEFAULT: FP32 or FP64 by peak)\n\t\t\t   FP32\n\t\t\t   FP64\n\t\t\t   FP16\n\t\t\t   I8",
+    )
+    roofline_group.add_argument(
+        "--roof-format",
+        required=False,
+        choices=["pdf", "png", "svg"],
+        metavar="",
+        type=str,
+        default="pdf",
+        help="\t\t\tImage format of roofline plots: (DEFAULT: pdf)\n\t\t\t   pdf\n\t\t\t   png\n\t\t\t   svg",
+    )
+    roofline_group.add_argument(
+        "--roof-jobs",
+        required=False,
+        metavar="",
+        type=int,
+        default=0,
+        help="\t\t\tNumber of parallel render jobs. (DEFAULT: # of CPUs)",
     )
     roofline_group.add_argument(
         "--axes",
@@ -212,7 +311,10 @@ def parse(my_parser):
                                         \n\n-------------------------------------------------------------------------------
                                         \nExamples:
                                         \n\tomniperf database --import -H pavii1 -u temp -t asw -w workloads/vcopy/mi200/
+                                        \n\tomniperf database --import -H pavii1 -u temp -t asw -w "nightly/*/mi200"
                                         \n\tomniperf database --remove -H pavii1 -u temp -w omniperf_asw_sample_mi200
+                                        \n\tomniperf database --remove -H pavii1 -u temp -t asw -w "*" --older-than 30
+                                        \n\tomniperf database --import --sqlite -t asw -w workloads/vcopy/mi200/
                                         \n-------------------------------------------------------------------------------\n
                                         """,
         prog="tool",
@@ -248,11 +350,27 @@ def parse(my_parser):
         action="store_true",
         help="\t\t\t\tRemove a workload from Omniperf DB",
     )
+    interaction_group.add_argument(
+        "--older-than",
+        required=False,
+        metavar="",
+        dest="older_than",
+        type=float,
+        default=None,
+        help="\t\t\t\tOnly remove workloads imported more than this many days ago.",
+    )
+    interaction_group.add_argument(
+        "--dry-run",
+        required=False,
+        dest="dry_run",
+        action="store_true",
+        help="\t\t\t\tList the workloads --remove would delete, without deleting them.",
+    )
 
     connection_group.add_argument(
         "-H",
         "--host",
-        required=True,
+        required=False,
         metavar="",
         help="\t\t\t\tName or IP address of the server host.",
     )
@@ -267,7 +385,7 @@ def parse(my_parser):
     connection_group.add_argument(
         "-u",
         "--username",
-        required=True,
+        required=False,
         metavar="",
         help="\t\t\t\tUsername for authentication.",
     )
@@ -287,7 +405,7 @@ def parse(my_parser):
         required=True,
         metavar="",
         dest="workload",
-        help="\t\t\t\tSpecify name of workload (to remove) or path to workload (to import)",
+        help="\t\t\t\tSpecify name of workload (to remove) or path to workload (to import).\n\t\t\t\tA directory tree or a glob of workloads imports all of them.\n\t\t\t\tA glob of workload names removes all of them, -t limits it to a team.",
     )
     connection_group.add_argument(
         "-k",
@@ -298,6 +416,133 @@ def parse(my_parser):
         default=2,
         type=int,
     )
+    connection_group.add_argument(
+        "--sqlite",
+        required=False,
+        metavar="",
+        nargs="?",
+        const="",
+        default=None,
+        help="\t\t\t\tUse a local SQLite file instead of the server, no --host or --username needed.\n\t\t\t\t(DEFAULT: omniperf_<team>.db)",
+    )
+    connection_group.add_argument(
+        "--preaggregate",
+        required=False,
+        action="store_true",
+        help="\t\t\t\tAlso upload panel metrics pre-computed per kernel and normalization.",
+    )
+
+    ## Export Command Line Options
+    ## ----------------------------
+    export_parser = subparsers.add_parser(
+        "export",
+        help="Package profiling results into one compressed bundle",
+        usage="""
+                                        \nomniperf export --path <workload_path> [export options]
+
+                                        \n\n-------------------------------------------------------------------------------
+                                        \nExamples:
+                                        \n\tomniperf export -p workloads/vcopy/mi200/
+                                        \n\tomniperf export -p workloads/vcopy/mi200/ -o archive/vcopy_mi200.omniperf.npz
+                                        \n-------------------------------------------------------------------------------\n
+                                        """,
+        prog="tool",
+        allow_abbrev=False,
+        formatter_class=lambda prog: argparse.RawTextHelpFormatter(
+            prog, max_help_position=40
+        ),
+    )
+    export_parser._optionals.title = "Help"
+
+    general_group = export_parser.add_argument_group("General Options")
+    export_group = export_parser.add_argument_group("Export Options")
+
+    general_group.add_argument("-v", "--version", action="version", version=versionString)
+    general_group.add_argument(
+        "-V", "--verbose", help="Increase output verbosity", action="count", default=0
+    )
+
+    export_group.add_argument(
+        "-p",
+        "--path",
+        dest="path",
+        required=True,
+        metavar="",
+        help="\t\tSpecify the raw data dir of the workload to export.",
+    )
+    export_group.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        metavar="",
+        default=None,
+        help="\t\tSpecify the bundle file. (DEFAULT: <name>_<soc>.omniperf.npz)",
+    )
+
+    ## Index Command Line Options
+    ## ----------------------------
+    index_parser = subparsers.add_parser(
+        "index",
+        help="Index many profiling results, and query kernels and metrics across them",
+        usage="""
+                                        \nomniperf index [--path <workloads_root> ...] [index options]
+
+                                        \n\n-------------------------------------------------------------------------------
+                                        \nExamples:
+                                        \n\tomniperf index -p workloads/
+                                        \n\tomniperf index -k "vecCopy*"
+                                        \n\tomniperf index -p workloads/ -m "VALU FLOPs" -i nightly.db
+                                        \n-------------------------------------------------------------------------------\n
+                                        """,
+        prog="tool",
+        allow_abbrev=False,
+        formatter_class=lambda prog: argparse.RawTextHelpFormatter(
+            prog, max_help_position=40
+        ),
+    )
+    index_parser._optionals.title = "Help"
+
+    general_group = index_parser.add_argument_group("General Options")
+    index_group = index_parser.add_argument_group("Index Options")
+
+    general_group.add_argument("-v", "--version", action="version", version=versionString)
+    general_group.add_argument(
+        "-V", "--verbose", help="Increase output verbosity", action="count", default=0
+    )
+
+    index_group.add_argument(
+        "-p",
+        "--path",
+        dest="path",
+        metavar="",
+        nargs="+",
+        default=[],
+        help="\t\tSpecify the dirs to scan for workloads. Only new or changed ones are read.",
+    )
+    index_group.add_argument(
+        "-i",
+        "--index",
+        dest="index",
+        metavar="",
+        default="omniperf_index.db",
+        help="\t\tSpecify the index file. (DEFAULT: omniperf_index.db)",
+    )
+    index_group.add_argument(
+        "-k",
+        "--kernel",
+        dest="kernel",
+        metavar="",
+        default=None,
+        help="\t\tList the duration stats of kernels matching a glob, in every workload.",
+    )
+    index_group.add_argument(
+        "-m",
+        "--metric",
+        dest="metric",
+        metavar="",
+        default=None,
+        help="\t\tList the Speed-of-Light metrics matching a glob, in every workload.",
+    )
 
     ## Analyze Command Line Options
     ## ----------------------------
@@ -413,6 +658,14 @@ def parse(my_parser):
         choices=["s", "ms", "us", "ns"],
         help="\t\tSpecify display time unit in kernel top stats: (DEFAULT: ns)\n\t\t   s\n\t\t   ms\n\t\t   us\n\t\t   ns",
     )
+    analyze_group.add_argument(
+        "--kernel-verbose",
+        dest="kernel_verbose",
+        type=int,
+        metavar="",
+        default=5,
+        help="\t\tSpecify Kernel Name verbose level 1-5. Lower the level, shorter the kernel name. (DEFAULT: 5) (DISABLE: 5)",
+    )
     analyze_group.add_argument(
         "--decimal",
         type=int,
@@ -439,3 +692,12 @@ def parse(my_parser):
         const=8050,
         help="\t\tActivate a GUI to interate with Omniperf metrics.\n\t\tOptionally, specify port to launch application (DEFAULT: 8050)",
     )
+    analyze_group.add_argument(
+        "--profile-self",
+        dest="profile_self",
+        metavar="",
+        nargs="?",
+        const="",
+        default=None,
+        help="\t\tTime analyze stages and metrics and sample their memory usage.\n\t\tOptionally, specify a file to write a Chrome trace (.json) to.",
+    )
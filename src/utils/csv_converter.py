@@ -22,92 +22,72 @@
 
 import argparse
 import collections
+import datetime
+import glob
+import hashlib
+import itertools
 import os
-import sys
 import re
+import sys
+import time
+import tempfile
 import pandas as pd
 import getpass
-from pymongo import MongoClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pymongo import MongoClient, ASCENDING
 from tqdm import tqdm
-import shutil
 
-cache = dict()
+from omniperf_analyze.utils import kernel_name, bundle
+
 supported_arch = {"gfx906": "mi50", "gfx908": "mi100", "gfx90a": "mi200"}
 MAX_SERVER_SEL_DELAY = 5000  # 5 sec connection timeout
+UPLOAD_JOBS = 4  # collections uploaded in parallel, one connection each
+INSERT_BATCH = 10000  # documents per insert_many()
+TEMP_SUFFIX = "__import"  # collections are uploaded here, then renamed
+
+# Indexes created per collection type, first matching name pattern wins.
+# Compound indexes also serve queries on their leading fields, e.g. a filter on
+# gpu-id alone or on gpu-id and KernelName.
+DISPATCH_INDEXES = [["Index"], ["KernelName", "Index"], ["gpu-id", "KernelName", "Index"]]
+INDEX_SPECS = [
+    (r"^(sysinfo|roofline)$", []),
+    (r"^preagg_", [["Kernel", "Table ID"]]),
+    (r"^pmc_kernel_top$", [["KernelName"]]),
+    (r".*", DISPATCH_INDEXES),  # pmc_perf, counter passes, timestamps
+]
+
+
+def workload_db(workload, team):
+    """
+    Name of the database a workload (or export bundle) is imported to.
+    """
+    if bundle.is_bundle(workload):
+        sysInfo = bundle.read_bundle(workload, ["sysinfo"])[1]["sysinfo"]
+    else:
+        sysInfo = pd.read_csv(os.path.join(workload, "sysinfo.csv"))
+    # Extract SoC
+    arch = sysInfo["gpu_soc"][0]
+    soc = supported_arch[arch]
+    # Extract name
+    name = sysInfo["workload_name"][0]
+
+    db = "omniperf_" + team + "_" + name + "_" + soc
+    if db.find(".") != -1 or db.find("-") != -1:
+        raise ValueError("'-' and '.' are not permited in workload name", db)
+    return db
 
 
-def kernel_name_shortener(df, cache, level):
-
-    if level >= 5:
-        return df
-
-    columnName = ""
-    if "KernelName" in df:
-        columnName = "KernelName"
-    if "Name" in df:
-        columnName = "Name"
-
-    if columnName == "KernelName" or columnName == "Name":
-        # loop through all indices
-        for index in df.index:
-
-            original_name = df.loc[index, columnName]
-            if original_name in cache:
-                continue
-
-            # cache miss, add the shortened name to the dictionary
-            new_name = ""
-            matches = ""
-
-            names_and_args = re.compile(r"(?P<name>[( )A-Za-z0-9_]+)([ ,*<>()]+)(::)?")
-
-            # works for name Kokkos::namespace::init_lock_array_kernel_threadid(int) [clone .kd]
-            if names_and_args.search(original_name):
-                matches = names_and_args.findall(original_name)
-            else:
-                # Works for first case  '__amd_rocclr_fillBuffer.kd'
-                # remove .kd and then parse through original regex
-                first_case = re.compile(r"([^\s]+)(.kd)")
-                Mod_name_and_args = re.compile(r"(?P<name>[( )A-Za-z0-9_]+)([ ,*<>()]*)")
-                interim_name = first_case.search(original_name).group(1)
-                matches = Mod_name_and_args.findall(interim_name)
-
-            current_level = 0
-            for name in matches:
-                ##can cause errors if a function name or argument is equal to 'clone'
-                if name[0] == "clone":
-                    continue
-                if len(name) == 3:
-                    if name[2] == "::":
-                        continue
-
-                if current_level < level:
-                    new_name += name[0]
-                # closing '>' is to be taken account by the while loop
-                if name[1].count(">") == 0:
-                    if current_level < level:
-                        if not (current_level == level - 1 and name[1].count("<") > 0):
-                            new_name += name[1]
-                    current_level += name[1].count("<")
-
-                curr_index = 0
-                # cases include '>'  '> >, ' have to go in depth here to not lose account of commas and current level
-                while name[1].count(">") > 0 and curr_index < len(name[1]):
-                    if current_level < level:
-                        new_name += name[1][curr_index:]
-                        current_level -= name[1][curr_index:].count(">")
-                        curr_index = len(name[1])
-                    elif name[1][curr_index] == (">"):
-                        current_level -= 1
-                    curr_index += 1
-
-            cache[original_name] = new_name
-            if new_name == None or new_name == "":
-                cache[original_name] = original_name
-
-        df[columnName] = df[columnName].map(cache)
-
-    return df
+def get_password(args):
+    if args.password == "":
+        try:
+            password = getpass.getpass()
+        except Exception as error:
+            print("PASSWORD ERROR", error)
+        else:
+            print("Password recieved")
+    else:
+        password = args.password
+    return password
 
 
 # Verify target directory and setup connection
@@ -124,25 +104,21 @@ def parse(args, profileAndExport):
 
     # Verify directory path is valid
     print("Pulling data from ", workload)
-    if os.path.isdir(workload):
+    if bundle.is_bundle(workload):
+        print("Found export bundle")
+    elif os.path.isdir(workload):
         print("The directory exists")
     else:
         raise argparse.ArgumentTypeError("Directory does not exist")
 
     sysInfoPath = workload + "/sysinfo.csv"
-    if os.path.isfile(sysInfoPath):
+    if bundle.is_bundle(workload) or os.path.isfile(sysInfoPath):
         print("Found sysinfo file")
-        sysInfo = pd.read_csv(sysInfoPath)
-        # Extract SoC
-        arch = sysInfo["gpu_soc"][0]
-        soc = supported_arch[arch]
-        # Extract name
-        name = sysInfo["workload_name"][0]
     else:
         print("Unable to parse SoC or workload name from sysinfo.csv")
         sys.exit(1)
 
-    db = "omniperf_" + args.team + "_" + name + "_" + soc
+    db = workload_db(workload, args.team)
 
     if Extractionlvl >= 5:
         print("KernelName shortening disabled")
@@ -151,18 +127,8 @@ def parse(args, profileAndExport):
 
     print("Kernel name verbose level:", Extractionlvl)
 
-    if args.password == "":
-        try:
-            password = getpass.getpass()
-        except Exception as error:
-            print("PASSWORD ERROR", error)
-        else:
-            print("Password recieved")
-    else:
-        password = args.password
-
-    if db.find(".") != -1 or db.find("-") != -1:
-        raise ValueError("'-' and '.' are not permited in workload name", db)
+    sqlite = getattr(args, "sqlite", None)
+    password = "" if sqlite else get_password(args)
 
     connectionInfo = {
         "username": username,
@@ -171,94 +137,392 @@ def parse(args, profileAndExport):
         "port": port,
         "workload": workload,
         "db": db,
+        "sqlite": sqlite,
     }
 
     return connectionInfo, Extractionlvl
 
 
-def convert_folder(connectionInfo, Extractionlvl):
-    # Test connection
-    connection_str = (
-        "mongodb://"
-        + connectionInfo["username"]
-        + ":"
-        + connectionInfo["password"]
-        + "@"
-        + connectionInfo["host"]
-        + ":"
-        + connectionInfo["port"]
-        + "/?authSource=admin"
+def connect(connectionInfo, pool_size=UPLOAD_JOBS):
+    """
+    Connect to the Omniperf DB. Credentials are passed to the driver as is,
+    never through a command line or URI.
+    A local SQLite store stands in for the server if one is given.
+    """
+    if connectionInfo.get("sqlite"):
+        from utils import sqlite_store
+
+        return sqlite_store.StoreClient(connectionInfo["sqlite"])
+    client = MongoClient(
+        host=connectionInfo["host"],
+        port=int(connectionInfo["port"]),
+        username=connectionInfo["username"],
+        password=connectionInfo["password"],
+        authSource="admin",
+        maxPoolSize=pool_size,
+        serverSelectionTimeoutMS=MAX_SERVER_SEL_DELAY,
     )
-    client = MongoClient(connection_str, serverSelectionTimeoutMS=MAX_SERVER_SEL_DELAY)
     try:
         client.server_info()
     except:
         print("ERROR: Unable to connect to the server")
         sys.exit(1)
-    # Set up directories
-    if Extractionlvl < 5:
-        newfilepath = connectionInfo["workload"]
-        newfilepath_h = newfilepath + "/renamedFiles/"
-        if not os.path.exists(newfilepath_h):
-            os.mkdir(newfilepath_h)
-        newfilepath = newfilepath_h + connectionInfo["db"] + "/"
-        if not os.path.exists(newfilepath):
-            os.mkdir(newfilepath)
-    # Upload files
-    i = 0
-    file = "blank"
-    for file in tqdm(os.listdir(connectionInfo["workload"])):
-        if file.endswith(".csv"):
-            print(connectionInfo["workload"] + "/" + file)
-            try:
-                fileName = file[0 : file.find(".")]
-                # Only shorten KernelNames if instructed to
-                if Extractionlvl < 5:
-                    t1 = pd.read_csv(
-                        connectionInfo["workload"] + "/" + file,
-                        on_bad_lines="skip",
-                        engine="python",
-                    )
+    return client
+
+
+def read_collection(fname, Extractionlvl):
+    """
+    Load a workload csv as a collection, with shortened KernelNames if
+    instructed to. Empty fields are kept as empty strings, as mongoimport does.
+    """
+    df = pd.read_csv(fname, on_bad_lines="skip", engine="python")
+    return prepare_collection(df, Extractionlvl)
+
+
+def prepare_collection(df, Extractionlvl):
+    df = kernel_name.kernel_name_shortener(df, Extractionlvl)
+    return df.astype(object).where(df.notna(), "")
+
+
+def content_hash(fname, Extractionlvl):
+    """
+    Digest of a workload csv, as uploaded at the given kernel name level.
+    """
+    h = hashlib.sha256(str(Extractionlvl).encode())
+    with open(fname, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def upload_collection(db, name, df, batch_size=INSERT_BATCH):
+    """
+    Replace collection name of db with the rows of df.
+    Returns the number of documents inserted.
+    """
+    columns = [str(c) for c in df.columns]
+    rows = df.itertuples(index=False, name=None)
+    return upload_documents(
+        db, name, (dict(zip(columns, row)) for row in rows), batch_size
+    )
 
-                    t2 = kernel_name_shortener(t1, cache, level=Extractionlvl)
-                    df_saved_file = t2.to_csv(newfilepath + file)
-
-                    cmd = (
-                        'mongoimport --quiet --uri mongodb://{}:{}@{}:{} --authenticationDatabase "admin" --file {} -d {} -c {} --drop --type csv --headerline'
-                    ).format(
-                        connectionInfo["username"],
-                        connectionInfo["password"],
-                        connectionInfo["host"],
-                        connectionInfo["port"],
-                        newfilepath + file,
-                        connectionInfo["db"],
-                        fileName,
-                    )
-                    os.system(cmd)
-                else:
-                    cmd = (
-                        'mongoimport --quiet --uri mongodb://{}:{}@{}:{} --authenticationDatabase "admin" --file {} -d {} -c {} --drop --type csv --headerline'
-                    ).format(
-                        connectionInfo["username"],
-                        connectionInfo["password"],
-                        connectionInfo["host"],
-                        connectionInfo["port"],
-                        connectionInfo["workload"] + "/" + file,
-                        connectionInfo["db"],
-                        fileName,
-                    )
-                    os.system(cmd)
-                i += 1
-            except pd.errors.EmptyDataError:
-                print("Skipping empty csv " + file)
 
-    mydb = client["workload_names"]
-    mycol = mydb["names"]
+def upload_documents(db, name, docs, batch_size=INSERT_BATCH):
+    """
+    Replace collection name of db with docs, inserted in unordered batches.
+    Documents go to a temporary collection first, renamed over name once
+    complete, so readers never see a partially uploaded collection.
+    Returns the number of documents inserted.
+    """
+    collection = db[name + TEMP_SUFFIX]
+    collection.drop()
+    docs = iter(docs)
+    count = 0
+    fields = set()
+    for batch in iter(lambda: list(itertools.islice(docs, batch_size)), []):
+        collection.insert_many(batch, ordered=False)
+        fields.update(batch[0])
+        count += len(batch)
+    if count:
+        # NB: indexes are built before the rename, so they're never missing
+        create_indexes(collection, name, fields)
+        collection.rename(name, dropTarget=True)
+    else:
+        db[name].drop()
+    return count
+
+
+def create_indexes(collection, name, fields):
+    """
+    Create the indexes declared for collection name on the given fields.
+    Indexes over fields the collection lacks are skipped.
+    """
+    spec = next(spec for pattern, spec in INDEX_SPECS if re.match(pattern, name))
+    for keys in spec:
+        if all(k in fields for k in keys):
+            collection.create_index([(k, ASCENDING) for k in keys])
+
+
+def report_indexes(db, names, quiet=False):
+    """
+    Print the number and total size of the indexes of each collection.
+    Returns the size of all of them, in bytes.
+    """
+    if not quiet:
+        print("Indexes:")
+    total = 0
+    for name in sorted(names):
+        stats = db.command("collStats", name)
+        sizes = stats.get("indexSizes", {})
+        total += stats.get("totalIndexSize", 0)
+        if not quiet:
+            print(
+                "  {:<32} {:>2} indexes {:>10.1f} KiB".format(
+                    name, len(sizes), stats.get("totalIndexSize", 0) / 1024
+                )
+            )
+    return total
+
+
+def import_file(db, workload, file, Extractionlvl, hashes):
+    """
+    Upload file unless hashes show the same content is already in db.
+    Returns the collection name, its content hash and whether it was uploaded.
+    """
+    fileName = file[0 : file.find(".")]
+    fname = os.path.join(workload, file)
+    digest = content_hash(fname, Extractionlvl)
+    if hashes.get(fileName) == digest:
+        return fileName, digest, False
+    try:
+        df = read_collection(fname, Extractionlvl)
+    except pd.errors.EmptyDataError:
+        print("Skipping empty csv " + file)
+        return fileName, None, False
+    upload_collection(db, fileName, df)
+    return fileName, digest, True
+
+
+def import_table(db, name, df, checksum, Extractionlvl, hashes):
+    """
+    Upload a table of an export bundle, as import_file() does for a csv.
+    """
+    digest = hashlib.sha256((str(Extractionlvl) + checksum).encode()).hexdigest()
+    if hashes.get(name) == digest:
+        return name, digest, False
+    upload_collection(db, name, prepare_collection(df, Extractionlvl))
+    return name, digest, True
+
+
+def convert_folder(
+    connectionInfo,
+    Extractionlvl,
+    client=None,
+    jobs=UPLOAD_JOBS,
+    preagg=False,
+    quiet=False,
+):
+    """
+    Upload every csv of a workload to its own collection. Collections are
+    uploaded in parallel, over a pool of at most jobs connections.
+    Content hashes are kept with the workload name, so a re-import only
+    uploads the csv files that changed since.
+    With preagg, panel metrics pre-computed for Grafana are uploaded too.
+    Returns the number of collections added and unchanged, and the size of
+    their indexes.
+    """
+    if client is None:
+        client = connect(connectionInfo, jobs)
+    db = client[connectionInfo["db"]]
+    names = client["workload_names"]["names"]
+
+    entry = names.find_one({"name": connectionInfo["db"]}) or {}
+    # Mark the import as in progress until the entry is replaced below, so
+    # garbage collection (--remove) leaves its collections alone meanwhile
+    marker = {k: v for k, v in entry.items() if k != "_id"}
+    marker.update(name=connectionInfo["db"], importing=datetime.datetime.utcnow())
+    names.replace_one({"name": connectionInfo["db"]}, marker, upsert=True)
+    existing = set(db.list_collection_names())
+    hashes = {k: v for k, v in entry.get("collections", {}).items() if k in existing}
+
+    workload = connectionInfo["workload"]
+    if bundle.is_bundle(workload):
+        # Tables come column by column out of the bundle, no csv parsing
+        manifest, dfs = bundle.read_bundle(workload)
+        checksums = {t["name"]: t["sha256"] for t in manifest["tables"]}
+        tasks = [
+            (import_table, db, name, df, checksums[name], Extractionlvl, hashes)
+            for name, df in dfs.items()
+        ]
+    else:
+        files = sorted(f for f in os.listdir(workload) if f.endswith(".csv"))
+        tasks = [
+            (import_file, db, workload, file, Extractionlvl, hashes) for file in files
+        ]
+    added = 0
+    unchanged = 0
+    collections = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(*task) for task in tasks]
+        for future in tqdm(as_completed(futures), total=len(futures), disable=quiet):
+            fileName, digest, uploaded = future.result()
+            if digest is None:
+                continue
+            collections[fileName] = digest
+            if uploaded:
+                added += 1
+            else:
+                unchanged += 1
+    kernel_name.default_cache().save()
+
+    if preagg:
+        from utils import preaggregate
+
+        # Pre-aggregated collections depend on every csv of the workload
+        digest = hashlib.sha256(repr(sorted(collections.items())).encode()).hexdigest()
+        agg_names = preaggregate.collection_names()
+        if all(hashes.get(name) == digest for name in agg_names):
+            unchanged += len(agg_names)
+        else:
+            if not quiet:
+                print("Pre-aggregating panel metrics...")
+            if bundle.is_bundle(workload):
+                with tempfile.TemporaryDirectory() as tmp:
+                    bundle.extract_bundle(workload, tmp)
+                    agg = preaggregate.preaggregate(tmp, Extractionlvl)
+            else:
+                agg = preaggregate.preaggregate(workload, Extractionlvl)
+            for name, docs in agg.items():
+                upload_documents(db, name, docs)
+                added += 1
+        collections.update((name, digest) for name in agg_names)
+
+    # Collections imported before indexes were declared get them now
+    for name in set(collections) & set(hashes):
+        doc = db[name].find_one()
+        if doc:
+            create_indexes(db[name], name, doc)
+    index_size = report_indexes(db, collections, quiet)
+
+    # Drop collections whose csv is gone from the workload, or no longer asked for
+    for name in sorted(set(entry.get("collections", {})) - set(collections)):
+        db[name].drop()
+
     value = {"name": connectionInfo["db"]}
-    newValue = {"name": connectionInfo["db"]}
-    mycol.replace_one(value, newValue, upsert=True)
-    # Remove tmp directory if we shortened KernelNames
-    if Extractionlvl < 5:
-        shutil.rmtree(newfilepath_h)
-    print("{} collections added.".format(i))
-    print("Workload name uploaded")
+    newValue = {
+        "name": connectionInfo["db"],
+        "collections": collections,
+        "imported": datetime.datetime.utcnow(),
+    }
+    names.replace_one(value, newValue, upsert=True)
+    if not quiet:
+        print("{} collections added, {} unchanged.".format(added, unchanged))
+        print("Workload name uploaded")
+    return added, unchanged, index_size
+
+
+def find_workloads(path):
+    """
+    Workload directories, i.e. holding a sysinfo.csv, found under path.
+    path is a workload, a directory tree of workloads or a glob of either.
+    Export bundles count as workloads.
+    """
+    roots = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+    workloads = []
+    for root in roots:
+        if bundle.is_bundle(root):
+            workloads.append(os.path.abspath(root))
+        for dir, subdirs, files in os.walk(root):
+            workloads += sorted(
+                os.path.abspath(os.path.join(dir, f))
+                for f in files
+                if f.endswith(bundle.BUNDLE_SUFFIX)
+            )
+            if "sysinfo.csv" in files:
+                workloads.append(os.path.abspath(dir))
+                subdirs.clear()
+            else:
+                subdirs.sort()
+    return workloads
+
+
+def check_workload(workload, team):
+    """
+    Validate a workload for import, as isWorkloadEmpty() and parse() do.
+    Returns its database name, or None and the error.
+    """
+    fname = os.path.join(workload, "pmc_perf.csv")
+    try:
+        if bundle.is_bundle(workload):
+            pmc_perf = bundle.read_bundle(workload, ["pmc_perf"])[1].get("pmc_perf")
+        elif os.path.isfile(fname):
+            pmc_perf = pd.read_csv(fname)
+        else:
+            pmc_perf = None
+        if pmc_perf is None:
+            return None, "Cannot find pmc_perf.csv"
+        if pmc_perf.dropna().empty:
+            return None, "Found empty cells. Profiling data could be corrupt."
+        return workload_db(workload, team), None
+    except (OSError, ValueError, KeyError, pd.errors.ParserError) as error:
+        return None, "Invalid workload: {}".format(error)
+
+
+def import_workloads(args, workloads, client=None, jobs=UPLOAD_JOBS):
+    """
+    Import many workloads over one client. Workloads are validated in
+    parallel, then uploaded jobs at a time, each over a single connection of
+    the shared pool. Returns the number of workloads that failed.
+    """
+    print("Found {} workloads in {}".format(len(workloads), args.workload))
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        checks = list(pool.map(lambda w: check_workload(w, args.team), workloads))
+
+    failed = collections.OrderedDict()
+    valid = collections.OrderedDict()
+    for workload, (db, error) in zip(workloads, checks):
+        if error:
+            failed[workload] = error
+        elif db in valid.values():
+            failed[workload] = "Same database {} as another workload".format(db)
+        else:
+            valid[workload] = db
+    for workload, error in failed.items():
+        print("Skipping {}: {}".format(workload, error))
+
+    sqlite = getattr(args, "sqlite", None)
+    connectionInfo = {
+        "username": args.username,
+        "password": get_password(args) if valid and not sqlite else "",
+        "host": args.host,
+        "port": str(args.port),
+        "sqlite": sqlite,
+    }
+    if valid and client is None:
+        client = connect(connectionInfo, jobs)
+
+    def upload(workload):
+        start = time.time()
+        info = dict(connectionInfo, workload=workload, db=valid[workload])
+        result = convert_folder(
+            info, args.kernelVerbose, client, 1, args.preaggregate, quiet=True
+        )
+        return result + (time.time() - start,)
+
+    added = unchanged = index_size = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(upload, w): w for w in valid}
+        for i, future in enumerate(as_completed(futures), 1):
+            workload = futures[future]
+            try:
+                a, u, size, elapsed = future.result()
+            except (Exception, SystemExit) as error:
+                failed[workload] = repr(error)
+                print(
+                    "[{}/{}] {}: FAILED {!r}".format(
+                        i, len(valid), valid[workload], error
+                    )
+                )
+                continue
+            added += a
+            unchanged += u
+            index_size += size
+            print(
+                "[{}/{}] {}: {} collections added, {} unchanged ({:.1f}s)".format(
+                    i, len(valid), valid[workload], a, u, elapsed
+                )
+            )
+
+    print(
+        "Imported {} of {} workloads: {} collections added, {} unchanged, "
+        "{:.1f} KiB of indexes.".format(
+            len(workloads) - len(failed),
+            len(workloads),
+            added,
+            unchanged,
+            index_size / 1024,
+        )
+    )
+    for workload, error in failed.items():
+        print("  FAILED {}: {}".format(workload, error))
+    return len(failed)
@@ -0,0 +1,110 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+################################################
+# Global vars
+################################################
+
+MANIFEST_FILE = "manifest.json"
+
+
+################################################
+# Helper funcs
+################################################
+def file_hash(fname):
+    h = hashlib.sha256()
+    with open(fname, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def pass_key(fname, *items):
+    """
+    Identify a pass by everything that determines its output: the content of
+    its rocprof input file fname (after filtering), if any, and items such as
+    the profiled command or a benchmark's options.
+    """
+    h = hashlib.sha256()
+    if fname:
+        h.update(file_hash(fname).encode("utf-8"))
+    for item in items:
+        h.update(b"\0" + str(item).encode("utf-8"))
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    Record of completed profiling passes of a workload (--resume). Each
+    output file maps to the key of the pass that produced it and to its own
+    hash, so a pass is only skipped when its input is unchanged and its output
+    is intact.
+    """
+
+    def __init__(self, workload_dir, resume):
+        self.workload_dir = workload_dir
+        self.path = os.path.join(workload_dir, MANIFEST_FILE)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if resume and os.path.isfile(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print("WARNING: Ignoring corrupt {}".format(self.path))
+
+    def _output(self, output):
+        return os.path.relpath(output, self.workload_dir)
+
+    def is_done(self, output, key):
+        entry = self.entries.get(self._output(output))
+        if not entry or entry["key"] != key or not os.path.isfile(output):
+            return False
+        return entry["sha256"] == file_hash(output)
+
+    def record(self, output, key):
+        with self.lock:
+            self.entries[self._output(output)] = {
+                "key": key,
+                "sha256": file_hash(output),
+                "date": datetime.now().isoformat(timespec="seconds"),
+            }
+            # Write then rename, so a preempted job never leaves half a manifest
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def update(self, output):
+        """
+        Re-hash an output modified in place after its pass (e.g. timestamps).
+        """
+        entry = self.entries.get(self._output(output))
+        if entry:
+            self.record(output, entry["key"])
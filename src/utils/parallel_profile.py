@@ -0,0 +1,267 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+import os
+import sys
+import glob
+import queue
+import shutil
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from omniperf_analyze.utils import file_io, schema
+from utils.manifest import pass_key
+from utils.rocprof_input import RocprofInput
+
+################################################
+# Global vars
+################################################
+
+# Scratch dir, under the workload dir, holding single pass inputs and outputs
+PASS_DIR = "passes"
+
+# Columns rocprof writes around the counters of a pass
+BASE_COLUMNS = [
+    "Index",
+    "KernelName",
+    "gpu-id",
+    "queue-id",
+    "queue-index",
+    "pid",
+    "tid",
+    "grd",
+    "wgr",
+    "lds",
+    "scr",
+    "vgpr",
+    "sgpr",
+    "fbar",
+    "sig",
+    "obj",
+]
+TIMESTAMP_COLUMNS = ["DispatchNs", "BeginNs", "EndNs", "CompleteNs"]
+
+
+################################################
+# Helper funcs
+################################################
+def split_passes(fname, pass_dir):
+    """
+    Split a rocprof input file into one file per "pmc:" line, so each pass can
+    replay the app on its own device. Filters (gpu:, range:, kernel:) are
+    copied into every file. Returns the new files in pass order.
+    """
+    fbase = os.path.splitext(os.path.basename(fname))[0]
+    files = []
+    for i, part in enumerate(RocprofInput.read(fname).split()):
+        out = os.path.join(pass_dir, "{}_{}.txt".format(fbase, i))
+        part.write(out)
+        files.append(out)
+    return files
+
+
+def merge_pass_dfs(parts):
+    """
+    Merge single pass outputs (name: df) into one df, as rocprof does for an
+    input file with multiple "pmc:" lines. Base columns and timestamps come
+    from the 1st pass, counters are appended in pass order. Dispatches are
+    matched on (Index, KernelName, gpu-id), so passes may list them in a
+    different order. Raises ValueError if they don't match.
+    """
+    names = list(parts.keys())
+    merged = parts[names[0]]
+    counters = [c for c in merged.columns if c not in BASE_COLUMNS + TIMESTAMP_COLUMNS]
+    base = merged[[c for c in merged.columns if c not in counters]]
+    index = file_io.dispatch_index(base)
+    dfs = [merged[counters]]
+
+    for name in names[1:]:
+        df = parts[name]
+        df_index = file_io.dispatch_index(df)
+        if not df_index.equals(index):
+            common = df_index.intersection(index, sort=False)
+            if len(common) != len(index) or len(common) != len(df_index):
+                raise ValueError(
+                    "dispatches of {} don't match {}: {} missing, {} extra".format(
+                        name,
+                        names[0],
+                        len(index) - len(common),
+                        len(df_index) - len(common),
+                    )
+                )
+            df = df.set_axis(df_index, axis=0).reindex(index).reset_index(drop=True)
+        dfs.append(
+            df[[c for c in df.columns if c not in BASE_COLUMNS + TIMESTAMP_COLUMNS]]
+        )
+
+    base_cols = [c for c in BASE_COLUMNS if c in base.columns]
+    ts_cols = [c for c in TIMESTAMP_COLUMNS if c in base.columns]
+    return pd.concat([base[base_cols]] + dfs + [base[ts_cols]], axis=1)
+
+
+def add_shared_counters(dfs, shared):
+    """
+    Copy the counters collected for pmc_perf in other passes (shared, by pass
+    name) into the pmc_perf df of dfs, before its timestamps. Dispatches are
+    matched as in file_io.join_pmc_passes(): the counters of dispatches a pass
+    missed are left NaN. Returns the new pmc_perf df and the issues per pass.
+    """
+    ref = dfs[schema.pmc_perf_file_prefix].reset_index(drop=True)
+    parts = OrderedDict([(schema.pmc_perf_file_prefix, ref)])
+    for name, counters in shared.items():
+        if name not in dfs:
+            continue
+        df = dfs[name]
+        counters = [
+            c
+            for c in counters
+            if c in df.columns and not any(c in p.columns for p in parts.values())
+        ]
+        if counters:
+            keys = [k for k in file_io.DISPATCH_KEYS if k in df.columns]
+            parts[name] = df[keys + counters]
+    if len(parts) == 1:
+        return ref, OrderedDict()
+
+    joined, issues = file_io.join_pmc_passes(parts)
+    ts_cols = [c for c in TIMESTAMP_COLUMNS if c in ref.columns]
+    dfs = [ref.drop(columns=ts_cols)]
+    for name in list(parts.keys())[1:]:
+        dfs.append(joined[name].drop(columns=file_io.DISPATCH_KEYS, errors="ignore"))
+    return pd.concat(dfs + [ref[ts_cols]], axis=1), issues
+
+
+def merge_passes(part_csvs, out_csv):
+    """
+    Merge single pass output files into out_csv.
+    """
+    parts = {os.path.basename(f): pd.read_csv(f) for f in part_csvs}
+    try:
+        merged = merge_pass_dfs(parts)
+    except ValueError as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+    merged.to_csv(out_csv, index=False)
+
+
+def run_pass(job, devices, rocprof_cmd, app_cmd, verbose):
+    """
+    Replay the app for a single rocprof input file on the next free device.
+    """
+    fname, out_csv, log = job
+    device = devices.get()
+    try:
+        env = dict(os.environ, HIP_VISIBLE_DEVICES=str(device))
+        if verbose:
+            print("pmc file: {} on device {}".format(os.path.basename(fname), device))
+        with open(log, "w") as fd:
+            p = subprocess.run(
+                [
+                    rocprof_cmd,
+                    "-i",
+                    fname,
+                    "--timestamp",
+                    "on",
+                    "-o",
+                    out_csv,
+                    '"' + app_cmd + '"',
+                ],
+                stdout=fd,
+                stderr=subprocess.STDOUT,
+                env=env,
+            )
+    finally:
+        devices.put(device)
+    return p.returncode
+
+
+def profile_passes(workload_dir, gpus, rocprof_cmd, app_cmd, verbose, manifest=None):
+    """
+    Run every pass of every perfmon file, distributed over the given devices.
+    Outputs are written and merged exactly as in a serial run. Passes already
+    recorded in the manifest (--resume) are skipped.
+    """
+    # NB: kept after a failure, so --resume can reuse the finished passes
+    pass_dir = os.path.join(workload_dir, PASS_DIR)
+    os.makedirs(pass_dir, exist_ok=True)
+
+    jobs = []
+    merges = []
+    for fname in sorted(glob.glob(workload_dir + "/perfmon/*.txt")):
+        fbase = os.path.splitext(os.path.basename(fname))[0]
+        out_csv = os.path.join(workload_dir, fbase + ".csv")
+        key = pass_key(fname, app_cmd)
+        if manifest and manifest.is_done(out_csv, key):
+            print("Skipping {} (already profiled)".format(os.path.basename(fname)))
+            continue
+
+        parts = []
+        for part in split_passes(fname, pass_dir):
+            part_csv = os.path.splitext(part)[0] + ".csv"
+            part_key = pass_key(part, app_cmd)
+            if not (manifest and manifest.is_done(part_csv, part_key)):
+                jobs.append((part, part_csv, os.path.splitext(part)[0] + ".log"))
+            parts.append((part_csv, part_key))
+        if parts:
+            merges.append((parts, out_csv, key))
+
+    devices = queue.Queue()
+    for gpu in gpus:
+        devices.put(gpu)
+
+    print(
+        "Running {} passes on {} devices: {}".format(
+            len(jobs), len(gpus), " ".join(str(g) for g in gpus)
+        )
+    )
+
+    def run(job):
+        rc = run_pass(job, devices, rocprof_cmd, app_cmd, verbose)
+        if manifest and rc == 0 and os.path.isfile(job[1]):
+            manifest.record(job[1], pass_key(job[0], app_cmd))
+        return rc
+
+    with ThreadPoolExecutor(max_workers=len(gpus)) as pool:
+        returncodes = list(pool.map(run, jobs))
+
+    failed = False
+    for job, rc in zip(jobs, returncodes):
+        if rc != 0 or not os.path.isfile(job[1]):
+            failed = True
+            print(
+                "Error: pass {} failed, see {}".format(os.path.basename(job[0]), job[2])
+            )
+            with open(job[2], "r") as fd:
+                print(fd.read())
+    if failed:
+        sys.exit(1)
+
+    for parts, out_csv, key in merges:
+        merge_passes([part_csv for part_csv, part_key in parts], out_csv)
+        if manifest:
+            manifest.record(out_csv, key)
+
+    shutil.rmtree(pass_dir)
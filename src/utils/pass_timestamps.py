@@ -0,0 +1,134 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+import os
+import sys
+import glob
+
+import pandas as pd
+
+from omniperf_analyze.utils.file_io import DISPATCH_KEYS
+from utils.parallel_profile import BASE_COLUMNS, TIMESTAMP_COLUMNS
+
+################################################
+# Global vars
+################################################
+
+TIMESTAMP_METHODS = ["median", "min", "light"]
+
+# Duration coefficient of variation across passes above which a dispatch is
+# reported as noisy
+CV_THRESHOLD = 0.1
+
+
+################################################
+# Helper funcs
+################################################
+def read_pass_timings(workload_dir):
+    """
+    Read the dispatch timestamps of every counter pass output of a workload.
+    Returns one frame with a row per (pass, dispatch), tagged with the number
+    of counters the pass collected.
+    """
+    frames = []
+    for fname in sorted(glob.glob(workload_dir + "/perfmon/*.txt")):
+        fbase = os.path.splitext(os.path.basename(fname))[0]
+        out_csv = os.path.join(workload_dir, fbase + ".csv")
+        if not os.path.isfile(out_csv):
+            continue
+        df = pd.read_csv(out_csv)
+        if not set(DISPATCH_KEYS + ["BeginNs", "EndNs"]).issubset(df.columns):
+            continue
+        counters = [c for c in df.columns if c not in BASE_COLUMNS + TIMESTAMP_COLUMNS]
+        df = df[DISPATCH_KEYS + ["BeginNs", "EndNs"]].copy()
+        df["pass"] = fbase
+        df["counters"] = len(counters)
+        frames.append(df)
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def derive_timestamps(workload_dir, method="median", threshold=CV_THRESHOLD):
+    """
+    Write timestamps.csv from the counter passes, instead of replaying the app
+    once more. For each dispatch of pmc_perf.csv, the (BeginNs, EndNs) sample
+    of one pass is kept:
+      median: the pass closest to the median duration
+      min:    the pass with the shortest duration
+      light:  the pass collecting the fewest counters (median if it misses
+              the dispatch)
+    The duration variation across passes is recorded (DurationCV, NumPasses)
+    and dispatches varying more than threshold are reported.
+    """
+    if method not in TIMESTAMP_METHODS:
+        print("Error: timestamps method must be one of {}".format(TIMESTAMP_METHODS))
+        sys.exit(1)
+
+    df = read_pass_timings(workload_dir)
+    if df is None:
+        print("Error: no counter pass output to derive timestamps from")
+        sys.exit(1)
+    df["duration"] = df["EndNs"] - df["BeginNs"]
+
+    group = df.groupby(DISPATCH_KEYS, sort=False)["duration"]
+    target = group.transform("min" if method == "min" else "median")
+    df["dist"] = (df["duration"] - target).abs()
+    df["prio"] = 0
+    if method == "light":
+        df["prio"] = (df["counters"] != df["counters"].min()).astype(int)
+
+    # Keep the best sample of each dispatch
+    best = df.sort_values(["prio", "dist"], kind="mergesort").drop_duplicates(
+        DISPATCH_KEYS
+    )
+    stats = pd.DataFrame(
+        {
+            "DurationCV": (group.std(ddof=0) / group.mean()).fillna(0.0),
+            "NumPasses": group.count(),
+        }
+    ).reset_index()
+
+    # Same dispatch order as pmc_perf.csv, where the timestamps are replaced
+    dispatches = pd.read_csv(
+        os.path.join(workload_dir, "pmc_perf.csv"), usecols=DISPATCH_KEYS
+    )
+    stamps = dispatches.merge(
+        best[DISPATCH_KEYS + ["BeginNs", "EndNs"]], on=DISPATCH_KEYS, how="left"
+    ).merge(stats, on=DISPATCH_KEYS, how="left")
+    stamps.to_csv(os.path.join(workload_dir, "timestamps.csv"), index=False)
+
+    noisy = stamps[stamps["DurationCV"] > threshold]
+    print(
+        "Derived timestamps ({}) from {} passes, max duration CV {:.1%}".format(
+            method, df["pass"].nunique(), stamps["DurationCV"].max()
+        )
+    )
+    if len(noisy.index):
+        print(
+            "WARNING: {} of {} dispatches vary by more than {:.0%} across passes, "
+            "consider the timestamps replay for accurate timing.".format(
+                len(noisy.index), len(stamps.index), threshold
+            )
+        )
+    return stamps
@@ -21,9 +21,10 @@
 ################################################################################
 
 import sys, os, pathlib, shutil, subprocess, argparse, glob, re
-import numpy as np
 import math
 
+from utils.rocprof_input import RocprofInput
+
 prog = "omniperf"
 
 # Per IP block max number of simulutaneous counters
@@ -71,9 +72,36 @@ perfmon_config = {
 }
 
 
-def perfmon_coalesce(pmc_files_list, workload_dir, soc):
+# Passes of level counters. A level counter is sampled by SQ_ACCUM_PREV_HIRES,
+# programmed right after it, and rocprof names the accumulated column after the
+# accumulator whatever the level, so each level counter keeps a pass of its
+# own. The counters of the listed IP blocks may fill the slots left free in
+# those passes; they're appended after the accumulator so it still samples
+# the level counter. The lists are the same for now: every block with counter
+# slots in perfmon_config (GDS counters are all SQ_* and counted as SQ). A SoC
+# that can't program a block alongside the accumulator would leave it out.
+level_pass_config = {
+    "mi50": {
+        "shared_blocks": ["SQ", "TA", "TD", "TCP", "TCC", "CPC", "CPF", "SPI", "GRBM"],
+    },
+    "mi100": {
+        "shared_blocks": ["SQ", "TA", "TD", "TCP", "TCC", "CPC", "CPF", "SPI", "GRBM"],
+    },
+    "mi200": {
+        "shared_blocks": ["SQ", "TA", "TD", "TCP", "TCC", "CPC", "CPF", "SPI", "GRBM"],
+    },
+}
 
-    workload_perfmon_dir = workload_dir + "/perfmon"
+LEVEL_ACCUMULATOR = "SQ_ACCUM_PREV_HIRES"
+
+
+def counter_block(counter):
+    IP_block = counter.split(sep="_")[0].upper()
+    # SQC and SQ belong to the IP block, coalesce them
+    return "SQ" if IP_block == "SQC" else IP_block
+
+
+def perfmon_coalesce(pmc_files_list, workload_dir, soc):
 
     # match pattern for pmc counters
     mpattern = r"^pmc:(.*)"
@@ -90,6 +118,7 @@ def perfmon_coalesce(pmc_files_list, workload_dir, soc):
             ("CPF", []),
             ("GDS", []),
             ("TCC2", {}),  # per-channel TCC perfmon
+            ("LEVEL", {}),  # level counter: counters of its pass
         ]
     )
     for ch in range(perfmon_config[soc]["TCC_channels"]):
@@ -113,19 +142,13 @@ def perfmon_coalesce(pmc_files_list, workload_dir, soc):
 
             # we have found all the counters, store them in buckets
             counters = m.group(1).split()
-            if "SQ_ACCUM_PREV_HIRES" in counters:
-                # save  all level counters separately
+            if LEVEL_ACCUMULATOR in counters:
+                # save  all level counters separately, scheduled with the others
+                # by perfmon_schedule()
 
-                nindex = counters.index("SQ_ACCUM_PREV_HIRES")
+                nindex = counters.index(LEVEL_ACCUMULATOR)
                 level_counter = counters[nindex - 1]
-
-                # Save to level counter file, file name = level counter name
-                fd = open(workload_perfmon_dir + "/" + level_counter + ".txt", "w")
-                fd.write(stext + "\n\n")
-                fd.write("gpu:\n")
-                fd.write("range:\n")
-                fd.write("kernel:\n")
-                fd.close()
+                pmc_list["LEVEL"][level_counter] = counters
 
                 continue
 
@@ -166,70 +189,187 @@ def perfmon_coalesce(pmc_files_list, workload_dir, soc):
     for ch in range(perfmon_config[soc]["TCC_channels"]):
         pmc_list["TCC2"][str(ch)].sort()
 
+    # counters of level counter lines are collected for pmc_perf there
+    collected = set(c for counters in pmc_list["LEVEL"].values() for c in counters)
+    for key in slot_keys(pmc_list):
+        pmc_list[key] = [c for c in pmc_list[key] if c not in collected]
+
     return pmc_list
 
 
-def perfmon_emit(pmc_list, workload_dir, soc):
+def slot_keys(pmc_list):
+    """
+    IP blocks scheduled by slot, per-channel TCC counters aside.
+    """
+    return [key for key in pmc_list if key not in ["TCC2", "LEVEL"]]
+
+
+def level_slots(pmc_list, soc):
+    """
+    Slots left free per IP block in each level counter pass, by the counters
+    of its own line. Blocks not shared (level_pass_config) have none.
+    """
+    shared = level_pass_config[soc]["shared_blocks"]
+    slots = []
+    for counters in pmc_list["LEVEL"].values():
+        used = {}
+        for counter in counters:
+            block = counter_block(counter)
+            used[block] = used.get(block, 0) + 1
+        slots.append(
+            {
+                key: (
+                    max(0, perfmon_config[soc][key] - used.get(key, 0))
+                    if key in shared
+                    else 0
+                )
+                for key in slot_keys(pmc_list)
+            }
+        )
+    return slots
+
+
+def perfmon_lower_bound(pmc_list, soc):
+    """
+    Minimum number of passes any schedule needs for the coalesced counters,
+    one pass per level counter included.
+    """
+    nlevel = len(pmc_list["LEVEL"])
+    shared = level_slots(pmc_list, soc)
+
+    # non-TCC counters: each IP block collects up to its limit per pass, after
+    # filling the free slots of the level passes
+    bound = [
+        math.ceil(
+            max(0, len(pmc_list[key]) - sum(s[key] for s in shared))
+            / perfmon_config[soc][key]
+        )
+        for key in pmc_list
+        if key not in ["TCC", "TCC2", "LEVEL"]
+    ]
 
-    workload_perfmon_dir = workload_dir + "/perfmon"
+    # TCC counters: an aggregated counter takes a slot in every channel, while
+    # a per-channel counter only takes a slot in its own channel.
+    N = perfmon_config[soc]["TCC"]
+    tcc_slots = [
+        len(pmc_list["TCC"]) + len(pmc_list["TCC2"][str(ch)])
+        for ch in range(perfmon_config[soc]["TCC_channels"])
+    ]
+    bound.append(math.ceil(max(0, max(tcc_slots) - sum(s["TCC"] for s in shared)) / N))
+
+    return max(bound) + nlevel
+
+
+def fill_passes(passes, slots, counters):
+    """
+    Add counters to the passes in order, up to the given slots per pass.
+    Returns the slots left free in each pass.
+    """
+    free = []
+    idx = 0
+    for i in range(len(passes)):
+        added = counters[idx : idx + slots[i]]
+        passes[i] += added
+        idx += len(added)
+        free.append(slots[i] - len(added))
+    return free
+
+
+def perfmon_schedule(pmc_list, soc):
+    """
+    Assign the coalesced counters to as few passes as possible.
+
+    Per IP block limits are independent of each other, so the number of passes
+    is set by the most loaded block (or TCC channel). Each block is packed into
+    that many passes, then into the free slots of the level counter passes;
+    per-channel TCC counters fill the slots left over by the aggregated TCC
+    counters. Returns the list of passes, level counter passes last, and the
+    lower bound.
+    """
+    lower_bound = perfmon_lower_bound(pmc_list, soc)
+    npass = lower_bound - len(pmc_list["LEVEL"])
+    passes = [[] for i in range(npass)] + [
+        list(counters) for counters in pmc_list["LEVEL"].values()
+    ]
 
-    # Calculate the minimum number of iteration to save the pmc counters
-    # non-TCC counters
-    pmc_cnt = [
-        len(pmc_list[key]) / perfmon_config[soc][key]
-        for key in pmc_list
-        if key not in ["TCC", "TCC2"]
+    # Slots of each block per pass: all of them in counter passes, those left
+    # free in level counter passes
+    slots = [
+        {key: perfmon_config[soc][key] for key in slot_keys(pmc_list)}
+        for i in range(npass)
     ]
+    slots += level_slots(pmc_list, soc)
 
-    # TCC counters
-    tcc_channels = perfmon_config[soc]["TCC_channels"]
+    # Add all non-TCC counters
+    for key in slot_keys(pmc_list):
+        if key != "TCC":
+            fill_passes(passes, [s[key] for s in slots], pmc_list[key])
 
-    tcc_cnt = len(pmc_list["TCC"]) / perfmon_config[soc]["TCC"]
-    tcc2_cnt = (
-        np.array([len(pmc_list["TCC2"][str(ch)]) for ch in range(tcc_channels)])
-        / perfmon_config[soc]["TCC"]
-    )
+    # TCC aggregated counters
+    tcc_free = fill_passes(passes, [s["TCC"] for s in slots], pmc_list["TCC"])
 
-    # Total number iterations to write pmc: counters line
-    niter = max(math.ceil(max(pmc_cnt)), math.ceil(tcc_cnt) + math.ceil(max(tcc2_cnt)))
+    # TCC per-channel counters. Channel lists are sorted, so the same counter
+    # lands in the same pass for all channels.
+    tcc2 = [[] for i in range(len(passes))]
+    for ch in range(perfmon_config[soc]["TCC_channels"]):
+        counters = pmc_list["TCC2"][str(ch)]
+        if sum(tcc_free) < len(counters):
+            print("Error: Unable to schedule TCC counters of channel {}".format(ch))
+            sys.exit(1)
+        fill_passes(tcc2, tcc_free, counters)
+    for i in range(len(passes)):
+        passes[i] += tcc2[i]
 
-    # Emit PMC counters into pmc config file
-    fd = open(workload_perfmon_dir + "/pmc_perf.txt", "w")
+    return passes, lower_bound
 
-    tcc2_index = 0
-    for iter in range(niter):
-        # Prefix
-        line = "pmc: "
 
-        # Add all non-TCC counters
-        for key in pmc_list:
-            if key not in ["TCC", "TCC2"]:
-                N = perfmon_config[soc][key]
-                ip_counters = pmc_list[key][iter * N : iter * N + N]
-                if ip_counters:
-                    line = line + " " + " ".join(ip_counters)
+def perfmon_emit(pmc_list, workload_dir, soc, filters=None):
 
-        # Add TCC counters
-        N = perfmon_config[soc]["TCC"]
-        tcc_counters = pmc_list["TCC"][iter * N : iter * N + N]
+    workload_perfmon_dir = workload_dir + "/perfmon"
 
-        if not tcc_counters:
-            # TCC per-channel counters
-            for ch in range(perfmon_config[soc]["TCC_channels"]):
-                tcc_counters += pmc_list["TCC2"][str(ch)][
-                    tcc2_index * N : tcc2_index * N + N
-                ]
+    passes, lower_bound = perfmon_schedule(pmc_list, soc)
+    npass = len(passes) - len(pmc_list["LEVEL"])
 
-            tcc2_index += 1
+    # Emit PMC counters into pmc config file
+    RocprofInput(passes[:npass], **(filters or {})).write(
+        workload_perfmon_dir + "/pmc_perf.txt"
+    )
 
-        # TCC aggregated counters
-        line = line + " " + " ".join(tcc_counters)
-        fd.write(line + "\n")
+    # Save to level counter file, file name = level counter name
+    for level_counter, counters in zip(pmc_list["LEVEL"], passes[npass:]):
+        RocprofInput([counters], **(filters or {})).write(
+            workload_perfmon_dir + "/" + level_counter + ".txt"
+        )
 
-    fd.write("\ngpu:\n")
-    fd.write("range:\n")
-    fd.write("kernel:\n")
-    fd.close()
+    print(
+        "Scheduled {} counter passes (lower bound: {})".format(len(passes), lower_bound)
+    )
+    return len(passes)
+
+
+def shared_counters(fname):
+    """
+    Counters a level counter pass collects for pmc_perf: all but the level
+    counter and its accumulator.
+    """
+    counters = RocprofInput.read(fname).passes[0]
+    if LEVEL_ACCUMULATOR not in counters:
+        return []
+    nindex = counters.index(LEVEL_ACCUMULATOR)
+    return counters[: nindex - 1] + counters[nindex + 1 :]
+
+
+def workload_shared_counters(workload_dir):
+    """
+    Shared counters of each level counter pass of a workload, by pass output
+    name (its perfmon file name).
+    """
+    shared = {}
+    for fname in sorted(glob.glob(workload_dir + "/perfmon/*.txt")):
+        counters = shared_counters(fname)
+        if counters:
+            shared[os.path.splitext(os.path.basename(fname))[0]] = counters
+    return shared
 
 
 def perfmon_filter(workload_dir, perfmon_dir, args):
@@ -238,11 +378,14 @@ def perfmon_filter(workload_dir, perfmon_dir, args):
     soc = args.target
 
     # Initialize directories
-    # TODO: Modify this so that data is appended to previous?
+    # NB: with --resume keep the outputs of previous passes, only the perfmon
+    #     files are always regenerated.
     if not os.path.isdir(workload_dir):
         os.makedirs(workload_dir)
-    else:
+    elif not getattr(args, "resume", False):
         shutil.rmtree(workload_dir)
+    elif os.path.isdir(workload_perfmon_dir):
+        shutil.rmtree(workload_perfmon_dir)
 
     os.makedirs(workload_perfmon_dir)
 
@@ -269,19 +412,24 @@ def perfmon_filter(workload_dir, perfmon_dir, args):
         # default: take all perfmons
         pmc_files_list = ref_pmc_files_list
 
+    # Kernel and dispatch filtering, written into every pmc file
+    filters = {
+        "kernel": getattr(args, "kernel", None),
+        "range": getattr(args, "dispatch", None),
+    }
+
     # Coalesce and writeback workload specific perfmon
     pmc_list = perfmon_coalesce(pmc_files_list, workload_dir, soc)
-    perfmon_emit(pmc_list, workload_dir, soc)
+    perfmon_emit(pmc_list, workload_dir, soc, filters)
 
 
-def pmc_filter(workload_dir, perfmon_dir, soc):
+def pmc_filter(workload_dir, perfmon_dir, soc, filters=None):
 
     workload_perfmon_dir = workload_dir + "/perfmon"
 
-    if not os.path.isdir(workload_perfmon_dir):
-        os.makedirs(workload_perfmon_dir)
-    else:
+    if os.path.isdir(workload_perfmon_dir):
         shutil.rmtree(workload_perfmon_dir)
+    os.makedirs(workload_perfmon_dir)
 
     ref_pmc_files_list = glob.glob(perfmon_dir + "/roofline/" + "pmc_roof_perf.txt")
     # ref_pmc_files_list += glob.glob(perfmon_dir + "/" + soc + "/pmc_*_perf*.txt")
@@ -290,4 +438,4 @@ def pmc_filter(workload_dir, perfmon_dir, soc):
 
     # Coalesce and writeback workload specific perfmon
     pmc_list = perfmon_coalesce(pmc_files_list, workload_dir, soc)
-    perfmon_emit(pmc_list, workload_dir, soc)
+    perfmon_emit(pmc_list, workload_dir, soc, filters)
@@ -37,6 +37,8 @@ import pylab
 from dataclasses import dataclass
 import csv
 
+from utils import roofline_batch
+
 
 ################################################
 # Global vars
@@ -564,10 +566,29 @@ def empirical_roof(args):
     }
 
     inputs["sort"] = args.sort.lower()
-    inputs["mem"] = args.mem_level.upper()
 
     if inputs["sort"] != "kernels" and inputs["sort"] != "dispatches":
         sys.exit("Invalid sort. Must be either 'kernels' or 'dispatches'")
+
+    if soc not in SUPPORTED_SOC:
+        sys.exit("SoC not yet supported for Roofline Analysis")
+
+    # Several datatypes, memory levels or a raster format go to the batch renderer
+    if len(args.mem_level) > 1 or args.roof_dtype or args.roof_format != "pdf":
+        roofline_batch.batch_roof(
+            args.path,
+            dtypes=args.roof_dtype,
+            mem_levels=args.mem_level,
+            sort=inputs["sort"],
+            device=args.device,
+            axes=args.axes,
+            fmt=args.roof_format,
+            num_jobs=args.roof_jobs,
+            verbose=args.verbose,
+        )
+        return
+
+    inputs["mem"] = args.mem_level[0].upper()
     if (
         inputs["mem"] != "HBM"
         and inputs["mem"] != "VL1D"
@@ -593,9 +614,6 @@ def empirical_roof(args):
 
     # device_list = [int(item) for item in args.device.split(',')]
 
-    if soc not in SUPPORTED_SOC:
-        sys.exit("SoC not yet supported for Roofline Analysis")
-
     # Basic Info
     print("Path: ", inputs["path"])
     print("Target: ", soc)
@@ -0,0 +1,197 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+import os
+import re
+import glob
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from omniperf_analyze.utils import file_io, schema
+from utils import parallel_profile
+from utils.perfagg import workload_shared_counters
+
+################################################
+# Global vars
+################################################
+
+# Seconds between checks for newly completed passes
+POLL_INTERVAL = 5.0
+
+
+################################################
+# Helper funcs
+################################################
+class PmcWatcher:
+    """
+    Stream pass outputs into the merged pmc store while profiling (--stream).
+    Passes are picked up as soon as they're recorded in the manifest, each
+    output is only parsed once, and the store is rewritten with the counters
+    collected so far. Analyze mode can then show every panel whose counters
+    are complete before the last pass is done.
+    """
+
+    def __init__(self, workload_dir, manifest, interval=POLL_INTERVAL, verbose=0):
+        self.workload_dir = workload_dir
+        self.manifest = manifest
+        self.interval = interval
+        self.verbose = verbose
+        # Parsed outputs: name (relative to the workload dir, no ext): (sha256, df)
+        self.outputs = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def expected_passes(self):
+        """
+        Pass outputs the perfmon files will produce, pmc_perf first.
+        """
+        names = sorted(
+            os.path.splitext(os.path.basename(f))[0]
+            for f in glob.glob(self.workload_dir + "/perfmon/*.txt")
+        )
+        return sorted(names, key=lambda n: n != schema.pmc_perf_file_prefix)
+
+    def ingest(self, names):
+        """
+        Parse the outputs recorded in the manifest since the last call. Returns
+        True if any is new or changed.
+        """
+        with self.manifest.lock:
+            entries = dict(self.manifest.entries)
+
+        changed = False
+        for output, entry in entries.items():
+            name, ext = os.path.splitext(output)
+            if ext != ".csv" or not (
+                name in names or os.path.dirname(name) == parallel_profile.PASS_DIR
+            ):
+                continue
+            if name in self.outputs and self.outputs[name][0] == entry["sha256"]:
+                continue
+            df = pd.read_csv(os.path.join(self.workload_dir, output))
+            self.outputs[name] = (entry["sha256"], df)
+            changed = True
+        return changed
+
+    def collect(self, names):
+        """
+        Gather the streamed outputs of each pass. A pass split over devices
+        (--gpus) contributes the counters of its finished parts. Returns the
+        pass dfs, the source files and the passes still pending.
+        """
+        dfs = OrderedDict()
+        sources = []
+        pending = []
+        for name in names:
+            if name in self.outputs:
+                dfs[name] = self.outputs[name][1]
+                sources.append(name)
+                continue
+
+            pending.append(name)
+            pattern = re.compile(
+                re.escape(os.path.join(parallel_profile.PASS_DIR, name)) + r"_(\d+)$"
+            )
+            parts = sorted(
+                (int(m.group(1)), n)
+                for n, m in ((n, pattern.match(n)) for n in self.outputs)
+                if m
+            )
+            if parts:
+                dfs[name] = parallel_profile.merge_pass_dfs(
+                    OrderedDict((n, self.outputs[n][1]) for i, n in parts)
+                )
+                sources += [n for i, n in parts]
+
+        # NB: analyze keys dispatches and timings on pmc_perf, borrow the base
+        #     columns of another pass until it's done
+        if dfs and schema.pmc_perf_file_prefix not in dfs:
+            df = next(iter(dfs.values()))
+            base = [
+                c
+                for c in parallel_profile.BASE_COLUMNS
+                + parallel_profile.TIMESTAMP_COLUMNS
+                if c in df.columns
+            ]
+            dfs[schema.pmc_perf_file_prefix] = df[base]
+            dfs.move_to_end(schema.pmc_perf_file_prefix, last=False)
+
+        # Counters of pmc_perf collected in level counter passes, as profile
+        # mode merges them once done. Dispatch issues are reported by the join.
+        if dfs:
+            dfs[schema.pmc_perf_file_prefix] = parallel_profile.add_shared_counters(
+                dfs, workload_shared_counters(self.workload_dir)
+            )[0]
+        return dfs, sources, pending
+
+    def poll(self):
+        """
+        Update the store if passes completed since the last poll.
+        """
+        names = self.expected_passes()
+        if not self.ingest(names):
+            return False
+        dfs, sources, pending = self.collect(names)
+        if not dfs:
+            return False
+
+        final_df, issues = file_io.join_pmc_passes(dfs)
+        # NB: rewritten after every pass, skip compression to keep up
+        file_io.write_pmc_store(
+            self.workload_dir, final_df, sources, issues, pending, compress=False
+        )
+        print(
+            "Streamed {} of {} passes to {}".format(
+                len(names) - len(pending), len(names), file_io.MERGED_PMC_FILE
+            )
+        )
+        if self.verbose and pending:
+            print("Pending passes: {}".format(" ".join(pending)))
+        return True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.poll_safe()
+
+    def poll_safe(self):
+        # NB: never let a streaming error stop profiling, the final store is
+        #     written from the csv files anyway
+        try:
+            self.poll()
+        except Exception as e:
+            print("WARNING: Unable to stream pass outputs: {}".format(e))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop watching, after picking up the last completed passes.
+        """
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.poll_safe()
@@ -0,0 +1,159 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+"""
+Panel metrics pre-computed at import time for the Grafana dashboards.
+
+Metrics are evaluated with the same panel configs and evaluator as
+omniperf analyze, once for all kernels and once for each top kernel, in
+each normalization. Every normalization gets its own collection, holding one
+document per (kernel, metric).
+"""
+
+import os
+import copy
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common import OMNIPERF_HOME
+from omniperf_analyze.utils import parser, file_io, schema
+
+################################################
+# Global vars
+################################################
+
+COLLECTION_PREFIX = "preagg_"
+NORMAL_UNITS = ["per_wave", "per_cycle", "per_second", "per_kernel"]
+TOP_KERNELS = 10  # kernels pre-aggregated on their own, by total duration
+ALL_KERNELS = "ALL"
+
+# Workloads already loaded by this (pool worker) process
+_loaded = {}
+
+
+################################################
+# Helper funcs
+################################################
+def collection_names(normal_units=None):
+    normal_units = normal_units if normal_units else NORMAL_UNITS
+    return [COLLECTION_PREFIX + unit for unit in normal_units]
+
+
+def load_workload(path, kernel_verbose):
+    """
+    Load the panel templates and pmc data of a workload, once per process.
+    """
+    key = (path, kernel_verbose)
+    if key not in _loaded:
+        sys_info = file_io.load_sys_info(Path(path, "sysinfo.csv"))
+        arch = sys_info.iloc[0]["gpu_soc"]
+        soc_spec_df = file_io.load_soc_params(OMNIPERF_HOME.joinpath("soc_params"))
+
+        ac = schema.ArchConfig()
+        ac.panel_configs = file_io.load_panel_configs(
+            OMNIPERF_HOME.joinpath("omniperf_analyze", "configs", arch)
+        )
+        parser.build_dfs(ac, None)
+        raw_pmc = file_io.create_df_pmc(path, kernel_verbose)
+        _loaded[key] = (ac, sys_info, file_io.get_soc_params(soc_spec_df, arch), raw_pmc)
+    return _loaded[key]
+
+
+def top_kernels(raw_pmc, num_results):
+    """
+    Names of the kernels with the largest total duration.
+    """
+    pmc = raw_pmc[schema.pmc_perf_file_prefix]
+    duration = (pmc["EndNs"] - pmc["BeginNs"]).groupby(pmc["KernelName"]).sum()
+    return list(duration.sort_values(ascending=False).index[:num_results])
+
+
+def aggregate(job):
+    """
+    Evaluate all metric tables for one (workload, normalization, kernel).
+    Returns the documents of the normalization collection.
+    """
+    path, kernel_verbose, normal_unit, kernel = job
+    ac, sys_info, soc_spec, raw_pmc = load_workload(path, kernel_verbose)
+
+    dfs = copy.deepcopy(ac.dfs)
+    parser.build_metric_value_string(dfs, ac.dfs_type, normal_unit)
+    # NB: eval_metric() writes results through iterrows() rows, which only
+    #     reach a frame held in one block. Copy after building the strings, as
+    #     analyze does, to consolidate the columns they replaced.
+    dfs = copy.deepcopy(dfs)
+    if kernel != ALL_KERNELS:
+        raw_pmc = raw_pmc.loc[
+            raw_pmc[schema.pmc_perf_file_prefix]["KernelName"] == kernel
+        ]
+    parser.eval_metric(dfs, ac.dfs_type, sys_info.iloc[0], soc_spec, raw_pmc, False)
+
+    docs = []
+    for id, df in dfs.items():
+        if ac.dfs_type[id] != "metric_table" or df.empty:
+            continue
+        df = df.drop(["coll_level", "Tips"], axis=1, errors="ignore")
+        df = df.astype(object).where(df.notna(), "")
+        for metric_id, row in df.iterrows():
+            doc = {"Kernel": kernel, "Table ID": id, "Metric ID": metric_id}
+            for k, v in row.items():
+                # NB: the evaluator may hand back numpy scalars, bson wants builtins
+                doc[k] = v.item() if isinstance(v, np.generic) else v
+            docs.append(doc)
+    return docs
+
+
+def preaggregate(path, kernel_verbose, normal_units=None, num_jobs=0):
+    """
+    Compute the documents of each pre-aggregated collection of a workload,
+    spreading (normalization, kernel) evaluations over num_jobs processes.
+    Returns {collection name: documents}.
+    """
+    path = str(path)
+    normal_units = normal_units if normal_units else NORMAL_UNITS
+    raw_pmc = load_workload(path, kernel_verbose)[3]
+    kernels = [ALL_KERNELS] + top_kernels(raw_pmc, TOP_KERNELS)
+    jobs = [(path, kernel_verbose, u, k) for u in normal_units for k in kernels]
+
+    num_jobs = num_jobs if num_jobs > 0 else (os.cpu_count() or 1)
+    num_jobs = min(num_jobs, len(jobs))
+    try:
+        if num_jobs <= 1:
+            results = [aggregate(job) for job in jobs]
+        else:
+            # NB: spawn, as imports run this from threads holding live
+            #     connections, which forked workers must not inherit
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=num_jobs, mp_context=context) as pool:
+                results = list(pool.map(aggregate, jobs))
+    finally:
+        _loaded.pop((path, kernel_verbose), None)
+
+    collections = {}
+    for unit, name in zip(normal_units, collection_names(normal_units)):
+        docs = [d for job, r in zip(jobs, results) if job[2] == unit for d in r]
+        collections[name] = docs
+    return collections
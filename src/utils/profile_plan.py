@@ -0,0 +1,129 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+import os
+import math
+import glob
+import argparse
+import tempfile
+
+from utils.perfagg import perfmon_filter, pmc_filter
+from utils.rocprof_input import RocprofInput
+
+################################################
+# Global vars
+################################################
+
+# Cost model of a profiling run, relative to one uninstrumented run of the app.
+# NB: conservative defaults. rocprof serializes kernel dispatches once counters
+#     are collected, so counter passes cost more than the timestamps pass.
+ROCPROF_STARTUP_S = 2.0
+PMC_PASS_SLOWDOWN = 1.3
+TIMESTAMP_PASS_SLOWDOWN = 1.1
+
+# Wall time of the roofline micro benchmark on one device
+ROOFLINE_S = 60.0
+
+
+################################################
+# Helper funcs
+################################################
+def read_passes(fname):
+    """
+    Return the counters of every "pmc:" line in a rocprof input file.
+    Each line is one replay of the application.
+    """
+    return RocprofInput.read(fname).passes
+
+
+def build_plan(soc, ipblocks, perfmon_dir, roof_only=False):
+    """
+    Run the perfmon filtering of profile mode in a scratch directory and
+    collect the resulting passes per rocprof input file.
+    """
+    with tempfile.TemporaryDirectory(prefix="omniperf_plan_") as tmp:
+        workload_dir = os.path.join(tmp, soc)
+        if roof_only:
+            pmc_filter(workload_dir, perfmon_dir, soc)
+        else:
+            args = argparse.Namespace(
+                target=soc, ipblocks=list(ipblocks) if ipblocks else None
+            )
+            perfmon_filter(workload_dir, perfmon_dir, args)
+
+        plan = {}
+        for fname in sorted(glob.glob(workload_dir + "/perfmon/*.txt")):
+            plan[os.path.basename(fname)] = read_passes(fname)
+    return plan
+
+
+def estimate(plan, baseline_time, timestamps, roofline, ngpus=1):
+    """
+    Estimate profiling wall time in seconds from one uninstrumented run.
+    Counter passes are spread over ngpus devices (--gpus).
+    """
+    npass = sum(len(passes) for passes in plan.values())
+    rounds = math.ceil(npass / ngpus)
+    est = {
+        "pmc": rounds * (baseline_time * PMC_PASS_SLOWDOWN + ROCPROF_STARTUP_S),
+        "timestamps": 0.0,
+        "roofline": ROOFLINE_S if roofline else 0.0,
+    }
+    if timestamps:
+        est["timestamps"] = baseline_time * TIMESTAMP_PASS_SLOWDOWN + ROCPROF_STARTUP_S
+    est["total"] = est["pmc"] + est["timestamps"] + est["roofline"]
+    return est
+
+
+def format_time(seconds):
+    h, rem = divmod(int(round(seconds)), 3600)
+    m, s = divmod(rem, 60)
+    return "{:d}h {:02d}m {:02d}s".format(h, m, s)
+
+
+def show_plan(plan, est, timestamps, roofline, verbose):
+    npass = sum(len(passes) for passes in plan.values())
+    print("\n{} rocprof input files, {} counter passes".format(len(plan), npass))
+    for fname, passes in plan.items():
+        print("  {}".format(fname))
+        for i, counters in enumerate(passes):
+            print("    pass {:<3} {:>3} counters".format(i, len(counters)), end="")
+            if verbose:
+                print(": " + " ".join(counters))
+            else:
+                print()
+    if timestamps:
+        print("  + 1 timestamps pass")
+    if roofline:
+        print("  + roofline benchmark")
+
+    if est is None:
+        print("\nPass --baseline-time to estimate the profiling wall time.")
+        return
+    print("\nEstimated wall time:")
+    print("  {:<12} {:>12}".format("counters", format_time(est["pmc"])))
+    if timestamps:
+        print("  {:<12} {:>12}".format("timestamps", format_time(est["timestamps"])))
+    if roofline:
+        print("  {:<12} {:>12}".format("roofline", format_time(est["roofline"])))
+    print("  {:<12} {:>12}".format("total", format_time(est["total"])))
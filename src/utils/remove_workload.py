@@ -22,71 +22,141 @@
 # THE SOFTWARE.
 ################################################################################
 
-import argparse
-import getpass
-from pymongo import MongoClient
+import datetime
+import fnmatch
+
+from utils.csv_converter import connect, get_password, TEMP_SUFFIX
+
+################################################
+# Global vars
+################################################
+
+DB_PREFIX = "omniperf_"  # only workload databases are ever matched
+PROTECTED = ["admin", "local", "config", "workload_names"]
+PREAGG_PREFIX = "preagg_"
+# Imports marked in progress for longer are assumed to have died
+IMPORT_GRACE = datetime.timedelta(hours=24)
+
+
+################################################
+# Helper funcs
+################################################
+def database_size(client, name):
+    """
+    Storage used by a database, data and indexes.
+    """
+    stats = client[name].command("dbStats")
+    return stats.get("storageSize", 0) + stats.get("indexSize", 0)
+
+
+def collection_size(db, name):
+    stats = db.command("collStats", name)
+    return stats.get("storageSize", 0) + stats.get("totalIndexSize", 0)
+
+
+def match_workloads(client, pattern, team=None, older_than=None, now=None):
+    """
+    Workload databases matching a glob pattern, optionally only those of a
+    team (omniperf_<team>_*) and imported more than older_than days ago.
+    Workloads listed in workload_names but without a database match too.
+    """
+    entries = {d["name"]: d for d in client["workload_names"]["names"].find()}
+    names = set(n for n in client.list_database_names() if n.startswith(DB_PREFIX))
+    names |= set(entries)
+    matched = [
+        n for n in sorted(names) if n not in PROTECTED and fnmatch.fnmatchcase(n, pattern)
+    ]
+    if team:
+        matched = [n for n in matched if n.startswith(DB_PREFIX + team + "_")]
+    if older_than is not None:
+        now = now or datetime.datetime.utcnow()
+        cutoff = now - datetime.timedelta(days=older_than)
+        # NB: workloads imported before import dates were recorded have no age
+        matched = [
+            n
+            for n in matched
+            if entries.get(n, {}).get("imported") and entries[n]["imported"] < cutoff
+        ]
+    return matched
+
+
+def collect_garbage(client, now=None):
+    """
+    Drop what no workload refers to anymore: pre-aggregated collections not
+    listed with their workload, leftovers of interrupted imports, and
+    workload_names entries whose database is gone. Workloads being imported
+    are skipped, unless marked so for over IMPORT_GRACE.
+    Returns the number of items removed and the storage reclaimed.
+    """
+    names = client["workload_names"]["names"]
+    databases = set(client.list_database_names())
+    now = now or datetime.datetime.utcnow()
+    removed = 0
+    reclaimed = 0
+    for entry in list(names.find()):
+        # NB: an import holds temporary and not yet listed collections, and may
+        #     not have created its database yet
+        if entry.get("importing") and now - entry["importing"] < IMPORT_GRACE:
+            continue
+        if entry["name"] not in databases:
+            names.delete_many({"name": entry["name"]})
+            removed += 1
+            continue
+        db = client[entry["name"]]
+        listed = entry.get("collections", {})
+        for name in db.list_collection_names():
+            orphan = name.startswith(PREAGG_PREFIX) and name not in listed
+            if orphan or name.endswith(TEMP_SUFFIX):
+                reclaimed += collection_size(db, name)
+                db[name].drop()
+                removed += 1
+    return removed, reclaimed
+
+
+def format_size(size):
+    return "{:.1f} MiB".format(size / 2**20)
+
 
 # Verify target directory and setup connection
-def remove_workload(args):
-    # parser = argparse.ArgumentParser(description='Remove a workload from an Omniperf Instance')
-
-    # parser.add_argument('-H', '--host',required=True, help="Name or IP address of the server host")
-    # parser.add_argument('-P', '--port', required=False, help="TCP/IP Port (defaults to 27018)", default=27018)
-    # parser.add_argument('-u', '--username', required=True, help="Name of the user to connect with")
-    # parser.add_argument('-p', '--password', required=False, help="The user's password (will be requested later if it's not set)", default='')
-    # parser.add_argument('-w', '--workload', required=True, help="Specify the full workload name to delete")
-
-    host = args.host
-    port = str(args.port)
-    username = args.username
-
-    if args.password == "":
-        try:
-            password = getpass.getpass()
-        except Exception as error:
-            print("PASSWORD ERROR", error)
-        else:
-            print("Password recieved")
-    else:
-        password = args.password
-    workload = args.workload
-
-    # Verify workload  is valid
-    if workload == "admin" or workload == "local":
-        print("You cannot remove this database. Try again.")
-    else:
-        print("Attempting to remove " + workload)
-
-    connection_info = {
-        "username": username,
-        "password": password,
-        "host": host,
-        "port": port,
-        "workload": workload,
-    }
-
-    client = MongoClient(
-        "mongodb://"
-        + connection_info["username"]
-        + ":"
-        + connection_info["password"]
-        + "@"
-        + connection_info["host"]
-        + ":"
-        + connection_info["port"]
-        + "/?authSource=admin"
-    )
+def remove_workload(args, client=None):
+    """
+    Remove every workload matching --workload (a full name or a glob pattern),
+    --team and --older-than over a single connection, then garbage collect.
+    """
+    if client is None:
+        sqlite = getattr(args, "sqlite", None)
+        connection_info = {
+            "username": args.username,
+            "password": "" if sqlite else get_password(args),
+            "host": args.host,
+            "port": str(args.port),
+            "sqlite": sqlite,
+        }
+        client = connect(connection_info, 1)
 
-    dbToRemove = client[workload]
+    matched = match_workloads(client, args.workload, args.team, args.older_than)
+    if not matched:
+        print("No workload matches " + args.workload)
+    for workload in matched:
+        print(("Would remove " if args.dry_run else "Attempting to remove ") + workload)
+    if args.dry_run:
+        return 0
 
-    # check the collection names on the database
-    col_list = dbToRemove.list_collection_names()
-    # if not col_list:
-    #     print("This workload appears to be empty... Try again.")
-    # else:
-    client.drop_database(dbToRemove)
-    db = client["workload_names"]
-    col = db["names"]
-    col.delete_many({"name": workload})
+    reclaimed = 0
+    databases = set(client.list_database_names())
+    for workload in matched:
+        if workload in databases:
+            reclaimed += database_size(client, workload)
+            client.drop_database(workload)
+    if matched:
+        client["workload_names"]["names"].delete_many({"name": {"$in": matched}})
 
+    removed, gc_size = collect_garbage(client)
+    reclaimed += gc_size
+    print(
+        "Removed {} workloads and {} orphaned items, reclaimed {}".format(
+            len(matched), removed, format_size(reclaimed)
+        )
+    )
     print("Done!")
+    return reclaimed
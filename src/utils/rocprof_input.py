@@ -0,0 +1,109 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+import re
+
+################################################
+# Global vars
+################################################
+
+# Filter lines of a rocprof input file, applied to every "pmc:" pass
+FILTERS = ["gpu", "range", "kernel"]
+
+
+################################################
+# Helper funcs
+################################################
+def split_filter(value):
+    """
+    Items of a comma separated filter line. Commas inside template or call
+    brackets, e.g. reduce<float, 256u>(float*), are part of a kernel name,
+    which is kept verbatim.
+    """
+    items = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(value):
+        if c in "<([":
+            depth += 1
+        elif c in ">)]":
+            depth = max(0, depth - 1)
+        elif c == "," and depth == 0:
+            items.append(value[start:i])
+            start = i + 1
+    items.append(value[start:])
+    return [item.strip() for item in items if item.strip()]
+
+
+class RocprofInput:
+    """
+    A rocprof input file: the counters of each pass ("pmc:" lines, one app
+    replay each) and the gpu, range (dispatch) and kernel filters shared by all
+    passes. Filters are lists of ids/names, None when unset.
+    """
+
+    def __init__(self, passes=None, gpu=None, range=None, kernel=None):
+        self.passes = passes if passes else []
+        self.gpu = gpu
+        self.range = range
+        self.kernel = kernel
+
+    @classmethod
+    def read(cls, fname):
+        rocprof_input = cls()
+        with open(fname, "r") as f:
+            for line in f:
+                # Strip all comments, skip empty lines
+                stext = line.split("#")[0].strip()
+                m = re.match(r"^(pmc|gpu|range|kernel):(.*)", stext)
+                if m is None:
+                    continue
+                key, value = m.group(1), m.group(2)
+                if key == "pmc":
+                    rocprof_input.passes.append(value.split())
+                elif value.strip():
+                    setattr(rocprof_input, key, split_filter(value))
+        return rocprof_input
+
+    def filters(self):
+        return {key: getattr(self, key) for key in FILTERS}
+
+    def split(self):
+        """
+        One input per pass, each with the same filters.
+        """
+        return [RocprofInput([counters], **self.filters()) for counters in self.passes]
+
+    def format(self):
+        lines = ["pmc: " + " ".join(counters) for counters in self.passes]
+        lines.append("")
+        for key in FILTERS:
+            values = getattr(self, key)
+            lines.append(
+                key + ": " + ",".join(str(v) for v in values) if values else key + ":"
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, fname):
+        with open(fname, "w") as f:
+            f.write(self.format())
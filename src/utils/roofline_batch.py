@@ -0,0 +1,226 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+import os
+import sys
+from math import log, pi
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pandas as pd
+
+from omniperf_analyze.utils import roofline_calc
+
+################################################
+# Global vars
+################################################
+
+IMGNAME = "empirRoof"
+
+SUPPORTED_DTYPES = ["FP32", "FP64", "FP16", "I8"]
+SUPPORTED_MEM_LEVELS = ["HBM", "L2", "vL1D", "LDS", "ALL"]
+SUPPORTED_FORMATS = ["pdf", "png", "svg"]
+
+# Keys used by roofline_calc.plot_roof() for each memory level
+MEM_LEVEL_KEYS = {"HBM": "hbm", "L2": "l2", "vL1D": "l1", "LDS": "lds"}
+
+FIG_SIZE = (16, 12)
+FIG_DPI = 100
+
+FONT_SIZE = 16
+
+AI_LABELS = {"ai_l1": "vL1D", "ai_l2": "L2", "ai_hbm": "HBM"}
+
+
+################################################
+# Helper funcs
+################################################
+def get_font():
+    return {
+        "size": FONT_SIZE,
+        "color": "black",
+        "weight": "bold",
+        "family": "serif",
+    }
+
+
+def build_jobs(path, dtypes, mem_levels, sort, device, axes, fmt, verbose):
+    """
+    Build one render job per (dtype, mem level) combination. Roof lines and
+    arithmetic intensities are computed once here and shared by all jobs.
+    """
+    df = pd.read_csv(os.path.join(path, "pmc_perf.csv"))
+    ai_data = roofline_calc.plot_application(sort, {"pmc_perf": df}, verbose)
+
+    jobs = []
+    for dtype in dtypes:
+        # NB: roofline.csv holds one row per benchmarked device, take the 1st
+        #     row as profile mode does.
+        roof_info = {"path": path, "sort": sort, "device": 0, "dtype": dtype}
+        line_data = roofline_calc.empirical_roof(roof_info)
+        for mem in mem_levels:
+            filename = "{}_gpu-{}_{}_{}.{}".format(IMGNAME, device, dtype, mem, fmt)
+            jobs.append(
+                {
+                    "dtype": dtype,
+                    "mem": mem,
+                    "sort": sort,
+                    "axes": axes,
+                    "format": fmt,
+                    "line_data": line_data,
+                    "ai_data": ai_data,
+                    "output": os.path.join(os.path.abspath(path), filename),
+                }
+            )
+    return jobs
+
+
+def render_roof(job):
+    """
+    Render a single roofline image headlessly. Runs inside pool workers, so
+    only plain data is passed in and no pyplot global state is touched.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=FIG_SIZE, dpi=FIG_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+
+    title_font = get_font()
+    title_font["size"] += 8
+    ax.set_title("Empirical Roofline ({})".format(job["dtype"]), **title_font)
+    ax.set_xlabel("Arithmetic Intensity (FLOP/Byte)", **get_font())
+    ax.set_ylabel("Performance (GFLOP/sec)", **get_font())
+    ax.grid(True, which="major", ls="--", lw=1)
+    ax.grid(True, which="minor", ls="--", lw=0.5)
+    ax.set_yscale("log")
+    ax.set_xscale("log")
+    if job["axes"]:
+        ax.set_xlim(job["axes"][0], job["axes"][1])
+        ax.set_ylim(job["axes"][2], job["axes"][3])
+
+    line_data = job["line_data"]
+    x_max = roofline_calc.XMAX if not job["axes"] else job["axes"][1]
+
+    # Plot BW at each selected memory level
+    if job["mem"] == "ALL":
+        levels = [m for m in SUPPORTED_MEM_LEVELS if m != "ALL"]
+    else:
+        levels = [job["mem"]]
+    for mem in levels:
+        x, y, peak_bw = line_data[MEM_LEVEL_KEYS[mem]]
+        ax.plot(x, y, color="magenta")
+
+        angle = (180.0 / pi) * numpy.arctan(
+            abs(log(y[1]) - log(y[0])) / abs(log(x[1]) - log(x[0]))
+        )
+        ax.text(
+            10 ** ((log(x[0], 10) + log(x[1], 10)) / 2),
+            10 ** ((log(y[0], 10) + log(y[1], 10)) / 2),
+            "{} {} GB/s".format(int(peak_bw), mem),
+            rotation=angle,
+            rotation_mode="anchor",
+            **get_font(),
+        )
+
+    # Plot computing roofs (no VALU roof for FP16 or INT8)
+    for roof, color, label in [("valu", "magenta", "VALU"), ("mfma", "blue", "MFMA")]:
+        if not line_data[roof]:
+            continue
+        x, y, peak = line_data[roof]
+        ax.plot(x, y, color=color)
+        ax.text(
+            x_max,
+            peak,
+            "{} {} GFLOP/sec".format(int(peak), label),
+            horizontalalignment="right",
+            verticalalignment="bottom" if roof == "mfma" else "top",
+            **get_font(),
+        )
+
+    # Overlay application performance
+    plotted_spots = []
+    labels = []
+    for key, points in job["ai_data"].items():
+        plotted_spots.append(
+            ax.scatter(points[0], points[1], c=roofline_calc.get_color(key), marker="o")
+        )
+        labels.append(AI_LABELS[key])
+    ax.legend(
+        plotted_spots,
+        labels,
+        prop={"size": (FONT_SIZE - 2)},
+        bbox_to_anchor=(1.04, 1),
+        loc="upper left",
+        title="Top {}".format(job["sort"]),
+        title_fontsize=FONT_SIZE,
+    )
+
+    fig.savefig(job["output"], bbox_inches="tight", format=job["format"])
+    return job["output"]
+
+
+def batch_roof(
+    path,
+    dtypes=None,
+    mem_levels=None,
+    sort="kernels",
+    device=-1,
+    axes=None,
+    fmt="pdf",
+    num_jobs=0,
+    verbose=0,
+):
+    """
+    Render every requested (dtype, mem level) roofline for a workload in
+    parallel. Returns the list of written files.
+    """
+    dtypes = dtypes if dtypes else SUPPORTED_DTYPES
+    mem_levels = mem_levels if mem_levels else SUPPORTED_MEM_LEVELS
+
+    for dtype in dtypes:
+        if dtype not in SUPPORTED_DTYPES:
+            sys.exit("Invalid dtype. Must be one of {}".format(SUPPORTED_DTYPES))
+    for mem in mem_levels:
+        if mem not in SUPPORTED_MEM_LEVELS:
+            sys.exit("Invalid mem-level. Must be one of {}".format(SUPPORTED_MEM_LEVELS))
+    if fmt not in SUPPORTED_FORMATS:
+        sys.exit("Invalid format. Must be one of {}".format(SUPPORTED_FORMATS))
+    if not os.path.isfile(os.path.join(path, "roofline.csv")):
+        sys.exit("ROOFLINE ERROR: Cannot find roofline.csv in {}".format(path))
+
+    jobs = build_jobs(path, dtypes, mem_levels, sort, device, axes, fmt, verbose)
+
+    num_jobs = num_jobs if num_jobs > 0 else (os.cpu_count() or 1)
+    num_jobs = min(num_jobs, len(jobs))
+    print("Rendering {} roofline plots with {} jobs...".format(len(jobs), num_jobs))
+
+    if num_jobs <= 1:
+        outputs = [render_roof(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=num_jobs) as pool:
+            outputs = list(pool.map(render_roof, jobs))
+
+    for output in outputs:
+        print('File saved to: "{}"'.format(output))
+    return outputs
@@ -0,0 +1,163 @@
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+
+import os
+import glob
+
+import numpy as np
+import pandas as pd
+
+from omniperf_analyze.utils import file_io
+from utils.rocprof_input import RocprofInput
+
+
+################################################
+# Helper funcs
+################################################
+def cluster_dispatches(df):
+    """
+    Cluster the dispatches of each kernel by duration, in power of 2 buckets,
+    so kernels with e.g. a slow first call or size dependent runtimes are
+    sampled in every mode.
+    """
+    duration = (df["EndNs"] - df["BeginNs"]).clip(lower=1)
+    return np.floor(np.log2(duration)).astype(int)
+
+
+def sample_window(strata, need):
+    """
+    Earliest window of consecutive dispatches holding at least need[s]
+    dispatches of each stratum s, given the stratum of every dispatch in
+    order. Returns its (start, stop) positions.
+    """
+    count = dict.fromkeys(need, 0)
+    unmet = len(need)
+    for stop, s in enumerate(strata):
+        count[s] += 1
+        if count[s] == need[s]:
+            unmet -= 1
+        if unmet == 0:
+            break
+    start = 0
+    while count[strata[start]] > need[strata[start]]:
+        count[strata[start]] -= 1
+        start += 1
+    return start, stop + 1
+
+
+def select_dispatches(df, per_kernel):
+    """
+    Stratified sample of the dispatches in df: about per_kernel dispatches of
+    each kernel, spread over its duration clusters in proportion to their
+    size, at least one per cluster. Samples are taken from the earliest window
+    of consecutive dispatches that holds enough of every cluster, so counter
+    passes only need to cover that window, and evenly within it. Each sampled
+    dispatch is weighted by the number of dispatches of its cluster it stands
+    for.
+    """
+    df = df.assign(Cluster=cluster_dispatches(df)).sort_values("Index")
+    df = df.reset_index(drop=True)
+    strata = list(zip(df["KernelName"], df["Cluster"]))
+    sizes = df.groupby(["KernelName", "Cluster"], sort=False).size()
+    kernel_sizes = df.groupby("KernelName", sort=False).size()
+
+    need = {}
+    for (kernel, cluster), size in sizes.items():
+        nkernel = min(per_kernel, kernel_sizes[kernel])
+        need[(kernel, cluster)] = min(
+            size, max(1, round(nkernel * size / kernel_sizes[kernel]))
+        )
+    start, stop = sample_window(strata, need)
+
+    samples = []
+    window = df.iloc[start:stop]
+    for (kernel, cluster), cluster_df in window.groupby(
+        ["KernelName", "Cluster"], sort=False
+    ):
+        n = need[(kernel, cluster)]
+        pos = np.unique(np.linspace(0, len(cluster_df.index) - 1, n).round().astype(int))
+        sample = cluster_df.iloc[pos]
+        samples.append(sample.assign(Weight=sizes[(kernel, cluster)] / len(pos)))
+    columns = [k for k in file_io.DISPATCH_KEYS if k in df.columns]
+    return pd.concat(samples)[columns + ["Cluster", "Weight"]].sort_values("Index")
+
+
+def sample_dispatches(workload_dir, per_kernel, kernels=None):
+    """
+    Pick the dispatches to collect counters on from the timestamps pass and
+    record them, with their weights, for analyze to rescale.
+    """
+    df = pd.read_csv(os.path.join(workload_dir, "timestamps.csv"))
+    if kernels:
+        df = df[df["KernelName"].apply(lambda name: any(k in name for k in kernels))]
+
+    sampled = select_dispatches(df, per_kernel)
+    sampled.to_csv(os.path.join(workload_dir, file_io.SAMPLING_FILE), index=False)
+    print(
+        "Sampling {} of {} dispatches ({} kernels, {} clusters)".format(
+            len(sampled.index),
+            len(df.index),
+            sampled["KernelName"].nunique(),
+            len(sampled.groupby(["KernelName", "Cluster"])),
+        )
+    )
+    return sampled
+
+
+def dispatch_range(sampled):
+    """
+    The range: filter of the sampled dispatches. rocprof only takes a single
+    "start:stop" range (stop excluded), not a list of indexes, so this is the
+    span from the first to the last sampled dispatch, i.e. the sample window.
+    """
+    return ["{}:{}".format(sampled["Index"].min(), sampled["Index"].max() + 1)]
+
+
+def apply_sampling(workload_dir, sampled):
+    """
+    Restrict every counter pass to the span of the sampled dispatches.
+    """
+    dispatches = dispatch_range(sampled)
+    for fname in glob.glob(workload_dir + "/perfmon/*.txt"):
+        rocprof_input = RocprofInput.read(fname)
+        rocprof_input.range = dispatches
+        rocprof_input.write(fname)
+
+
+def filter_sampled(workload_dir, sampled, manifest=None):
+    """
+    Drop the dispatches within the range: span that weren't sampled from the
+    counter pass outputs, as analyze would count them with a weight of 1.
+    """
+    for fname in glob.glob(workload_dir + "/perfmon/*.txt"):
+        fbase = os.path.splitext(os.path.basename(fname))[0]
+        output = os.path.join(workload_dir, fbase + ".csv")
+        if not os.path.isfile(output):
+            continue
+        df = pd.read_csv(output)
+        keep = df["Index"].isin(sampled["Index"])
+        if keep.all():
+            continue
+        df[keep].to_csv(output, index=False)
+        if manifest:
+            manifest.update(output)
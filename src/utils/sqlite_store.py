@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+
+################################################################################
+# Copyright (c) 2021 - 2022 Advanced Micro Devices, Inc. All rights reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+################################################################################
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+import numpy
+import pandas as pd
+
+################################################
+# Global vars
+################################################
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+SEPARATOR = "/"  # tables are named <workload database>/<collection>
+NAMES_DB = "workload_names"
+PREAGG_PREFIX = "preagg_"
+TEMP_SUFFIX = "__import"  # as csv_converter.TEMP_SUFFIX
+# SQLite column names are case insensitive, unlike document fields. A field
+# differing from an existing column only by case gets a column <field>#~<n>.
+ALIAS_MARK = "#~"
+
+# Declared column types of non scalar fields, converted back when read
+sqlite3.register_adapter(dict, json.dumps)
+sqlite3.register_adapter(list, json.dumps)
+sqlite3.register_converter("JSON", json.loads)
+
+
+################################################
+# Helper funcs
+################################################
+def default_store(team):
+    """
+    One store file per team, in the working directory.
+    """
+    return "omniperf_{}.db".format(team)
+
+
+def is_store(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def split_store_path(path):
+    """
+    (store, workload) for a store file or a workload inside of it, e.g.
+    omniperf_asw.db/omniperf_asw_vcopy_mi200, None for any other path.
+    """
+    if is_store(path):
+        return path, None
+    if is_store(os.path.dirname(path)):
+        return os.path.dirname(path), os.path.basename(path)
+    return None
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def column_type(value):
+    if isinstance(value, (dict, list)):
+        return "JSON"
+    if isinstance(value, datetime.datetime):
+        return "TIMESTAMP"
+    return ""
+
+
+def field_name(column):
+    return column.split(ALIAS_MARK)[0]
+
+
+def to_sql_value(value):
+    return value.item() if isinstance(value, numpy.generic) else value
+
+
+class StoreClient:
+    """
+    A SQLite file standing in for the subset of a pymongo client the import
+    and remove paths use. Each collection is a table named
+    <database>/<collection>, with one column per document field.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+
+    def __getitem__(self, name):
+        return StoreDatabase(self, name)
+
+    def execute(self, sql, params=()):
+        with self.lock, self.conn:
+            return self.conn.execute(sql, params).fetchall()
+
+    def tables(self):
+        rows = self.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return [r[0] for r in rows if SEPARATOR in r[0]]
+
+    def list_database_names(self):
+        return sorted(set(t.split(SEPARATOR, 1)[0] for t in self.tables()))
+
+    def drop_database(self, name):
+        for collection in self[name].list_collection_names():
+            self[name][collection].drop()
+
+    def close(self):
+        self.conn.close()
+
+
+class StoreDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, name):
+        return StoreCollection(self, name)
+
+    def list_collection_names(self):
+        prefix = self.name + SEPARATOR
+        return [t[len(prefix) :] for t in self.client.tables() if t.startswith(prefix)]
+
+    def size(self, name):
+        """
+        Bytes used by a table or index, 0 without the dbstat table.
+        """
+        try:
+            rows = self.client.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)
+            )
+        except sqlite3.OperationalError:
+            return 0
+        return rows[0][0] or 0
+
+    def command(self, name, collection=None):
+        if name == "dbStats":
+            stats = [self.command("collStats", c) for c in self.list_collection_names()]
+            return {
+                "storageSize": sum(s["storageSize"] for s in stats),
+                "indexSize": sum(s["totalIndexSize"] for s in stats),
+            }
+        assert name == "collStats"
+        table = self[collection].table
+        sizes = {index: self.size(index) for index in self[collection].index_names()}
+        return {
+            "storageSize": self.size(table),
+            "indexSizes": sizes,
+            "totalIndexSize": sum(sizes.values()),
+        }
+
+
+class StoreCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.client = db.client
+        self.name = name
+
+    @property
+    def table(self):
+        return self.db.name + SEPARATOR + self.name
+
+    def columns(self):
+        """
+        Table columns, by document field.
+        """
+        rows = self.client.execute("PRAGMA table_info({})".format(quote(self.table)))
+        return {field_name(r[1]): r[1] for r in rows}
+
+    def index_names(self):
+        rows = self.client.execute("PRAGMA index_list({})".format(quote(self.table)))
+        return [r[1] for r in rows]
+
+    def indexes(self):
+        return [
+            [
+                field_name(r[2])
+                for r in self.client.execute("PRAGMA index_info({})".format(quote(i)))
+            ]
+            for i in self.index_names()
+        ]
+
+    def drop(self):
+        self.client.execute("DROP TABLE IF EXISTS {}".format(quote(self.table)))
+
+    def add_columns(self, columns, fields, docs):
+        """
+        Create the table, or add columns to it, for fields not stored yet.
+        """
+        create = not columns
+        taken = set(c.lower() for c in columns.values())
+        definitions = []
+        for f in fields:
+            if f in columns:
+                continue
+            column = f
+            while column.lower() in taken:
+                column = "{}{}{}".format(f, ALIAS_MARK, len(taken))
+            taken.add(column.lower())
+            columns[f] = column
+            kind = next((column_type(d[f]) for d in docs if f in d), "")
+            definitions.append("{} {}".format(quote(column), kind))
+        if create:
+            self.client.execute(
+                "CREATE TABLE {} ({})".format(quote(self.table), ", ".join(definitions))
+            )
+        else:
+            for definition in definitions:
+                self.client.execute(
+                    "ALTER TABLE {} ADD COLUMN {}".format(quote(self.table), definition)
+                )
+
+    def insert_many(self, docs, ordered=True):
+        fields = []
+        for doc in docs:
+            fields += [k for k in doc if k not in fields]
+        with self.client.lock:
+            columns = self.columns()
+            self.add_columns(columns, fields, docs)
+            sql = "INSERT INTO {} ({}) VALUES ({})".format(
+                quote(self.table),
+                ", ".join(quote(columns[f]) for f in fields),
+                ", ".join("?" for _ in fields),
+            )
+            rows = ([to_sql_value(d.get(f)) for f in fields] for d in docs)
+            with self.client.conn:
+                self.client.conn.executemany(sql, rows)
+
+    def rename(self, new_name, dropTarget=False):
+        target = self.db[new_name]
+        with self.client.lock:
+            if dropTarget:
+                target.drop()
+            self.client.execute(
+                "ALTER TABLE {} RENAME TO {}".format(
+                    quote(self.table), quote(target.table)
+                )
+            )
+        self.name = new_name
+
+    def create_index(self, keys):
+        fields = [k for k, _ in keys]
+        with self.client.lock:
+            if fields in self.indexes():
+                return
+            columns = self.columns()
+            # NB: index names are unique per file and outlive table renames
+            name = "{}:{}:{}".format(self.table, "_".join(fields), uuid.uuid4().hex[:8])
+            self.client.execute(
+                "CREATE INDEX {} ON {} ({})".format(
+                    quote(name),
+                    quote(self.table),
+                    ", ".join(quote(columns[f]) for f in fields),
+                )
+            )
+
+    def where(self, value):
+        """
+        SQL condition and parameters matching value, a mongo style filter of
+        equalities and $in. None if a field is missing from the table.
+        """
+        columns = self.columns()
+        conditions = []
+        params = []
+        for key, match in value.items():
+            if key not in columns:
+                return None, []
+            column = quote(columns[key])
+            if isinstance(match, dict):
+                conditions.append(
+                    "{} IN ({})".format(column, ", ".join("?" for _ in match["$in"]))
+                )
+                params += match["$in"]
+            else:
+                conditions.append("{} = ?".format(column))
+                params.append(match)
+        return " AND ".join(conditions) or "1", params
+
+    def find(self, value={}):
+        with self.client.lock:
+            condition, params = self.where(value)
+            if condition is None:
+                return []
+            cursor = self.client.conn.execute(
+                "SELECT * FROM {} WHERE {}".format(quote(self.table), condition), params
+            )
+            fields = [field_name(d[0]) for d in cursor.description]
+            return [
+                {k: v for k, v in zip(fields, row) if v is not None}
+                for row in cursor.fetchall()
+            ]
+
+    def find_one(self, value={}):
+        return next(iter(self.find(value)), None)
+
+    def delete_many(self, value):
+        with self.client.lock:
+            condition, params = self.where(value)
+            if condition is not None:
+                self.client.execute(
+                    "DELETE FROM {} WHERE {}".format(quote(self.table), condition), params
+                )
+
+    def replace_one(self, value, newValue, upsert=False):
+        with self.client.lock:
+            if not upsert and not self.find(value):
+                return
+            self.delete_many(value)
+            self.insert_many([newValue])
+
+    def to_frame(self):
+        with self.client.lock:
+            df = pd.read_sql_query(
+                "SELECT * FROM {}".format(quote(self.table)), self.client.conn
+            )
+        return df.rename(columns=field_name)
+
+
+def extract_workload(store, workload, dest):
+    """
+    Write the collections of a workload imported to store as the csv files
+    of workload dir dest. workload may be None if the store holds only one.
+    Returns the name of the workload.
+    """
+    client = StoreClient(store)
+    try:
+        workloads = [w for w in client.list_database_names() if w != NAMES_DB]
+        if workload is None and len(workloads) == 1:
+            workload = workloads[0]
+        if workload not in workloads:
+            raise ValueError(
+                "Pick one of the workloads in {}: {}".format(store, ", ".join(workloads))
+            )
+        db = client[workload]
+        os.makedirs(dest, exist_ok=True)
+        for name in db.list_collection_names():
+            # Derived collections aren't workload csv files
+            if name.startswith(PREAGG_PREFIX) or name.endswith(TEMP_SUFFIX):
+                continue
+            db[name].to_frame().to_csv(os.path.join(dest, name + ".csv"), index=False)
+    finally:
+        client.close()
+    return workload
@@ -0,0 +1,304 @@
+import argparse
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import statistics
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+
+OMNIPERF_SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(OMNIPERF_SRC))
+
+import pandas as pd
+from omniperf_analyze.utils import parser, file_io, schema, tty
+
+# Analyze stages in the order omniperf_analyze runs them
+STAGES = [
+    "config_load",
+    "kernel_top_stats",
+    "create_df_pmc",
+    "apply_filters",
+    "eval_metric",
+    "save",
+    "tty",
+]
+
+
+class StageRecorder:
+    """
+    Record wall time, and optionally tracemalloc peak, of each analyze stage.
+    """
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.times = {}
+        self.peaks = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            # Restart to reset the peak, reset_peak() needs python 3.9
+            tracemalloc.stop()
+            tracemalloc.start()
+        start = time.perf_counter()
+        yield
+        self.times[name] = time.perf_counter() - start
+        if self.trace_memory:
+            self.peaks[name] = tracemalloc.get_traced_memory()[1]
+
+
+def find_workloads(root):
+    """
+    A workload is any <name>/<soc> directory holding pmc_perf.csv and sysinfo.csv.
+    """
+    workloads = []
+    for d in sorted(glob.glob(os.path.join(root, "*", "*"))):
+        if os.path.isfile(os.path.join(d, "pmc_perf.csv")) and os.path.isfile(
+            os.path.join(d, "sysinfo.csv")
+        ):
+            workloads.append(d)
+    return workloads
+
+
+def run_analyze(path, args, recorder, output):
+    """
+    Run the analyze pipeline of a single workload stage by stage.
+    """
+    config_dir = Path(args.config_dir)
+    soc_params_dir = OMNIPERF_SRC / "soc_params"
+
+    with recorder.stage("config_load"):
+        soc_spec_df = file_io.load_soc_params(soc_params_dir)
+        sys_info = file_io.load_sys_info(Path(path, "sysinfo.csv"))
+        arch = sys_info.iloc[0]["gpu_soc"]
+
+        ac = schema.ArchConfig()
+        if file_io.is_single_panel_config(config_dir):
+            ac.panel_configs = file_io.load_panel_configs(config_dir)
+        else:
+            ac.panel_configs = file_io.load_panel_configs(config_dir.joinpath(arch))
+        parser.build_dfs(ac, None)
+        parser.build_metric_value_string(ac.dfs, ac.dfs_type, args.normal_unit)
+
+        w = schema.Workload()
+        w.sys_info = sys_info
+        w.avail_ips = w.sys_info["ip_blocks"].item().split("|")
+        w.dfs = ac.dfs
+        w.dfs_type = ac.dfs_type
+        w.soc_spec = file_io.get_soc_params(soc_spec_df, arch)
+
+    with recorder.stage("kernel_top_stats"):
+        file_io.create_df_kernel_top_stats(
+            path, w.filter_gpu_ids, w.filter_dispatch_ids, args.time_unit, 10
+        )
+
+    with recorder.stage("create_df_pmc"):
+        w.raw_pmc = file_io.create_df_pmc(path)
+
+    with recorder.stage("apply_filters"):
+        parser.load_kernel_top(w, path)
+        filtered_pmc = parser.apply_filters(w, False, False)
+
+    with recorder.stage("eval_metric"):
+        parser.eval_metric(
+            w.dfs, w.dfs_type, w.sys_info.iloc[0], w.soc_spec, filtered_pmc, False
+        )
+
+    with recorder.stage("save"):
+        parser.save_analysis(w, path, 0)
+
+    with recorder.stage("tty"):
+        tty.show_all(OrderedDict({path: w}), ac, output, 2, args.time_unit, None)
+
+
+def bench_workload(workload, args, output):
+    """
+    Time each stage over several repeats, then do one extra traced pass to get
+    per-stage peak memory. Run on a scratch copy so the corpus stays clean.
+    """
+    scratch = tempfile.mkdtemp(prefix="omniperf_bench_")
+    try:
+        for f in glob.glob(os.path.join(workload, "*.csv")):
+            shutil.copy(f, scratch)
+
+        samples = {s: [] for s in STAGES}
+        for i in range(args.warmup + args.repeat):
+            recorder = StageRecorder(trace_memory=False)
+            run_analyze(scratch, args, recorder, output)
+            if i >= args.warmup:
+                for s in STAGES:
+                    samples[s].append(recorder.times[s])
+
+        recorder = StageRecorder(trace_memory=True)
+        tracemalloc.start()
+        try:
+            run_analyze(scratch, args, recorder, output)
+        finally:
+            tracemalloc.stop()
+
+        pmc = pd.read_csv(os.path.join(scratch, "pmc_perf.csv"), usecols=["Index"])
+    finally:
+        shutil.rmtree(scratch)
+
+    stages = OrderedDict()
+    for s in STAGES:
+        stages[s] = {
+            "min_s": min(samples[s]),
+            "median_s": statistics.median(samples[s]),
+            "mean_s": statistics.mean(samples[s]),
+            "peak_mem_bytes": recorder.peaks[s],
+        }
+    return {
+        "dispatches": len(pmc.index),
+        "total_median_s": sum(v["median_s"] for v in stages.values()),
+        "stages": stages,
+    }
+
+
+def get_metadata():
+    git = subprocess.run(
+        ["git", "log", "--pretty=format:%h", "-n", "1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        cwd=str(OMNIPERF_SRC),
+    )
+    return {
+        "git_sha": git.stdout.decode("utf-8") if git.returncode == 0 else "unknown",
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+    }
+
+
+def compare(baseline, report, threshold):
+    """
+    Print per-stage median deltas against a previous report. Return the number
+    of stages slower than the threshold (in percent).
+    """
+    regressions = 0
+    print(
+        "\n{:<45} {:<17} {:>10} {:>10} {:>8}".format(
+            "workload", "stage", "base(ms)", "cur(ms)", "delta"
+        )
+    )
+    for name, cur in report["workloads"].items():
+        base = baseline["workloads"].get(name, {})
+        if "error" in cur or "stages" not in base:
+            continue
+        for s in STAGES:
+            b = base["stages"][s]["median_s"]
+            c = cur["stages"][s]["median_s"]
+            delta = (c - b) / b * 100 if b else 0.0
+            flag = ""
+            if delta > threshold:
+                regressions += 1
+                flag = " *"
+            print(
+                "{:<45} {:<17} {:>10.2f} {:>10.2f} {:>7.1f}%{}".format(
+                    name, s, b * 1000, c * 1000, delta, flag
+                )
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(
+        description="Benchmark each omniperf analyze stage over a workloads corpus."
+    )
+
+    my_parser.add_argument(
+        "-p",
+        "--path",
+        dest="path",
+        default=str(Path(__file__).resolve().parent / "workloads"),
+        type=str,
+        help="Specify workloads directory. (DEFAULT: tests/workloads)",
+    )
+    my_parser.add_argument(
+        "-w",
+        "--workload",
+        dest="workloads",
+        nargs="+",
+        default=None,
+        help="Only benchmark workloads whose <name>/<soc> contains any of these.",
+    )
+    my_parser.add_argument(
+        "-o", "--output", dest="output", default=None, help="Write JSON report to file."
+    )
+    my_parser.add_argument(
+        "-c",
+        "--compare",
+        dest="compare",
+        default=None,
+        help="Compare against a previous JSON report.",
+    )
+    my_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Slowdown in percent flagged as regression with --compare. (DEFAULT: 10)",
+    )
+    my_parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Timed repeats. (DEFAULT: 3)"
+    )
+    my_parser.add_argument(
+        "--warmup", type=int, default=1, help="Untimed warmup runs. (DEFAULT: 1)"
+    )
+    my_parser.add_argument(
+        "--config-dir",
+        dest="config_dir",
+        default=str(OMNIPERF_SRC / "omniperf_analyze" / "configs"),
+        help="Specify the directory of customized configs.",
+    )
+    my_parser.add_argument("-n", "--normal-unit", dest="normal_unit", default="per_wave")
+    my_parser.add_argument("-t", "--time-unit", dest="time_unit", default="ns")
+
+    args = my_parser.parse_args()
+
+    workloads = find_workloads(args.path)
+    if args.workloads:
+        workloads = [w for w in workloads if any(s in w for s in args.workloads)]
+    if not workloads:
+        print("Error: no workloads found under {}".format(args.path))
+        sys.exit(1)
+
+    report = {"metadata": get_metadata(), "stages": STAGES, "workloads": OrderedDict()}
+    with open(os.devnull, "w") as devnull:
+        for workload in workloads:
+            name = os.path.relpath(workload, args.path)
+            try:
+                result = bench_workload(workload, args, devnull)
+            except Exception as e:
+                # NB: some corpus workloads (e.g. roofline only) can't be analyzed
+                report["workloads"][name] = {"error": repr(e)}
+                print("{:<45} skipped: {!r}".format(name, e))
+                continue
+            report["workloads"][name] = result
+            print(
+                "{:<45} {:>8} dispatches {:>10.2f} ms".format(
+                    name, result["dispatches"], result["total_median_s"] * 1000
+                )
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Report written to {}".format(args.output))
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,165 @@
+import argparse
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+from collections import OrderedDict
+
+from benchmark_analyze_workloads import get_metadata
+
+OMNIPERF_ROOT = Path(__file__).resolve().parent.parent
+OMNIPERF_SRC = OMNIPERF_ROOT / "src"
+
+# Command lines timed by default, {workload} is a scratch copy of a test workload
+MODES = OrderedDict(
+    [
+        ("help", ["--help"]),
+        ("profile", ["profile", "--help"]),
+        ("database", ["database", "--help"]),
+        ("analyze", ["analyze", "-p", "{workload}", "-b", "2"]),
+    ]
+)
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output into {top level module: cumulative seconds}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented, only keep the top level ones
+        if name.startswith(" ") and not name.startswith("  "):
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def run_mode(argv):
+    env = dict(os.environ, PYTHONPATH=str(OMNIPERF_SRC))
+    start = time.perf_counter()
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", str(OMNIPERF_SRC / "omniperf")] + argv,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=env,
+        cwd=str(OMNIPERF_ROOT),
+    )
+    wall = time.perf_counter() - start
+    return wall, parse_importtime(p.stderr.decode("utf-8"))
+
+
+def bench_mode(argv, repeat, top):
+    walls = []
+    imports = []
+    for _ in range(repeat):
+        wall, modules = run_mode(argv)
+        walls.append(wall)
+        imports.append(modules)
+
+    # Report the import profile of the fastest run
+    best = imports[walls.index(min(walls))]
+    heaviest = sorted(best.items(), key=lambda m: m[1], reverse=True)[:top]
+    return {
+        "wall_min_s": min(walls),
+        "wall_median_s": statistics.median(walls),
+        "import_s": sum(best.values()),
+        "modules": len(best),
+        "heaviest": OrderedDict(heaviest),
+    }
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(
+        description="Track startup and import overhead of each omniperf mode."
+    )
+    my_parser.add_argument(
+        "-m",
+        "--mode",
+        dest="modes",
+        nargs="+",
+        default=list(MODES.keys()),
+        choices=list(MODES.keys()),
+        help="Modes to time. (DEFAULT: all)",
+    )
+    my_parser.add_argument(
+        "-w",
+        "--workload",
+        default=str(OMNIPERF_ROOT / "tests" / "workloads" / "mixbench" / "mi200"),
+        help="Workload used by analyze mode. (DEFAULT: tests/workloads/mixbench/mi200)",
+    )
+    my_parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Runs per mode. (DEFAULT: 5)"
+    )
+    my_parser.add_argument(
+        "--top", type=int, default=10, help="Heaviest imports listed. (DEFAULT: 10)"
+    )
+    my_parser.add_argument(
+        "-o", "--output", dest="output", default=None, help="Write JSON report to file."
+    )
+    my_parser.add_argument(
+        "-c",
+        "--compare",
+        dest="compare",
+        default=None,
+        help="Compare against a previous JSON report.",
+    )
+    my_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Slowdown in percent flagged as regression with --compare. (DEFAULT: 10)",
+    )
+    args = my_parser.parse_args()
+
+    report = {"metadata": get_metadata(), "modes": OrderedDict()}
+    scratch = tempfile.mkdtemp(prefix="omniperf_startup_")
+    try:
+        for f in Path(args.workload).glob("*.csv"):
+            shutil.copy(str(f), scratch)
+        for mode in args.modes:
+            argv = [a.format(workload=scratch) for a in MODES[mode]]
+            result = bench_mode(argv, args.repeat, args.top)
+            report["modes"][mode] = result
+            print(
+                "{:<10} wall {:>8.1f} ms  imports {:>8.1f} ms  {}".format(
+                    mode,
+                    result["wall_min_s"] * 1000,
+                    result["import_s"] * 1000,
+                    ", ".join(list(result["heaviest"].keys())[:5]),
+                )
+            )
+    finally:
+        shutil.rmtree(scratch)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Report written to {}".format(args.output))
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = 0
+        for mode, cur in report["modes"].items():
+            if mode not in baseline["modes"]:
+                continue
+            b = baseline["modes"][mode]["import_s"]
+            delta = (cur["import_s"] - b) / b * 100 if b else 0.0
+            flag = ""
+            if delta > args.threshold:
+                regressions += 1
+                flag = " *"
+            print(
+                "{:<10} imports {:>8.1f} -> {:>8.1f} ms {:>7.1f}%{}".format(
+                    mode, b * 1000, cur["import_s"] * 1000, delta, flag
+                )
+            )
+        if regressions:
+            sys.exit(1)
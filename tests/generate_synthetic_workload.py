@@ -0,0 +1,389 @@
+import argparse
+import os
+import re
+import sys
+import glob
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+OMNIPERF_SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(OMNIPERF_SRC))
+
+from utils.perfagg import perfmon_filter, workload_shared_counters
+from utils.parallel_profile import add_shared_counters
+
+SOC_LIST = ["mi50", "mi100", "mi200"]
+
+# Per arch fields of sysinfo.csv, matching what gen_sysinfo() records
+ARCH_INFO = {
+    "mi50": {
+        "gpu_soc": "gfx906",
+        "numSE": 4,
+        "numCU": 60,
+        "maxWavesPerCU": 40,
+        "sclk": 1725,
+        "mclk": 1000,
+        "L2Banks": 16,
+        "numSQC": 15,
+    },
+    "mi100": {
+        "gpu_soc": "gfx908",
+        "numSE": 8,
+        "numCU": 120,
+        "maxWavesPerCU": 40,
+        "sclk": 1502,
+        "mclk": 1200,
+        "L2Banks": 32,
+        "numSQC": 48,
+    },
+    "mi200": {
+        "gpu_soc": "gfx90a",
+        "numSE": 8,
+        "numCU": 110,
+        "maxWavesPerCU": 32,
+        "sclk": 1700,
+        "mclk": 1600,
+        "L2Banks": 32,
+        "numSQC": 56,
+    },
+}
+
+ALL_IP_BLOCKS = ["SQ", "LDS", "SQC", "TA", "TD", "TCP", "TCC", "SPI", "CPC", "CPF"]
+
+# Leading and trailing columns rocprof writes around the counters
+BASE_COLUMNS = [
+    "Index",
+    "KernelName",
+    "gpu-id",
+    "queue-id",
+    "queue-index",
+    "pid",
+    "tid",
+    "grd",
+    "wgr",
+    "lds",
+    "scr",
+    "vgpr",
+    "sgpr",
+    "fbar",
+    "sig",
+    "obj",
+]
+TIMESTAMP_COLUMNS = ["DispatchNs", "BeginNs", "EndNs", "CompleteNs"]
+
+# Empirical roofline of a single MI200 GCD
+ROOFLINE = {
+    "HBMBw": 1406.0587,
+    "L2Bw": 4982.6411,
+    "L1Bw": 9213.6475,
+    "LDSBw": 20836.469,
+    "FP32Flops": 21046.734,
+    "FP64Flops": 20311.475,
+    "MFMABF16Flops": 170476.12,
+    "MFMAF16Flops": 164780.48,
+    "MFMAF32Flops": 41409.801,
+    "MFMAF64Flops": 41081.766,
+    "MFMAI8Ops": 166552.56,
+}
+
+# Kernel name shapes seen in real applications: runtime blits, templated
+# HIP kernels and Kokkos functors.
+KERNEL_NAME_TEMPLATES = [
+    "__amd_rocclr_{name}.kd",
+    "void {name}<{dtype}, {size}u>({dtype}*, {dtype} const*, int) [clone .kd]",
+    "void Kokkos::Impl::hip_parallel_launch_local_memory<Kokkos::Impl::ParallelFor<"
+    "{name}_functor<{dtype}>, Kokkos::RangePolicy<>, Kokkos::Experimental::HIP>, "
+    "{size}u, 1u>(Kokkos::Impl::ParallelFor<{name}_functor<{dtype}>, "
+    "Kokkos::RangePolicy<>, Kokkos::Experimental::HIP>) [clone .kd]",
+]
+DTYPES = ["float", "double", "int", "short"]
+
+
+def read_counters(perfmon_file):
+    """
+    Collect counters of all "pmc:" lines in a rocprof input file.
+    """
+    counters = []
+    with open(perfmon_file, "r") as f:
+        for line in f:
+            m = re.match(r"^pmc:(.*)", line.split("#")[0].strip())
+            if m:
+                counters += m.group(1).split()
+    return counters
+
+
+def make_kernel_names(num_kernels):
+    names = []
+    for i in range(num_kernels):
+        template = KERNEL_NAME_TEMPLATES[i % len(KERNEL_NAME_TEMPLATES)]
+        names.append(
+            template.format(
+                name="kernel_{}".format(i),
+                dtype=DTYPES[i % len(DTYPES)],
+                size=64 << (i % 5),
+            )
+        )
+    return names
+
+
+def gen_sysinfo(name, workload_dir, arch, ip_blocks, no_roof):
+    info = ARCH_INFO[arch]
+    blocks = []
+    if arch == "mi200" and not no_roof:
+        blocks.append("roofline")
+    blocks += ip_blocks if ip_blocks else ALL_IP_BLOCKS
+
+    sysinfo = {
+        "workload_name": name,
+        "command": "synthetic",
+        "host_name": "synthetic",
+        "host_cpu": "synthetic",
+        "host_distro": "synthetic",
+        "host_kernel": "synthetic",
+        "host_rocmver": "5.2.0",
+        "date": "synthetic",
+        "gpu_soc": info["gpu_soc"],
+        "numSE": info["numSE"],
+        "numCU": info["numCU"],
+        "numSIMD": 4,
+        "waveSize": 64,
+        "maxWavesPerCU": info["maxWavesPerCU"],
+        "maxWorkgroupSize": 1024,
+        "L1": 16,
+        "L2": 8192,
+        "sclk": info["sclk"],
+        "mclk": info["mclk"],
+        "cur_sclk": info["sclk"],
+        "cur_mclk": info["mclk"],
+        "L2Banks": info["L2Banks"],
+        "name": arch,
+        "numSQC": info["numSQC"],
+        "hbmBW": info["mclk"] / 1000 * 4096 / 8 * 2,
+        "ip_blocks": "|".join(blocks),
+    }
+    pd.DataFrame([sysinfo]).to_csv(os.path.join(workload_dir, "sysinfo.csv"), index=False)
+
+
+def gen_roofline(workload_dir, num_gpus):
+    df = pd.DataFrame([ROOFLINE] * num_gpus)
+    df.insert(0, "device", range(num_gpus))
+    df.to_csv(os.path.join(workload_dir, "roofline.csv"), index=False)
+
+
+class DispatchGenerator:
+    """
+    Draw dispatches chunk by chunk, so memory stays bounded for 10^7 dispatches.
+    Kernel popularity follows a Zipf-like law and every kernel has its own
+    duration and counter magnitude.
+    """
+
+    def __init__(self, num_kernels, num_gpus, seed):
+        self.rng = np.random.default_rng(seed)
+        self.kernel_names = np.array(make_kernel_names(num_kernels), dtype=object)
+        weights = 1.0 / np.arange(1, num_kernels + 1)
+        self.kernel_prob = weights / weights.sum()
+        self.kernel_duration = self.rng.lognormal(mean=10, sigma=1.5, size=num_kernels)
+        self.kernel_scale = self.rng.lognormal(mean=12, sigma=2, size=num_kernels)
+        self.num_gpus = num_gpus
+        self.next_index = 0
+        self.clock = np.full(num_gpus, 10**13, dtype=np.int64)
+
+    def base(self, n):
+        rng = self.rng
+        kernel = rng.choice(len(self.kernel_names), size=n, p=self.kernel_prob)
+        gpu = rng.integers(0, self.num_gpus, size=n)
+
+        duration = (self.kernel_duration[kernel] * rng.uniform(0.8, 1.2, n)).astype(
+            np.int64
+        ) + 1
+        gap = rng.integers(1000, 5000, size=n)
+        begin = np.empty(n, dtype=np.int64)
+        # timestamps are monotonic per gpu
+        for g in range(self.num_gpus):
+            mask = gpu == g
+            ends = self.clock[g] + np.cumsum(duration[mask] + gap[mask])
+            begin[mask] = ends - duration[mask]
+            if ends.size:
+                self.clock[g] = ends[-1]
+
+        df = pd.DataFrame(
+            {
+                "Index": np.arange(self.next_index, self.next_index + n),
+                "KernelName": self.kernel_names[kernel],
+                "gpu-id": gpu,
+                "queue-id": 0,
+                "queue-index": np.arange(self.next_index, self.next_index + n) * 2,
+                "pid": 4242,
+                "tid": 4242,
+                "grd": 256 << (kernel % 12),
+                "wgr": 256,
+                "lds": 0,
+                "scr": 0,
+                "vgpr": 4 * (1 + kernel % 16),
+                "sgpr": 8 * (1 + kernel % 8),
+                "fbar": 4160,
+                "sig": "0x0",
+                "obj": "0x7f3a14e04280",
+            }
+        )
+        self.next_index += n
+        return (
+            df,
+            kernel,
+            {
+                "DispatchNs": begin - gap,
+                "BeginNs": begin,
+                "EndNs": begin + duration,
+                "CompleteNs": begin + duration + gap // 2,
+            },
+        )
+
+    def counters(self, kernel, columns):
+        scale = self.kernel_scale[kernel][:, None]
+        values = scale * self.rng.uniform(0.1, 1.0, (len(kernel), len(columns)))
+        return pd.DataFrame(values.astype(np.int64) + 1, columns=columns)
+
+
+def generate(
+    path,
+    name,
+    arch,
+    num_dispatches,
+    num_kernels=20,
+    num_gpus=1,
+    ip_blocks=None,
+    no_roof=False,
+    seed=0,
+    chunk_size=100000,
+):
+    """
+    Build a workload directory path/name/arch readable by omniperf analyze.
+    Returns the workload directory.
+    """
+    if arch not in SOC_LIST:
+        raise ValueError("Unsupported arch {}".format(arch))
+
+    workload_dir = os.path.join(path, name, arch)
+
+    # Use the same perfmon filtering as profile mode, so the counter columns
+    # are exactly those collected from perfmon_pub/<soc>.
+    perfmon_args = argparse.Namespace(
+        target=arch, ipblocks=list(ip_blocks) if ip_blocks else None
+    )
+    perfmon_filter(workload_dir, str(OMNIPERF_SRC / "perfmon_pub"), perfmon_args)
+
+    outputs = {}
+    for perfmon_file in sorted(glob.glob(os.path.join(workload_dir, "perfmon", "*.txt"))):
+        fbase = os.path.splitext(os.path.basename(perfmon_file))[0]
+        outputs[fbase] = read_counters(perfmon_file)
+    # Counters of pmc_perf collected in level counter passes, merged as in
+    # profile mode
+    shared = workload_shared_counters(workload_dir)
+
+    gen = DispatchGenerator(num_kernels, num_gpus, seed)
+    written = 0
+    while written < num_dispatches:
+        n = min(chunk_size, num_dispatches - written)
+        base, kernel, timestamps = gen.base(n)
+        dfs = {}
+        for fbase, counters in outputs.items():
+            df = pd.concat([base, gen.counters(kernel, counters)], axis=1)
+            for col, values in timestamps.items():
+                df[col] = values
+            dfs[fbase] = df
+        if "pmc_perf" in dfs:
+            dfs["pmc_perf"] = add_shared_counters(dfs, shared)[0]
+        for fbase, df in dfs.items():
+            df.to_csv(
+                os.path.join(workload_dir, fbase + ".csv"),
+                mode="a",
+                header=(written == 0),
+                index=False,
+            )
+        written += n
+        print("{}: {}/{} dispatches".format(workload_dir, written, num_dispatches))
+
+    gen_sysinfo(name, workload_dir, arch, ip_blocks, no_roof)
+    if arch == "mi200" and not no_roof:
+        gen_roofline(workload_dir, num_gpus)
+
+    return workload_dir
+
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(
+        description="Generate a synthetic workload for scalability testing of omniperf analyze."
+    )
+
+    my_parser.add_argument(
+        "-p", "--path", dest="path", required=True, type=str, help="Specify directory."
+    )
+    my_parser.add_argument(
+        "-n", "--name", dest="name", required=True, type=str, help="Workload name."
+    )
+    my_parser.add_argument(
+        "-a", "--arch", dest="arch", default="mi200", choices=SOC_LIST, help="Target SoC."
+    )
+    my_parser.add_argument(
+        "-d",
+        "--dispatches",
+        dest="dispatches",
+        default=1000,
+        type=int,
+        help="Number of dispatches. (DEFAULT: 1000)",
+    )
+    my_parser.add_argument(
+        "-k",
+        "--kernels",
+        dest="kernels",
+        default=20,
+        type=int,
+        help="Number of distinct kernel names. (DEFAULT: 20)",
+    )
+    my_parser.add_argument(
+        "-g",
+        "--gpus",
+        dest="gpus",
+        default=1,
+        type=int,
+        help="Number of GPUs. (DEFAULT: 1)",
+    )
+    my_parser.add_argument(
+        "-b",
+        "--ipblocks",
+        dest="ipblocks",
+        nargs="+",
+        default=None,
+        choices=["SQ", "SQC", "TA", "TD", "TCP", "TCC", "SPI", "CPC", "CPF"],
+        help="IP block filtering, as in profile mode.",
+    )
+    my_parser.add_argument(
+        "--no-roof", action="store_true", default=False, help="Skip roofline.csv."
+    )
+    my_parser.add_argument(
+        "--seed", default=0, type=int, help="Random seed. (DEFAULT: 0)"
+    )
+    my_parser.add_argument(
+        "--chunk-size",
+        dest="chunk_size",
+        default=100000,
+        type=int,
+        help="Dispatches generated per write. (DEFAULT: 100000)",
+    )
+
+    args = my_parser.parse_args()
+
+    generate(
+        args.path,
+        args.name,
+        args.arch,
+        args.dispatches,
+        num_kernels=args.kernels,
+        num_gpus=args.gpus,
+        ip_blocks=args.ipblocks,
+        no_roof=args.no_roof,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    )
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in for rocprof, to test profile mode without a GPU.
+
+Supports "rocprof -i <input.txt> --timestamp on -o <out.csv> <app>" and the
+timestamps only run without -i. Every "pmc:" line of the input replays the
+"app" once and all passes are merged into one csv, as rocprof does. Only
+dispatches within "range:" ("N", "N:" or "N:M", M excluded) are written. Counter
+values are a deterministic function of (dispatch, counter). Set ROCPROF_STUB_LOG
+to log the device (HIP_VISIBLE_DEVICES) and counters of every replay.
+"""
+
+import os
+import re
+import sys
+import zlib
+import argparse
+
+NUM_DISPATCHES = 12
+KERNELS = [
+    "vecCopy",
+    "vecAdd [clone .kd]",
+    "void reduce<float, 256u>(float*) [clone .kd]",
+]
+
+
+def read_passes(fname):
+    passes = []
+    with open(fname, "r") as f:
+        for line in f:
+            m = re.match(r"^pmc:(.*)", line.split("#")[0].strip())
+            if m:
+                passes.append(m.group(1).split())
+    return passes
+
+
+def read_range(fname):
+    """
+    Dispatches selected by the "range:" line, as a range of indexes. Fails on
+    anything but the forms rocprof takes, e.g. a list of indexes.
+    """
+    with open(fname, "r") as f:
+        for line in f:
+            m = re.match(r"^range:(.*)", line.split("#")[0].strip())
+            if m and m.group(1).strip():
+                value = m.group(1).strip()
+                m = re.match(r"^(\d+)(:(\d*))?$", value)
+                if m is None:
+                    print("rocprof stub: invalid range: {}".format(value))
+                    sys.exit(1)
+                start = int(m.group(1))
+                if m.group(2) is None:
+                    return range(start, start + 1)
+                return range(start, int(m.group(3)) if m.group(3) else NUM_DISPATCHES)
+    return None
+
+
+def counter_value(index, counter):
+    return zlib.crc32("{}:{}".format(index, counter).encode("utf-8")) % 100000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", dest="input", default=None)
+    parser.add_argument("-o", dest="output", required=True)
+    parser.add_argument("--timestamp", default="off")
+    parser.add_argument("app", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    passes = read_passes(args.input) if args.input else [[]]
+    dispatches = read_range(args.input) if args.input else None
+    if os.environ.get("ROCPROF_STUB_FAIL") and args.input:
+        if os.environ["ROCPROF_STUB_FAIL"] in os.path.basename(args.input):
+            print("rocprof stub: failing on purpose")
+            sys.exit(1)
+
+    log = os.environ.get("ROCPROF_STUB_LOG")
+    if log:
+        with open(log, "a") as f:
+            for counters in passes:
+                f.write(
+                    "{} {}\n".format(
+                        os.environ.get("HIP_VISIBLE_DEVICES", "-"), " ".join(counters)
+                    )
+                )
+
+    counters = [c for p in passes for c in p]
+    header = [
+        "Index",
+        "KernelName",
+        "gpu-id",
+        "queue-id",
+        "queue-index",
+        "pid",
+        "tid",
+        "grd",
+        "wgr",
+        "lds",
+        "scr",
+        "vgpr",
+        "sgpr",
+        "fbar",
+        "sig",
+        "obj",
+    ]
+    header += counters
+    header += ["DispatchNs", "BeginNs", "EndNs", "CompleteNs"]
+
+    with open(args.output, "w") as f:
+        f.write(",".join(header) + "\n")
+        for i in range(NUM_DISPATCHES):
+            if dispatches is not None and i not in dispatches:
+                continue
+            begin = 1000000 + i * 10000
+            row = [
+                str(i),
+                '"{}"'.format(KERNELS[i % len(KERNELS)]),
+                "0",
+                "0",
+                str(i * 2),
+                "4242",
+                "4242",
+                "1048576",
+                "256",
+                "0",
+                "0",
+                "8",
+                "16",
+                "4160",
+                "0x0",
+                "0x7f3a14e04280",
+            ]
+            row += [str(counter_value(i, c)) for c in counters]
+            row += [str(begin - 500), str(begin), str(begin + 5000), str(begin + 6000)]
+            f.write(",".join(row) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import glob
+import shutil
+import zipfile
+from unittest.mock import patch
+import imp
+import numpy as np
+import pandas as pd
+import pytest
+
+from omniperf_analyze.utils import bundle
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+workload = "tests/workloads/SQ/mi200"
+
+
+def run_omniperf(argv):
+    with pytest.raises(SystemExit) as e:
+        with patch("sys.argv", ["omniperf"] + argv):
+            omniperf.main()
+    return e.value.code
+
+
+def test_round_trip(tmp_path):
+    fname = str(tmp_path / "SQ.omniperf.npz")
+    manifest = bundle.write_bundle(workload, fname, "1.0.0")
+    assert manifest["workload_name"] == "SQ"
+    assert manifest["gpu_soc"] == "gfx90a"
+
+    manifest, dfs = bundle.read_bundle(fname)
+    names = [os.path.basename(f)[:-4] for f in glob.glob(workload + "/*.csv")]
+    assert sorted(dfs) == sorted(names)
+    for name, df in dfs.items():
+        pd.testing.assert_frame_equal(
+            df, pd.read_csv(os.path.join(workload, name + ".csv"))
+        )
+
+    _, dfs = bundle.read_bundle(fname, ["sysinfo"])
+    assert list(dfs) == ["sysinfo"]
+
+
+def test_encode_string_dtype():
+    df = pd.read_csv(os.path.join(workload, "pmc_perf.csv"))
+    df["KernelName"] = df["KernelName"].astype("string")
+    arrays = bundle.encode_table(df, "t0")
+    # Nothing np.savez would have to pickle
+    assert all(values.dtype != object for values in arrays.values())
+
+
+def test_checksum_mismatch(tmp_path):
+    fname = str(tmp_path / "SQ.omniperf.npz")
+    bundle.write_bundle(workload, fname)
+    with np.load(fname) as store:
+        arrays = {k: store[k] for k in store.files}
+    t = [t["name"] for t in bundle.read_manifest(fname)["tables"]].index("pmc_perf")
+    arrays["t{}c0".format(t)][3] += 1
+    np.savez_compressed(fname, **arrays)
+
+    bundle.read_bundle(fname, ["sysinfo"])
+    with pytest.raises(ValueError, match="checksum mismatch in pmc_perf"):
+        bundle.read_bundle(fname)
+
+
+def test_export_analyze(tmp_path):
+    path = tmp_path / "SQ" / "mi200"
+    shutil.copytree(workload, path)
+    fname = str(tmp_path / "SQ_mi200.omniperf.npz")
+    assert run_omniperf(["export", "-p", str(path), "-o", fname]) == 0
+    assert zipfile.is_zipfile(fname)
+
+    assert (
+        run_omniperf(["analyze", "-p", str(path), "-o", str(tmp_path / "dir.txt")]) == 0
+    )
+    assert run_omniperf(["analyze", "-p", fname, "-o", str(tmp_path / "bundle.txt")]) == 0
+    # NB: analyze leaves its output file open, the last line may be unflushed
+    with open(tmp_path / "dir.txt") as a, open(tmp_path / "bundle.txt") as b:
+        assert a.read().rstrip() == b.read().rstrip()
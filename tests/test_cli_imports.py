@@ -0,0 +1,50 @@
+import sys
+import json
+import glob
+import shutil
+import subprocess
+import pytest
+
+# Run a mode in a fresh interpreter and report which heavy packages it loaded
+DRIVER = """
+import sys, json, runpy
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path("src/omniperf", run_name="__main__")
+except SystemExit:
+    pass
+print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})), file=sys.stderr)
+"""
+
+HEAVY = {"matplotlib", "pylab", "pymongo", "tqdm", "dash", "plotly"}
+
+
+def loaded_modules(argv, cwd):
+    p = subprocess.run(
+        [sys.executable, "-c", DRIVER, "omniperf"] + argv,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env={"PYTHONPATH": "src", "PATH": "/usr/bin:/bin"},
+        cwd=cwd,
+    )
+    return set(json.loads(p.stderr.decode("utf-8").strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    "argv", [["--help"], ["profile", "--help"], ["database", "--help"]]
+)
+def test_help_is_light(argv, pytestconfig):
+    modules = loaded_modules(argv, pytestconfig.rootpath)
+    assert not modules & (HEAVY | {"pandas"})
+
+
+def test_analyze_is_light(tmp_path, pytestconfig):
+    for f in glob.glob(
+        str(pytestconfig.rootpath / "tests/workloads/mixbench/mi200") + "/*.csv"
+    ):
+        shutil.copy(f, tmp_path)
+    modules = loaded_modules(
+        ["analyze", "-p", str(tmp_path), "-b", "2"], pytestconfig.rootpath
+    )
+    assert "pandas" in modules
+    assert not modules & HEAVY
@@ -0,0 +1,388 @@
+import os
+import glob
+import shutil
+import argparse
+import threading
+import pandas as pd
+import pytest
+
+import datetime
+
+from utils import csv_converter, preaggregate, remove_workload
+from omniperf_analyze.utils import kernel_name, bundle
+
+workload = "tests/workloads/SQ/mi200"
+
+
+class FakeCollection:
+    """
+    In-process stand-in for a pymongo collection.
+    """
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.docs = []
+        self.batches = []
+        self.indexes = []
+
+    def drop(self):
+        self.db.pop(self.name, None)
+        self.db.handles.pop(self.name, None)
+
+    def insert_many(self, docs, ordered=True):
+        assert not ordered
+        self.db[self.name] = self
+        self.batches.append(len(docs))
+        self.docs += docs
+
+    def rename(self, new_name, dropTarget=False):
+        assert dropTarget
+        self.drop()
+        self.name = new_name
+        self.db.handles[new_name] = self
+        self.db[new_name] = self
+
+    def create_index(self, keys):
+        if keys not in self.indexes:
+            self.indexes.append(keys)
+
+    def find(self, value={}):
+        return [d for d in self.docs if all(d[k] == v for k, v in value.items())]
+
+    def find_one(self, value={}):
+        return next(iter(self.find(value)), None)
+
+    def delete_many(self, value):
+        ((key, match),) = value.items()
+        match = match["$in"] if isinstance(match, dict) else [match]
+        self.docs = [d for d in self.docs if d[key] not in match]
+
+    def replace_one(self, value, newValue, upsert=False):
+        with self.db.lock:
+            docs = [d for d in self.docs if d["name"] != value["name"]] + [newValue]
+            self.docs = docs
+        self.db[self.name] = self
+
+
+class FakeDatabase(dict):
+    """
+    Collections only exist once written to, as in MongoDB.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handles = {}
+
+    def __missing__(self, name):
+        with self.lock:
+            return self.handles.setdefault(name, FakeCollection(self, name))
+
+    def __setitem__(self, name, collection):
+        with self.lock:
+            super().__setitem__(name, collection)
+
+    def list_collection_names(self):
+        return list(self.keys())
+
+    def command(self, name, collection=None):
+        if name == "dbStats":
+            stats = [self.command("collStats", c) for c in self]
+            return {
+                "storageSize": sum(s["storageSize"] for s in stats),
+                "indexSize": sum(s["totalIndexSize"] for s in stats),
+            }
+        assert name == "collStats"
+        indexes = ["_id_"] + [
+            "_".join(k for k, _ in keys) for keys in self[collection].indexes
+        ]
+        sizes = {index: 4096 for index in indexes}
+        return {
+            "storageSize": 1024 * len(self[collection].docs),
+            "indexSizes": sizes,
+            "totalIndexSize": sum(sizes.values()),
+        }
+
+
+class FakeClient(dict):
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def __missing__(self, name):
+        with self.lock:
+            return self.setdefault(name, FakeDatabase())
+
+    def list_database_names(self):
+        return [name for name, db in self.items() if db]
+
+    def drop_database(self, name):
+        self.pop(name, None)
+
+
+def connection_info(path):
+    return {
+        "username": "temp",
+        "password": "temp123",
+        "host": "localhost",
+        "port": "27018",
+        "workload": path,
+        "db": "omniperf_asw_SQ_mi200",
+    }
+
+
+@pytest.fixture(autouse=True)
+def name_cache(tmp_path, monkeypatch):
+    path = tmp_path / "kernel_names.json"
+    monkeypatch.setenv(kernel_name.CACHE_ENV, str(path))
+    monkeypatch.setattr(kernel_name, "_default_cache", None)
+    return path
+
+
+def test_convert_folder(tmp_path, name_cache):
+    before = set(os.listdir(workload))
+    client = FakeClient()
+    csv_converter.convert_folder(connection_info(workload), 2, client=client, jobs=3)
+
+    # No temporary copies are left behind
+    assert set(os.listdir(workload)) == before
+
+    db = client["omniperf_asw_SQ_mi200"]
+    files = glob.glob(workload + "/*.csv")
+    assert sorted(db.keys()) == sorted(
+        os.path.splitext(os.path.basename(f))[0] for f in files
+    )
+    df = pd.read_csv(workload + "/pmc_perf.csv")
+    docs = db["pmc_perf"].docs
+    assert len(docs) == len(df.index)
+    assert list(docs[0].keys()) == list(df.columns)
+    assert docs[0]["Index"] == df["Index"][0]
+    assert type(docs[0]["Index"]) is int
+    # KernelNames are shortened
+    assert docs[0]["KernelName"] == kernel_name.shorten_name(df["KernelName"][0], 2)
+    # and remembered for later imports
+    assert kernel_name.NameCache(str(name_cache)).names[(df["KernelName"][0], 2)]
+    names = client["workload_names"]["names"].docs
+    assert [d["name"] for d in names] == ["omniperf_asw_SQ_mi200"]
+    assert sorted(names[0]["collections"]) == sorted(db.keys())
+
+
+def test_indexes(capsys):
+    client = FakeClient()
+    csv_converter.convert_folder(connection_info(workload), 2, client=client)
+
+    db = client["omniperf_asw_SQ_mi200"]
+    dispatch = [[(k, 1) for k in keys] for keys in csv_converter.DISPATCH_INDEXES]
+    assert db["pmc_perf"].indexes == dispatch
+    assert db["SQ_LEVEL_WAVES"].indexes == dispatch
+    assert db["pmc_dispatch_info"].indexes == dispatch
+    assert db["sysinfo"].indexes == []
+    assert "pmc_perf                          4 indexes       16.0 KiB" in (
+        capsys.readouterr().out
+    )
+
+    # Collections imported without indexes get them on the next import
+    db["pmc_perf"].indexes = []
+    csv_converter.convert_folder(connection_info(workload), 2, client=client)
+    assert db["pmc_perf"].indexes == dispatch
+
+
+def test_reimport_changed_only(tmp_path):
+    for f in glob.glob(workload + "/*.csv"):
+        shutil.copy(f, tmp_path)
+    client = FakeClient()
+    info = connection_info(str(tmp_path))
+    csv_converter.convert_folder(info, 2, client=client)
+    db = client["omniperf_asw_SQ_mi200"]
+    before = dict(db)
+
+    # Only the edited pass is uploaded again, the removed one is dropped
+    df = pd.read_csv(tmp_path / "SQ_IFETCH_LEVEL.csv")
+    df.head(3).to_csv(tmp_path / "SQ_IFETCH_LEVEL.csv", index=False)
+    os.remove(tmp_path / "SQ_INST_LEVEL_LDS.csv")
+    csv_converter.convert_folder(info, 2, client=client)
+
+    assert len(db["SQ_IFETCH_LEVEL"].docs) == 3
+    assert db["SQ_IFETCH_LEVEL"] is not before["SQ_IFETCH_LEVEL"]
+    assert "SQ_INST_LEVEL_LDS" not in db
+    for name, collection in db.items():
+        if name != "SQ_IFETCH_LEVEL":
+            assert collection is before[name]
+    assert not [name for name in db if name.endswith(csv_converter.TEMP_SUFFIX)]
+
+    # A different kernel name level changes every collection
+    csv_converter.convert_folder(info, 3, client=client)
+    assert all(db[name] is not before[name] for name in db)
+
+
+def test_preaggregate(monkeypatch):
+    monkeypatch.setattr(preaggregate, "NORMAL_UNITS", ["per_kernel"])
+    monkeypatch.setattr(preaggregate, "TOP_KERNELS", 1)
+    client = FakeClient()
+    info = connection_info(workload)
+    csv_converter.convert_folder(info, 2, client=client, preagg=True)
+
+    db = client["omniperf_asw_SQ_mi200"]
+    docs = db["preagg_per_kernel"].docs
+    kernels = sorted(set(d["Kernel"] for d in docs))
+    assert len(kernels) == 2 and preaggregate.ALL_KERNELS in kernels
+    sol = next(d for d in docs if d["Metric ID"] == "2.1.0" and d["Kernel"] == "ALL")
+    assert sol["Metric"] == "VALU FLOPs"
+    assert isinstance(sol["Value"], float)
+    assert any(d.get("Unit") == "Instr per kernel" for d in docs)
+
+    # Up to date pre-aggregated collections are kept on re-import
+    before = db["preagg_per_kernel"]
+    csv_converter.convert_folder(info, 2, client=client, preagg=True)
+    assert db["preagg_per_kernel"] is before
+    csv_converter.convert_folder(info, 2, client=client)
+    assert "preagg_per_kernel" not in db
+
+
+def test_upload_batches():
+    df = pd.DataFrame({"Index": range(25), "Value": [1.5] * 24 + [float("nan")]})
+    db = FakeDatabase()
+    db["pmc_perf"].insert_many([{"stale": 1}], ordered=False)
+    assert csv_converter.upload_collection(db, "pmc_perf", df, batch_size=10) == 25
+    assert db["pmc_perf"].batches == [10, 10, 5]
+    assert db["pmc_perf"].docs[0] == {"Index": 0, "Value": 1.5}
+
+
+def test_read_collection_blanks(tmp_path):
+    fname = tmp_path / "pmc_perf.csv"
+    fname.write_text("Index,KernelName,Value\n0,vecCopy.kd,\n1,vecCopy.kd,2\n")
+    df = csv_converter.read_collection(str(fname), 5)
+    assert list(df["Value"]) == ["", 2.0]
+    assert list(df["KernelName"]) == ["vecCopy.kd"] * 2
+
+
+def test_import_workloads(tmp_path, capsys):
+    for soc in ["mi100", "mi200"]:
+        shutil.copytree("tests/workloads/SQ/" + soc, tmp_path / "nightly" / soc)
+    # A workload that failed to profile
+    broken = tmp_path / "nightly" / "broken"
+    broken.mkdir()
+    shutil.copy(workload + "/sysinfo.csv", broken)
+
+    assert csv_converter.find_workloads(str(tmp_path)) == [
+        str(broken),
+        str(tmp_path / "nightly" / "mi100"),
+        str(tmp_path / "nightly" / "mi200"),
+    ]
+    assert csv_converter.find_workloads(str(tmp_path / "*" / "mi*")) == [
+        str(tmp_path / "nightly" / "mi100"),
+        str(tmp_path / "nightly" / "mi200"),
+    ]
+
+    args = argparse.Namespace(
+        workload=str(tmp_path),
+        team="asw",
+        host="localhost",
+        port=27018,
+        username="temp",
+        password="temp123",
+        kernelVerbose=2,
+        preaggregate=False,
+    )
+    client = FakeClient()
+    workloads = csv_converter.find_workloads(str(tmp_path))
+    assert csv_converter.import_workloads(args, workloads, client=client) == 1
+
+    names = [d["name"] for d in client["workload_names"]["names"].docs]
+    assert sorted(names) == ["omniperf_asw_SQ_mi100", "omniperf_asw_SQ_mi200"]
+    assert len(client["omniperf_asw_SQ_mi100"]["pmc_perf"].docs) > 0
+    out = capsys.readouterr().out
+    assert "Skipping {}: Cannot find pmc_perf.csv".format(broken) in out
+    assert "Imported 2 of 3 workloads" in out
+
+
+def test_import_bundle(tmp_path):
+    fname = str(tmp_path / "SQ_mi200" / ("SQ_mi200" + bundle.BUNDLE_SUFFIX))
+    os.mkdir(tmp_path / "SQ_mi200")
+    bundle.write_bundle(workload, fname)
+    assert csv_converter.find_workloads(str(tmp_path)) == [fname]
+    assert csv_converter.check_workload(fname, "asw") == ("omniperf_asw_SQ_mi200", None)
+
+    from_dir = FakeClient()
+    csv_converter.convert_folder(connection_info(workload), 2, client=from_dir)
+    from_bundle = FakeClient()
+    csv_converter.convert_folder(connection_info(fname), 2, client=from_bundle)
+
+    expected = from_dir["omniperf_asw_SQ_mi200"]
+    db = from_bundle["omniperf_asw_SQ_mi200"]
+    assert sorted(db) == sorted(expected)
+    for name in db:
+        assert db[name].docs == expected[name].docs
+
+
+def remove_args(workload, team=None, older_than=None, dry_run=False):
+    return argparse.Namespace(
+        workload=workload, team=team, older_than=older_than, dry_run=dry_run
+    )
+
+
+def test_remove_workloads(tmp_path, capsys):
+    client = FakeClient()
+    for team, name in [("asw", "SQ"), ("asw", "TCP"), ("hpc", "SQ")]:
+        info = connection_info(workload)
+        info["db"] = "omniperf_{}_{}_mi200".format(team, name)
+        csv_converter.convert_folder(info, 5, client=client, quiet=True)
+    names = client["workload_names"]["names"]
+    old = names.find_one({"name": "omniperf_asw_TCP_mi200"})
+    old["imported"] -= datetime.timedelta(days=40)
+
+    # Nothing is dropped on a dry run
+    remove_workload.remove_workload(remove_args("*", dry_run=True), client)
+    assert len(client.list_database_names()) == 4
+
+    remove_workload.remove_workload(remove_args("*", "asw", older_than=30), client)
+    assert "omniperf_asw_TCP_mi200" not in client.list_database_names()
+    assert "omniperf_asw_SQ_mi200" in client.list_database_names()
+
+    reclaimed = remove_workload.remove_workload(remove_args("omniperf_*_SQ_*"), client)
+    assert client.list_database_names() == ["workload_names"]
+    assert names.find() == []
+    assert reclaimed > 0
+    assert "Removed 2 workloads" in capsys.readouterr().out
+
+
+def test_collect_garbage():
+    client = FakeClient()
+    info = connection_info(workload)
+    csv_converter.convert_folder(info, 5, client=client, quiet=True)
+    db = client[info["db"]]
+    db["preagg_stale"].insert_many([{"Kernel": "k"}], ordered=False)
+    db["pmc_perf" + csv_converter.TEMP_SUFFIX].insert_many([{"Index": 0}], ordered=False)
+    client["workload_names"]["names"].replace_one(
+        {"name": "omniperf_asw_gone_mi200"}, {"name": "omniperf_asw_gone_mi200"}
+    )
+
+    removed, reclaimed = remove_workload.collect_garbage(client)
+    assert removed == 3
+    assert reclaimed == 2 * (1024 + 4096)
+    assert "preagg_stale" not in db.list_collection_names()
+    assert "pmc_perf" in db.list_collection_names()
+    assert len(client["workload_names"]["names"].find()) == 1
+
+
+def test_collect_garbage_importing():
+    client = FakeClient()
+    info = connection_info(workload)
+    csv_converter.convert_folder(info, 5, client=client, quiet=True)
+    names = client["workload_names"]["names"]
+    entry = names.find_one({"name": info["db"]})
+    assert "importing" not in entry
+
+    # Another user re-imports the workload: not yet renamed, nor listed
+    db = client[info["db"]]
+    db["preagg_new"].insert_many([{"Kernel": "k"}], ordered=False)
+    db["pmc_perf" + csv_converter.TEMP_SUFFIX].insert_many([{"Index": 0}], ordered=False)
+    started = datetime.datetime(2026, 1, 1)
+    names.replace_one({"name": info["db"]}, dict(entry, importing=started))
+    assert remove_workload.collect_garbage(client, now=started) == (0, 0)
+    assert "preagg_new" in db.list_collection_names()
+
+    # An import that died long ago is collected
+    later = started + remove_workload.IMPORT_GRACE
+    removed, reclaimed = remove_workload.collect_garbage(client, now=later)
+    assert removed == 2
+    assert "preagg_new" not in db.list_collection_names()
@@ -0,0 +1,46 @@
+import pandas as pd
+
+from omniperf_analyze.utils import kernel_name, file_io
+
+workload = "tests/workloads/SQ/mi200"
+
+NAME = "void benchmark_func<HIP_vector_type<float, 2u>, 256, 8u, 0u>(HIP_vector_type<float, 2u>, HIP_vector_type<float, 2u>*) [clone .kd]"
+
+
+def test_shorten_name():
+    assert kernel_name.shorten_name(NAME, 1) == (
+        "void benchmark_func(HIP_vector_type, HIP_vector_type*) "
+    )
+    assert kernel_name.shorten_name(NAME, 2).startswith(
+        "void benchmark_func<HIP_vector_type, 256, 8u, 0u>"
+    )
+    assert kernel_name.shorten_name("__amd_rocclr_fillBuffer.kd", 2) == (
+        "__amd_rocclr_fillBuffer"
+    )
+
+
+def test_cache_persisted(tmp_path, monkeypatch):
+    path = str(tmp_path / "kernel_names.json")
+    cache = kernel_name.NameCache(path)
+    df = pd.DataFrame({"KernelName": [NAME, NAME, float("nan"), "vecCopy.kd"]})
+    df = kernel_name.kernel_name_shortener(df, 1, cache)
+    assert df["KernelName"][0] == kernel_name.shorten_name(NAME, 1)
+    assert pd.isna(df["KernelName"][2])
+    cache.save()
+
+    # A later run reuses the stored names instead of recomputing them
+    expected = {NAME: df["KernelName"][0], "vecCopy.kd": "vecCopy"}
+    monkeypatch.setattr(kernel_name, "shorten_name", None)
+    again = kernel_name.NameCache(path)
+    assert again.lookup([NAME, "vecCopy.kd"], 1) == expected
+
+
+def test_analyze_kernel_verbose(tmp_path, monkeypatch):
+    monkeypatch.setenv(kernel_name.CACHE_ENV, str(tmp_path / "kernel_names.json"))
+    monkeypatch.setattr(kernel_name, "_default_cache", None)
+    raw_pmc = file_io.create_df_pmc(workload, kernel_verbose=1)
+    names = raw_pmc[("pmc_perf", "KernelName")]
+    assert "void benchmark_func(int, int*) " in set(names)
+    assert len(names.unique()) < len(
+        pd.read_csv(workload + "/pmc_perf.csv").KernelName.unique()
+    )
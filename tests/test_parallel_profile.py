@@ -0,0 +1,94 @@
+import os
+import glob
+import shutil
+import argparse
+import subprocess
+import pytest
+import pandas as pd
+
+from utils import parallel_profile
+from utils.perfagg import perfmon_filter
+
+rocprof = os.path.abspath("tests/rocprof_stub.py")
+perfmon_dir = "src/perfmon_pub"
+
+
+def setup_workload(path, soc="mi200"):
+    workload_dir = str(path / soc)
+    perfmon_filter(
+        workload_dir, perfmon_dir, argparse.Namespace(target=soc, ipblocks=None)
+    )
+    return workload_dir
+
+
+def serial_profile(workload_dir):
+    # What run_prof does for every perfmon file
+    for fname in glob.glob(workload_dir + "/perfmon/*.txt"):
+        fbase = os.path.splitext(os.path.basename(fname))[0]
+        subprocess.run(
+            [
+                rocprof,
+                "-i",
+                fname,
+                "--timestamp",
+                "on",
+                "-o",
+                workload_dir + "/" + fbase + ".csv",
+                '"./app"',
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+
+def test_parallel_matches_serial(tmp_path, monkeypatch):
+    serial_dir = setup_workload(tmp_path / "serial")
+    serial_profile(serial_dir)
+
+    log = tmp_path / "rocprof.log"
+    monkeypatch.setenv("ROCPROF_STUB_LOG", str(log))
+    parallel_dir = setup_workload(tmp_path / "parallel")
+    parallel_profile.profile_passes(parallel_dir, ["0", "1", "2"], rocprof, "./app", 0)
+
+    serial_csvs = sorted(os.path.basename(f) for f in glob.glob(serial_dir + "/*.csv"))
+    parallel_csvs = sorted(
+        os.path.basename(f) for f in glob.glob(parallel_dir + "/*.csv")
+    )
+    assert serial_csvs == parallel_csvs
+    for f in serial_csvs:
+        pd.testing.assert_frame_equal(
+            pd.read_csv(os.path.join(serial_dir, f)),
+            pd.read_csv(os.path.join(parallel_dir, f)),
+        )
+    # Scratch pass files are gone
+    assert not os.path.exists(os.path.join(parallel_dir, parallel_profile.PASS_DIR))
+
+    # Every pass replayed once, spread over all devices
+    replays = open(log).read().splitlines()
+    pmc_passes = sum(
+        len(parallel_profile.split_passes(f, str(tmp_path)))
+        for f in glob.glob(parallel_dir + "/perfmon/*.txt")
+    )
+    assert len(replays) == pmc_passes
+    assert {r.split()[0] for r in replays} == {"0", "1", "2"}
+
+
+def test_split_keeps_filters(tmp_path):
+    fname = tmp_path / "pmc_perf.txt"
+    fname.write_text(
+        "pmc: SQ_WAVES\npmc: SQ_BUSY_CYCLES\n\ngpu:\nrange: 1:4\nkernel: vecCopy\n"
+    )
+    files = parallel_profile.split_passes(str(fname), str(tmp_path))
+    assert [os.path.basename(f) for f in files] == ["pmc_perf_0.txt", "pmc_perf_1.txt"]
+    for f in files:
+        text = open(f).read()
+        assert "range: 1:4" in text and "kernel: vecCopy" in text
+        assert text.count("pmc:") == 1
+
+
+def test_failed_pass(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROCPROF_STUB_FAIL", "SQ_LEVEL_WAVES")
+    workload_dir = setup_workload(tmp_path)
+    with pytest.raises(SystemExit) as e:
+        parallel_profile.profile_passes(workload_dir, ["0", "1"], rocprof, "./app", 0)
+    assert e.value.code == 1
@@ -0,0 +1,93 @@
+import os
+import shutil
+import glob
+import pandas as pd
+import pytest
+
+from omniperf_analyze.utils import file_io
+from utils import parallel_profile
+
+workload = "tests/workloads/SQ/mi200"
+
+
+def copy_workload(dst):
+    for f in glob.glob(workload + "/*.csv"):
+        shutil.copy(f, dst)
+    return str(dst)
+
+
+def test_join_matches_dispatches(tmp_path):
+    path = copy_workload(tmp_path)
+    expected = file_io.create_df_pmc(path)
+
+    # A level pass listing dispatches in another order, one of them lost
+    df = pd.read_csv(os.path.join(path, "SQ_LEVEL_WAVES.csv"))
+    df.drop(index=[3]).iloc[::-1].to_csv(
+        os.path.join(path, "SQ_LEVEL_WAVES.csv"), index=False
+    )
+
+    final_df, issues = file_io.join_pmc_passes(file_io.load_pmc_passes(path))
+    assert list(issues.keys()) == ["SQ_LEVEL_WAVES"]
+    assert issues["SQ_LEVEL_WAVES"]["missing"] == 1
+    assert issues["SQ_LEVEL_WAVES"]["extra"] == 0
+
+    level = final_df["SQ_LEVEL_WAVES"]
+    assert level.iloc[3].isna().all()
+    kept = level.index != 3
+    assert (level["Index"][kept] == final_df["pmc_perf"]["Index"][kept]).all()
+    assert (
+        level["SQ_LEVEL_WAVES"][kept]
+        == expected["SQ_LEVEL_WAVES"]["SQ_LEVEL_WAVES"][kept]
+    ).all()
+
+
+def test_merged_store(tmp_path):
+    path = copy_workload(tmp_path)
+    expected = file_io.create_df_pmc(path)
+
+    file_io.write_merged_pmc(path)
+    assert os.path.isfile(os.path.join(path, file_io.MERGED_PMC_FILE))
+    pd.testing.assert_frame_equal(file_io.read_merged_pmc(path), expected)
+
+    # A modified pass output makes the store stale
+    df = pd.read_csv(os.path.join(path, "pmc_perf.csv"))
+    df.to_csv(os.path.join(path, "pmc_perf.csv"), index=False, float_format="%.3f")
+    os.utime(os.path.join(path, "pmc_perf.csv"), ns=(0, 0))
+    assert file_io.read_merged_pmc(path) is None
+
+
+def test_merged_store_string_dtype(tmp_path):
+    path = copy_workload(tmp_path)
+    final_df, issues = file_io.join_pmc_passes(file_io.load_pmc_passes(path))
+    expected = final_df.copy()
+
+    # e.g. read with pd.options.future.infer_string
+    key = ("pmc_perf", "KernelName")
+    final_df[key] = final_df[key].astype("string")
+    file_io.write_pmc_store(path, final_df, ["pmc_perf"], issues)
+    merged = file_io.read_merged_pmc(path)
+    pd.testing.assert_series_equal(merged[key], expected[key])
+
+
+def test_merge_passes_reordered(tmp_path):
+    df = pd.read_csv(os.path.join(workload, "SQ_LEVEL_WAVES.csv"))
+    base = parallel_profile.BASE_COLUMNS + parallel_profile.TIMESTAMP_COLUMNS
+    df[base + ["SQ_WAVES"]].to_csv(tmp_path / "part_0.csv", index=False)
+    other = df[base + ["SQ_LEVEL_WAVES"]]
+    other.iloc[::-1].to_csv(tmp_path / "part_1.csv", index=False)
+
+    parallel_profile.merge_passes(
+        [str(tmp_path / "part_0.csv"), str(tmp_path / "part_1.csv")],
+        str(tmp_path / "merged.csv"),
+    )
+    merged = pd.read_csv(tmp_path / "merged.csv")
+    assert list(merged.columns[-6:-4]) == ["SQ_WAVES", "SQ_LEVEL_WAVES"]
+    assert (merged["SQ_LEVEL_WAVES"] == df["SQ_LEVEL_WAVES"]).all()
+
+    # A pass missing dispatches can't be merged
+    other.iloc[1:].to_csv(tmp_path / "part_1.csv", index=False)
+    with pytest.raises(SystemExit):
+        parallel_profile.merge_passes(
+            [str(tmp_path / "part_0.csv"), str(tmp_path / "part_1.csv")],
+            str(tmp_path / "merged.csv"),
+        )
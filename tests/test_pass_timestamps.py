@@ -0,0 +1,81 @@
+import os
+import argparse
+import pandas as pd
+import pytest
+import imp
+
+from utils import pass_timestamps
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+rocprof = os.path.abspath("tests/rocprof_stub.py")
+
+# Duration of dispatch 0 in each pass (the others are stable)
+DURATIONS = {"pmc_perf": 120, "pmc_sq_perf1": 100, "pmc_sq_perf2": 300}
+COUNTERS = {"pmc_perf": ["GRBM_COUNT", "SQ_WAVES"], "pmc_sq_perf1": ["SQ_BUSY_CYCLES"]}
+
+
+def write_passes(workload_dir):
+    os.makedirs(os.path.join(workload_dir, "perfmon"))
+    for fbase, duration in DURATIONS.items():
+        open(os.path.join(workload_dir, "perfmon", fbase + ".txt"), "w").close()
+        counters = COUNTERS.get(fbase, ["SQ_INSTS_VALU", "SQ_INSTS_SALU", "SQ_WAIT"])
+        df = pd.DataFrame(
+            {
+                "Index": [0, 1],
+                "KernelName": ["vecAdd", "vecCopy"],
+                "gpu-id": [0, 0],
+                **{c: [1, 2] for c in counters},
+                "BeginNs": [1000, 5000],
+                "EndNs": [1000 + duration, 5200],
+            }
+        )
+        df.to_csv(os.path.join(workload_dir, fbase + ".csv"), index=False)
+
+
+@pytest.mark.parametrize(
+    "method,duration", [("median", 120), ("min", 100), ("light", 100)]
+)
+def test_derive_timestamps(tmp_path, capsys, method, duration):
+    write_passes(str(tmp_path))
+    pass_timestamps.derive_timestamps(str(tmp_path), method)
+
+    df = pd.read_csv(tmp_path / "timestamps.csv")
+    assert list(df["Index"]) == [0, 1]
+    assert list(df["EndNs"] - df["BeginNs"]) == [duration, 200]
+    assert list(df["NumPasses"]) == [3, 3]
+    assert df["DurationCV"][0] > pass_timestamps.CV_THRESHOLD
+    assert df["DurationCV"][1] == 0
+    assert "1 of 2 dispatches vary" in capsys.readouterr().out
+
+
+def test_profile_pass_timestamps(monkeypatch, tmp_path):
+    log = tmp_path / "rocprof.log"
+    monkeypatch.setenv("ROCPROF_STUB_LOG", str(log))
+    monkeypatch.setattr(omniperf, "rocprof_cmd", rocprof, raising=False)
+    # sysinfo needs a GPU
+    monkeypatch.setattr(omniperf, "gen_sysinfo", lambda *a: None)
+
+    args = argparse.Namespace(
+        path=str(tmp_path),
+        name="stub",
+        target="mi100",
+        remaining="./app",
+        kernel=None,
+        dispatch=None,
+        ipblocks=["SQ"],
+        no_roof=True,
+        device=-1,
+        verbose=0,
+        gpus=None,
+        resume=False,
+        pass_timestamps="median",
+        sample=None,
+        stream=None,
+    )
+    omniperf.omniperf_profile(args, "test")
+
+    # No replay without counters, i.e. no timestamps pass
+    assert all(len(line.split()) > 1 for line in log.read_text().splitlines())
+    df = pd.read_csv(tmp_path / "stub" / "mi100" / "pmc_perf.csv")
+    assert (df["EndNs"] - df["BeginNs"] == 5000).all()
@@ -0,0 +1,239 @@
+import os
+import re
+import glob
+import zlib
+import argparse
+from collections import Counter
+import pandas as pd
+import pytest
+import imp
+
+from utils import perfagg
+from utils.rocprof_input import RocprofInput
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+perfmon_dir = "src/perfmon_pub"
+
+
+def read_passes(workload_dir, fbase="pmc_perf"):
+    passes = []
+    with open(workload_dir + "/perfmon/" + fbase + ".txt", "r") as f:
+        for line in f:
+            m = re.match(r"^pmc:(.*)", line)
+            if m:
+                passes.append(m.group(1).split())
+    return passes
+
+
+def read_level_passes(workload_dir):
+    levels = {}
+    for fname in glob.glob(workload_dir + "/perfmon/*.txt"):
+        fbase = os.path.splitext(os.path.basename(fname))[0]
+        if fbase != "pmc_perf":
+            levels[fbase] = read_passes(workload_dir, fbase)[0]
+    return levels
+
+
+def check_limits(passes, soc):
+    for counters in passes:
+        blocks = Counter()
+        channels = Counter()
+        aggregated = 0
+        for counter in counters:
+            block = counter.split("_")[0].upper()
+            block = "SQ" if block == "SQC" else block
+            m = re.match(r"[\s\S]+\[(\d+)\]", counter)
+            if block == "TCC" and m:
+                channels[m.group(1)] += 1
+            elif block == "TCC":
+                aggregated += 1
+            else:
+                blocks[block] += 1
+        for block, n in blocks.items():
+            assert n <= perfagg.perfmon_config[soc][block]
+        for ch in range(perfagg.perfmon_config[soc]["TCC_channels"]):
+            assert aggregated + channels[str(ch)] <= perfagg.perfmon_config[soc]["TCC"]
+
+
+@pytest.mark.parametrize("soc", ["mi50", "mi100", "mi200"])
+def test_schedule_all_counters(soc, tmp_path):
+    workload_dir = str(tmp_path / "workload")
+    args = argparse.Namespace(target=soc, ipblocks=None)
+    perfagg.perfmon_filter(workload_dir, perfmon_dir, args)
+
+    passes = read_passes(workload_dir)
+    levels = read_level_passes(workload_dir)
+    check_limits(passes + list(levels.values()), soc)
+
+    # Every coalesced counter is collected exactly once, in a counter pass or
+    # in the free slots of a level counter pass
+    scheduled = [c for counters in passes for c in counters]
+    for fbase, counters in levels.items():
+        i = counters.index("SQ_ACCUM_PREV_HIRES")
+        assert counters[i - 1] == fbase
+        assert counters.count("SQ_ACCUM_PREV_HIRES") == 1
+        assert len(counters) == len(set(counters))
+        scheduled += counters[i + 1 :]
+    assert len(scheduled) == len(set(scheduled))
+    pmc_list = perfagg.perfmon_coalesce(
+        perfagg.glob.glob(perfmon_dir + "/" + soc + "/pmc_*_perf*.txt"),
+        workload_dir,
+        soc,
+    )
+    expected = [c for key in perfagg.slot_keys(pmc_list) for c in pmc_list[key]]
+    expected += [c for ch in pmc_list["TCC2"].values() for c in ch]
+    assert sorted(scheduled) == sorted(expected)
+    assert len(passes) + len(levels) == perfagg.perfmon_lower_bound(pmc_list, soc)
+
+    # Level counter passes save counter passes
+    assert len(levels) == 5
+    separate = perfagg.perfmon_lower_bound(dict(pmc_list, LEVEL={}), soc)
+    assert len(passes) < separate
+
+
+def test_schedule_level_shared_blocks(monkeypatch, tmp_path):
+    soc = "mi200"
+    fname = tmp_path / "pmc_sq_perf.txt"
+    fname.write_text(
+        "pmc: SQ_WAVES SQ_BUSY_CYCLES TA_BUSY_max TA_BUSY_min\n"
+        "pmc: SQ_WAVES SQ_LEVEL_WAVES SQ_ACCUM_PREV_HIRES\n"
+    )
+    pmc_list = perfagg.perfmon_coalesce([str(fname)], str(tmp_path), soc)
+
+    # Both fit in the level counter pass, which collects SQ_WAVES already
+    passes, lower_bound = perfagg.perfmon_schedule(pmc_list, soc)
+    assert lower_bound == 1
+    assert passes == [
+        [
+            "SQ_WAVES",
+            "SQ_LEVEL_WAVES",
+            "SQ_ACCUM_PREV_HIRES",
+            "SQ_BUSY_CYCLES",
+            "TA_BUSY_max",
+            "TA_BUSY_min",
+        ]
+    ]
+
+    # Blocks not listed in the per-arch table get a counter pass
+    monkeypatch.setitem(perfagg.level_pass_config[soc], "shared_blocks", ["SQ"])
+    passes, lower_bound = perfagg.perfmon_schedule(pmc_list, soc)
+    assert lower_bound == 2
+    assert passes == [
+        ["SQ_BUSY_CYCLES", "TA_BUSY_max", "TA_BUSY_min"],
+        ["SQ_WAVES", "SQ_LEVEL_WAVES", "SQ_ACCUM_PREV_HIRES"],
+    ]
+
+
+def test_schedule_mixed_tcc(tmp_path):
+    soc = "mi200"
+    pmc_list = perfagg.perfmon_coalesce([], str(tmp_path), soc)
+    pmc_list["SQ"] = ["SQ_WAVES", "SQ_BUSY_CYCLES"]
+    pmc_list["TCC"] = ["TCC_HIT_sum", "TCC_MISS_sum"]
+    for ch in pmc_list["TCC2"]:
+        pmc_list["TCC2"][ch] = sorted(
+            ["TCC_EA_RDREQ[{}]".format(ch), "TCC_EA_WRREQ[{}]".format(ch)]
+        )
+
+    passes, lower_bound = perfagg.perfmon_schedule(pmc_list, soc)
+
+    # Aggregated and per-channel TCC counters share a pass: 2 + 2 slots per
+    # channel fit in a single pass of 4, where emitting them apart takes 2.
+    assert lower_bound == 1
+    assert len(passes) == 1
+    check_limits(passes, soc)
+
+    pmc_list["TCC"].append("TCC_REQ_sum")
+    passes, lower_bound = perfagg.perfmon_schedule(pmc_list, soc)
+    assert len(passes) == lower_bound == 2
+    check_limits(passes, soc)
+    # Same per-channel counter lands in the same pass for all channels
+    assert all(c.startswith("TCC_EA_RDREQ[") for c in passes[0] if "[" in c)
+
+
+def test_profile_shared_counters(monkeypatch, tmp_path):
+    log = tmp_path / "rocprof.log"
+    monkeypatch.setenv("ROCPROF_STUB_LOG", str(log))
+    monkeypatch.setattr(
+        omniperf, "rocprof_cmd", os.path.abspath("tests/rocprof_stub.py"), raising=False
+    )
+    # sysinfo needs a GPU
+    monkeypatch.setattr(omniperf, "gen_sysinfo", lambda *a: None)
+
+    args = argparse.Namespace(
+        path=str(tmp_path),
+        name="stub",
+        target="mi100",
+        remaining="./app",
+        kernel=None,
+        dispatch=None,
+        ipblocks=["SQ"],
+        no_roof=True,
+        device=-1,
+        verbose=0,
+        gpus=None,
+        resume=False,
+        pass_timestamps=None,
+        sample=None,
+        stream=None,
+    )
+    omniperf.omniperf_profile(args, "test")
+    workload_dir = str(tmp_path / "stub" / "mi100")
+
+    # Every counter of pmc_list ends up in pmc_perf.csv, as if all were
+    # collected by pmc_perf passes
+    pmc_list = perfagg.perfmon_coalesce(
+        glob.glob(perfmon_dir + "/pmc_*perf*.txt")
+        + glob.glob(perfmon_dir + "/mi100/pmc_sq_perf*.txt"),
+        workload_dir,
+        "mi100",
+    )
+    df = pd.read_csv(workload_dir + "/pmc_perf.csv")
+    for level, counters in read_level_passes(workload_dir).items():
+        level_df = pd.read_csv(workload_dir + "/" + level + ".csv")
+        assert list(level_df.columns[16:-4]) == counters
+        for counter in perfagg.shared_counters(
+            workload_dir + "/perfmon/" + level + ".txt"
+        ):
+            assert counter in df.columns
+            expected = [
+                zlib.crc32("{}:{}".format(i, counter).encode("utf-8")) % 100000
+                for i in df["Index"]
+            ]
+            assert list(df[counter]) == expected
+    for key in perfagg.slot_keys(pmc_list):
+        assert set(pmc_list[key]) <= set(df.columns)
+
+    # One replay per pass, level counter passes included
+    replays = log.read_text().splitlines()
+    npass = len(read_passes(workload_dir)) + len(read_level_passes(workload_dir))
+    assert len(replays) == npass + 1
+
+
+def test_merge_shared_counters_missing_dispatch(tmp_path, capsys):
+    workload = "tests/workloads/SQ/mi200"
+    os.makedirs(tmp_path / "perfmon")
+    RocprofInput([["SQ_WAVES", "SQ_LEVEL_WAVES", "SQ_ACCUM_PREV_HIRES"]]).write(
+        str(tmp_path / "perfmon" / "SQ_LEVEL_WAVES.txt")
+    )
+    df = pd.read_csv(workload + "/pmc_perf.csv")
+    df.drop(columns=["SQ_WAVES"]).to_csv(tmp_path / "pmc_perf.csv", index=False)
+    # The level pass lost a dispatch
+    level = pd.read_csv(workload + "/SQ_LEVEL_WAVES.csv")
+    level.drop(index=[3]).to_csv(tmp_path / "SQ_LEVEL_WAVES.csv", index=False)
+
+    omniperf.merge_shared_counters(str(tmp_path))
+    assert "1 missing" in capsys.readouterr().out
+
+    merged = pd.read_csv(tmp_path / "pmc_perf.csv")
+    assert len(merged.index) == len(df.index)
+    assert list(merged.columns[-5:]) == [
+        "SQ_WAVES",
+        "DispatchNs",
+        "BeginNs",
+        "EndNs",
+        "CompleteNs",
+    ]
+    assert merged["SQ_WAVES"].isna().tolist() == [i == 3 for i in df.index]
+    kept = df.index != 3
+    assert (merged["SQ_WAVES"][kept] == level["SQ_WAVES"][kept]).all()
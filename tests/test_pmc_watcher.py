@@ -0,0 +1,126 @@
+import os
+import json
+import shutil
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+import pytest
+import imp
+
+from omniperf_analyze.utils import file_io
+from utils import parallel_profile
+from utils.manifest import Manifest
+from utils.pmc_watcher import PmcWatcher
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+rocprof = os.path.abspath("tests/rocprof_stub.py")
+workload = "tests/workloads/SQ/mi200"
+
+
+def copy_workload(dst):
+    for f in glob.glob(workload + "/*.csv"):
+        shutil.copy(f, dst)
+    shutil.copytree(workload + "/perfmon", os.path.join(dst, "perfmon"))
+    return str(dst)
+
+
+def read_meta(path):
+    with np.load(os.path.join(path, file_io.MERGED_PMC_FILE)) as store:
+        return json.loads(str(store["meta"]))
+
+
+def test_watcher_streams_passes(tmp_path):
+    path = copy_workload(tmp_path)
+    expected = file_io.create_df_pmc(path)
+    manifest = Manifest(path, False)
+    watcher = PmcWatcher(path, manifest)
+
+    # Nothing finished yet
+    assert not watcher.poll()
+
+    # Only a level pass is done, pmc_perf.csv isn't written yet
+    shutil.move(os.path.join(path, "pmc_perf.csv"), str(tmp_path / "pmc_perf.bak"))
+    manifest.record(os.path.join(path, "SQ_LEVEL_WAVES.csv"), "key")
+    assert watcher.poll()
+    assert "pmc_perf" in read_meta(path)["pending"]
+    partial = file_io.read_merged_pmc(path)
+    assert "SQ_LEVEL_WAVES" in partial["SQ_LEVEL_WAVES"].columns
+    # Counters of pmc_perf the level pass collected are shown already
+    assert "SQ_INSTS_VALU" not in partial["pmc_perf"].columns
+    assert (partial["pmc_perf"]["SQ_WAVES"] == expected["pmc_perf"]["SQ_WAVES"]).all()
+    assert list(partial["pmc_perf"]["Index"]) == list(expected["pmc_perf"]["Index"])
+
+    # Kernel top stats are available from the streamed passes
+    file_io.create_df_kernel_top_stats(path, None, None, "ns", 10)
+    assert os.path.isfile(os.path.join(path, "pmc_kernel_top.csv"))
+
+    # Unchanged outputs aren't parsed again
+    assert not watcher.poll()
+
+    shutil.move(str(tmp_path / "pmc_perf.bak"), os.path.join(path, "pmc_perf.csv"))
+    for f in glob.glob(path + "/*.csv"):
+        if os.path.basename(f).startswith(("SQ", "pmc_perf")):
+            manifest.record(f, "key")
+    assert watcher.poll()
+    assert read_meta(path)["pending"] == []
+    streamed = file_io.read_merged_pmc(path)
+    pd.testing.assert_frame_equal(streamed[expected.columns], expected)
+
+
+def test_watcher_streams_parts(tmp_path):
+    path = copy_workload(tmp_path)
+    df = pd.read_csv(os.path.join(path, "pmc_perf.csv"))
+    os.remove(os.path.join(path, "pmc_perf.csv"))
+
+    # pmc_perf split over devices (--gpus), one of 2 parts done
+    base = parallel_profile.BASE_COLUMNS + parallel_profile.TIMESTAMP_COLUMNS
+    counters = [c for c in df.columns if c not in base]
+    pass_dir = os.path.join(path, parallel_profile.PASS_DIR)
+    os.makedirs(pass_dir)
+    for i, part in enumerate([counters[:10], counters[10:]]):
+        cols = [c for c in df.columns if c in base or c in part]
+        df[cols].to_csv(os.path.join(pass_dir, "pmc_perf_{}.csv".format(i)), index=False)
+
+    manifest = Manifest(path, False)
+    manifest.record(os.path.join(pass_dir, "pmc_perf_0.csv"), "key")
+    watcher = PmcWatcher(path, manifest)
+    assert watcher.poll()
+
+    partial = file_io.read_merged_pmc(path)
+    assert list(partial["pmc_perf"].columns) == [
+        c for c in df.columns if c in base or c in counters[:10]
+    ]
+    assert "pmc_perf" in read_meta(path)["pending"]
+
+
+def test_profile_stream(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(omniperf, "rocprof_cmd", rocprof, raising=False)
+    # sysinfo needs a GPU
+    monkeypatch.setattr(omniperf, "gen_sysinfo", lambda *a: None)
+
+    args = argparse.Namespace(
+        path=str(tmp_path),
+        name="stub",
+        target="mi100",
+        remaining="./app",
+        kernel=None,
+        dispatch=None,
+        ipblocks=["SQ"],
+        no_roof=True,
+        device=-1,
+        verbose=0,
+        gpus=None,
+        resume=False,
+        pass_timestamps=None,
+        sample=None,
+        stream=0.01,
+    )
+    omniperf.omniperf_profile(args, "test")
+    assert "Streamed" in capsys.readouterr().out
+
+    # The final store replaces the streamed one
+    workload_dir = str(tmp_path / "stub" / "mi100")
+    assert read_meta(workload_dir)["pending"] == []
+    assert file_io.read_merged_pmc(workload_dir) is not None
@@ -0,0 +1,70 @@
+import os
+from unittest.mock import patch
+import pytest
+import imp
+
+from utils import profile_plan
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+perfmon_dir = "src/perfmon_pub"
+
+
+def run_plan(argv, capsys):
+    with pytest.raises(SystemExit) as e:
+        with patch("sys.argv", ["omniperf", "profile", "-n", "plan"] + argv):
+            omniperf.main()
+    assert e.value.code == 0
+    return capsys.readouterr().out
+
+
+def test_plan_without_gpu(tmp_path, capsys):
+    out = run_plan(
+        [
+            "-p",
+            str(tmp_path / "workloads"),
+            "--plan",
+            "--target",
+            "mi200",
+            "--baseline-time",
+            "10",
+            "--",
+            "./app",
+        ],
+        capsys,
+    )
+    assert "pmc_perf.txt" in out
+    assert "+ 1 timestamps pass" in out
+    assert "+ roofline benchmark" in out
+    assert "total" in out
+    # Planning never touches the workload directory
+    assert not os.path.exists(tmp_path / "workloads")
+
+
+def test_plan_no_roof(capsys):
+    out = run_plan(["--dry-run", "--target", "mi100", "-b", "SQ", "--no-roof"], capsys)
+    assert "roofline" not in out
+    assert "Pass --baseline-time" in out
+
+
+def test_plan_pass_timestamps(capsys):
+    out = run_plan(["--plan", "--target", "mi100", "--pass-timestamps"], capsys)
+    assert "timestamps pass" not in out
+
+
+def test_estimate():
+    plan = profile_plan.build_plan("mi200", ["TA"], perfmon_dir)
+    npass = sum(len(p) for p in plan.values())
+    assert npass == len(plan["pmc_perf.txt"])
+
+    est = profile_plan.estimate(plan, 100.0, True, True)
+    assert est["pmc"] == pytest.approx(
+        npass * (100.0 * profile_plan.PMC_PASS_SLOWDOWN + profile_plan.ROCPROF_STARTUP_S)
+    )
+    assert est["roofline"] == profile_plan.ROOFLINE_S
+    assert est["total"] == pytest.approx(est["pmc"] + est["timestamps"] + est["roofline"])
+
+    # Roofline only profiling replays the app on the roofline counters alone
+    roof_plan = profile_plan.build_plan("mi200", None, perfmon_dir, roof_only=True)
+    est = profile_plan.estimate(roof_plan, 100.0, False, True)
+    assert est["timestamps"] == 0.0
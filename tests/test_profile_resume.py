@@ -0,0 +1,104 @@
+import os
+import json
+import argparse
+import subprocess
+import pytest
+import imp
+
+from utils import manifest
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+rocprof = os.path.abspath("tests/rocprof_stub.py")
+
+
+def profile_args(path, **kwargs):
+    args = argparse.Namespace(
+        path=str(path),
+        name="stub",
+        target="mi100",
+        remaining="./app",
+        kernel=None,
+        dispatch=None,
+        ipblocks=["SQ", "TA"],
+        no_roof=True,
+        device=-1,
+        verbose=0,
+        gpus=None,
+        resume=False,
+        pass_timestamps=None,
+        sample=None,
+        stream=None,
+    )
+    for k, v in kwargs.items():
+        setattr(args, k, v)
+    return args
+
+
+@pytest.fixture
+def stub_profile(monkeypatch, tmp_path):
+    """
+    Run omniperf_profile against the rocprof stub. Returns the replays done.
+    """
+    log = tmp_path / "rocprof.log"
+    monkeypatch.setenv("ROCPROF_STUB_LOG", str(log))
+    monkeypatch.setattr(omniperf, "rocprof_cmd", rocprof, raising=False)
+    # sysinfo needs a GPU
+    monkeypatch.setattr(omniperf, "gen_sysinfo", lambda *a: None)
+
+    def run(args):
+        if log.exists():
+            log.unlink()
+        omniperf.omniperf_profile(args, "test")
+        return log.read_text().splitlines() if log.exists() else []
+
+    return run
+
+
+@pytest.mark.parametrize("gpus", [None, ["0", "1"]])
+def test_resume(stub_profile, monkeypatch, tmp_path, gpus):
+    workload_dir = tmp_path / "stub" / "mi100"
+
+    full = stub_profile(profile_args(tmp_path / "full", gpus=gpus))
+
+    # 1st run is preempted on a level counter pass
+    monkeypatch.setenv("ROCPROF_STUB_FAIL", "SQ_LEVEL_WAVES")
+    with pytest.raises((subprocess.CalledProcessError, SystemExit)):
+        stub_profile(profile_args(tmp_path, gpus=gpus))
+    replays = (tmp_path / "rocprof.log").read_text().splitlines()
+    done = json.load(open(workload_dir / manifest.MANIFEST_FILE))
+    assert "SQ_LEVEL_WAVES.csv" not in done
+
+    # Resuming only replays what's missing
+    monkeypatch.delenv("ROCPROF_STUB_FAIL")
+    resumed = stub_profile(profile_args(tmp_path, gpus=gpus, resume=True))
+    assert any("SQ_LEVEL_WAVES" in r for r in resumed)
+    assert len(replays) + len(resumed) == len(full)
+    assert (workload_dir / "SQ_LEVEL_WAVES.csv").exists()
+    assert (
+        open(workload_dir / "pmc_perf.csv").read()
+        == open(tmp_path / "full" / "stub" / "mi100" / "pmc_perf.csv").read()
+    )
+    assert (workload_dir / "timestamps.csv").exists()
+
+    # Everything is complete now
+    assert stub_profile(profile_args(tmp_path, gpus=gpus, resume=True)) == []
+
+
+def test_resume_invalid_output(stub_profile, tmp_path):
+    workload_dir = tmp_path / "stub" / "mi100"
+    stub_profile(profile_args(tmp_path))
+
+    # A truncated output is profiled again
+    with open(workload_dir / "SQ_IFETCH_LEVEL.csv", "w") as f:
+        f.write("Index\n")
+    replays = stub_profile(profile_args(tmp_path, resume=True))
+    assert len(replays) == 1 and "SQ_IFETCH_LEVEL" in replays[0]
+
+    # A changed pass selection invalidates the counter passes
+    replays = stub_profile(profile_args(tmp_path, resume=True, ipblocks=["SQ"]))
+    assert replays
+
+    # Without --resume everything is profiled again
+    replays = stub_profile(profile_args(tmp_path, ipblocks=["SQ"]))
+    assert len(replays) > 1
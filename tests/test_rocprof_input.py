@@ -0,0 +1,70 @@
+import glob
+import argparse
+
+from utils import perfagg
+from utils.rocprof_input import RocprofInput
+
+perfmon_dir = "src/perfmon_pub"
+
+
+def test_format_and_read(tmp_path):
+    fname = str(tmp_path / "input.txt")
+    RocprofInput(
+        [["SQ_WAVES", "GRBM_COUNT"], ["TA_BUSY_max"]],
+        range=["0", "3"],
+        kernel=["vecAdd", "void reduce<float, 256u>(float*)"],
+    ).write(fname)
+
+    with open(fname, "r") as f:
+        assert f.read() == (
+            "pmc: SQ_WAVES GRBM_COUNT\n"
+            "pmc: TA_BUSY_max\n"
+            "\n"
+            "gpu:\n"
+            "range: 0,3\n"
+            "kernel: vecAdd,void reduce<float, 256u>(float*)\n"
+        )
+
+    rocprof_input = RocprofInput.read(fname)
+    assert rocprof_input.passes == [["SQ_WAVES", "GRBM_COUNT"], ["TA_BUSY_max"]]
+    assert rocprof_input.gpu is None
+    assert rocprof_input.range == ["0", "3"]
+    assert rocprof_input.kernel == ["vecAdd", "void reduce<float, 256u>(float*)"]
+    assert [p.passes for p in rocprof_input.split()] == [
+        [["SQ_WAVES", "GRBM_COUNT"]],
+        [["TA_BUSY_max"]],
+    ]
+    assert all(p.kernel == rocprof_input.kernel for p in rocprof_input.split())
+
+    # Writing back what was read leaves the file unchanged
+    with open(fname, "r") as f:
+        expected = f.read()
+    rocprof_input.write(fname)
+    with open(fname, "r") as f:
+        assert f.read() == expected
+
+
+def test_perfmon_filters(tmp_path):
+    workload_dir = str(tmp_path / "workload")
+    args = argparse.Namespace(
+        target="mi200", ipblocks=["SQ"], kernel=["vecAdd"], dispatch=["1", "2"]
+    )
+    perfagg.perfmon_filter(workload_dir, perfmon_dir, args)
+
+    fnames = glob.glob(workload_dir + "/perfmon/*.txt")
+    assert len(fnames) > 1
+    for fname in fnames:
+        rocprof_input = RocprofInput.read(fname)
+        assert rocprof_input.passes
+        assert rocprof_input.kernel == ["vecAdd"]
+        assert rocprof_input.range == ["1", "2"]
+
+
+def test_roofline_filters(tmp_path):
+    perfagg.pmc_filter(str(tmp_path), perfmon_dir, "mi200", {"gpu": ["0"]})
+    perfagg.pmc_filter(str(tmp_path), perfmon_dir, "mi200", {"gpu": ["1"]})
+
+    rocprof_input = RocprofInput.read(str(tmp_path / "perfmon" / "pmc_perf.txt"))
+    assert rocprof_input.passes
+    assert rocprof_input.gpu == ["1"]
+    assert rocprof_input.kernel is None
@@ -0,0 +1,41 @@
+import os
+import shutil
+import glob
+import pytest
+
+from utils import roofline_batch
+
+workload = "tests/workloads/roof_only_TCP/mi200"
+
+
+def copy_workload(dst):
+    for f in glob.glob(workload + "/*.csv"):
+        shutil.copy(f, dst)
+    return str(dst)
+
+
+def test_batch_roof_all_mem_levels(tmp_path):
+    path = copy_workload(tmp_path)
+    outputs = roofline_batch.batch_roof(path, dtypes=["FP32"], fmt="png", num_jobs=2)
+    assert len(outputs) == len(roofline_batch.SUPPORTED_MEM_LEVELS)
+    for output in outputs:
+        assert os.path.isfile(output)
+
+
+def test_batch_roof_selected_set(tmp_path):
+    path = copy_workload(tmp_path)
+    outputs = roofline_batch.batch_roof(
+        path, dtypes=["FP64", "I8"], mem_levels=["HBM", "LDS"], fmt="svg", device=0
+    )
+    assert sorted(os.path.basename(o) for o in outputs) == [
+        "empirRoof_gpu-0_FP64_HBM.svg",
+        "empirRoof_gpu-0_FP64_LDS.svg",
+        "empirRoof_gpu-0_I8_HBM.svg",
+        "empirRoof_gpu-0_I8_LDS.svg",
+    ]
+
+
+def test_batch_roof_missing_roofline(tmp_path):
+    shutil.copy(workload + "/pmc_perf.csv", tmp_path)
+    with pytest.raises(SystemExit):
+        roofline_batch.batch_roof(str(tmp_path), dtypes=["FP32"])
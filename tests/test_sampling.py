@@ -0,0 +1,145 @@
+import os
+import glob
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+import pytest
+import imp
+
+from omniperf_analyze.utils import file_io, parser
+from utils import sampling
+from utils.rocprof_input import RocprofInput
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+rocprof = os.path.abspath("tests/rocprof_stub.py")
+workload = "tests/workloads/SQ/mi200"
+
+
+def dispatches(durations):
+    names = [n for n, d in durations]
+    return pd.DataFrame(
+        {
+            "Index": range(len(durations)),
+            "KernelName": names,
+            "gpu-id": 0,
+            "BeginNs": 1000 * np.arange(len(durations)),
+            "EndNs": 1000 * np.arange(len(durations)) + [d for n, d in durations],
+        }
+    )
+
+
+def test_select_dispatches():
+    # A fast kernel with a few slow calls, and a rare kernel
+    durations = [("fast", 1000 + i % 7) for i in range(100)]
+    durations += [("fast", 100000 + i) for i in range(5)]
+    durations += [("rare", 5000 + i) for i in range(3)]
+    df = dispatches(durations)
+
+    sampled = sampling.select_dispatches(df, 10)
+    fast = sampled[sampled["KernelName"] == "fast"]
+    # 10 per kernel, plus one for the slow calls
+    assert len(fast.index) == 11
+    assert fast["Cluster"].nunique() == 2
+    # Every dispatch is accounted for once
+    assert fast["Weight"].sum() == pytest.approx(105)
+    assert list(sampled[sampled["KernelName"] == "rare"]["Weight"]) == [1.0] * 3
+    assert sampled["Index"].is_monotonic_increasing
+
+
+def test_sample_window():
+    # 3 kernels called in turn, 3000 dispatches
+    durations = [(k, 1000 + i % 5) for i in range(1000) for k in ["a", "b", "c"]]
+    df = dispatches(durations)
+
+    sampled = sampling.select_dispatches(df, 10)
+    assert len(sampled.index) == 30
+    assert sampled["Weight"].sum() == pytest.approx(3000)
+
+    # rocprof only replays the window the sample was taken from
+    start, stop = [int(i) for i in sampling.dispatch_range(sampled)[0].split(":")]
+    assert stop - start <= 30
+    assert stop - start < len(df.index) / 50
+
+
+def test_analyze_rescale(tmp_path):
+    for f in glob.glob(workload + "/*.csv"):
+        shutil.copy(f, tmp_path)
+    path = str(tmp_path)
+
+    file_io.create_df_kernel_top_stats(path, None, None, "ns", 10)
+    top = pd.read_csv(tmp_path / "pmc_kernel_top.csv")
+
+    # Each profiled dispatch stands for 3
+    df = pd.read_csv(tmp_path / "pmc_perf.csv")
+    df[["Index", "KernelName"]].assign(Cluster=0, Weight=3.0).to_csv(
+        tmp_path / file_io.SAMPLING_FILE, index=False
+    )
+    file_io.create_df_kernel_top_stats(path, None, None, "ns", 10)
+    scaled = pd.read_csv(tmp_path / "pmc_kernel_top.csv")
+    assert list(scaled["Count"]) == list(3 * top["Count"])
+    assert np.allclose(scaled["Sum(ns)"], 3 * top["Sum(ns)"])
+    assert np.allclose(scaled["Mean(ns)"], top["Mean(ns)"])
+
+    raw_pmc = file_io.create_df_pmc(path)
+    assert (raw_pmc["sampling"]["Weight"] == 3.0).all()
+
+
+def test_weighted_avg():
+    values = pd.Series([1.0, 2.0, np.nan, 10.0])
+    parser.sample_weights = pd.Series([1.0, 1.0, 5.0, 2.0])
+    try:
+        assert parser.to_avg(values) == pytest.approx((1 + 2 + 20) / 4)
+        assert parser.to_avg(values[:2]) == pytest.approx(1.5)
+    finally:
+        parser.sample_weights = None
+    assert parser.to_avg(values) == pytest.approx(13 / 3)
+
+
+def test_profile_sample(monkeypatch, tmp_path):
+    log = tmp_path / "rocprof.log"
+    monkeypatch.setenv("ROCPROF_STUB_LOG", str(log))
+    monkeypatch.setattr(omniperf, "rocprof_cmd", rocprof, raising=False)
+    # sysinfo needs a GPU
+    monkeypatch.setattr(omniperf, "gen_sysinfo", lambda *a: None)
+
+    args = argparse.Namespace(
+        path=str(tmp_path),
+        name="stub",
+        target="mi100",
+        remaining="./app",
+        kernel=None,
+        dispatch=None,
+        ipblocks=["SQ"],
+        no_roof=True,
+        device=-1,
+        verbose=0,
+        gpus=None,
+        resume=False,
+        pass_timestamps=None,
+        sample=2,
+        stream=None,
+    )
+    omniperf.omniperf_profile(args, "test")
+
+    # The timestamps pass runs first, and only once
+    replays = log.read_text().splitlines()
+    assert replays[0].split() == ["-"]
+    assert sum(len(line.split()) == 1 for line in replays) == 1
+
+    workload_dir = tmp_path / "stub" / "mi100"
+    weights = pd.read_csv(workload_dir / file_io.SAMPLING_FILE)
+    assert len(weights.index) == 6
+    assert (weights["Weight"] == 2.0).all()
+    # rocprof takes a single range, dispatches in between are dropped after
+    span = "{}:{}".format(weights["Index"].min(), weights["Index"].max() + 1)
+    for fname in glob.glob(str(workload_dir / "perfmon" / "*.txt")):
+        assert RocprofInput.read(fname).range == [span]
+    df = pd.read_csv(workload_dir / "pmc_perf.csv")
+    assert list(df["Index"]) == list(weights["Index"])
+
+    # Sampling picks dispatches itself
+    args.dispatch = ["1"]
+    with pytest.raises(SystemExit):
+        omniperf.omniperf_profile(args, "test")
@@ -0,0 +1,99 @@
+import json
+import glob
+import shutil
+from unittest.mock import patch
+import pytest
+import imp
+
+from omniperf_analyze.utils import self_profile
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+workload = "tests/workloads/mixbench/mi200"
+
+
+def test_stage_disabled_is_noop():
+    assert self_profile.get_profiler() is None
+    with self_profile.stage("a"):
+        with self_profile.stage("b"):
+            pass
+    assert self_profile.get_profiler() is None
+
+
+def test_nested_stages(tmp_path):
+    profiler = self_profile.enable()
+    try:
+        with self_profile.stage("outer"):
+            with self_profile.stage("inner"):
+                buf = bytearray(4 * 1024 * 1024)
+            del buf
+            start = profiler.now()
+            profiler.add_metric(2, "2.1.0", "VALU FLOPs", start)
+    finally:
+        assert self_profile.disable() is profiler
+
+    summary = profiler.summary()
+    assert list(summary.keys()) == ["outer", "inner"]
+    assert summary["inner"]["peak_mem_bytes"] >= 4 * 1024 * 1024
+    # The child's peak is folded into its parent's
+    assert summary["outer"]["peak_mem_bytes"] >= summary["inner"]["peak_mem_bytes"]
+    assert summary["outer"]["time_s"] >= summary["inner"]["time_s"]
+    assert "2.1.0 VALU FLOPs" in profiler.metrics
+
+    trace = tmp_path / "trace.json"
+    profiler.write_chrome_trace(str(trace))
+    events = json.load(open(trace))["traceEvents"]
+    assert {e["name"] for e in events if e["ph"] == "X"} == {
+        "outer",
+        "inner",
+        "2.1.0 VALU FLOPs",
+    }
+
+
+def test_no_reset_peak(monkeypatch, capsys):
+    # python 3.8
+    monkeypatch.delattr(self_profile.tracemalloc, "reset_peak", raising=False)
+    profiler = self_profile.enable()
+    try:
+        with self_profile.stage("a"):
+            buf = bytearray(1024 * 1024)
+        del buf
+    finally:
+        self_profile.disable()
+
+    assert not profiler.trace_memory
+    assert all("peak_mem_bytes" not in e[4] for e in profiler.events)
+    profiler.show()
+    row = [line for line in capsys.readouterr().out.splitlines() if " a " in line][0]
+    # Time, empty peak and RSS
+    assert [c.strip() for c in row.split("│")][4] == ""
+
+
+def test_analyze_profile_self(tmp_path, capsys):
+    for f in glob.glob(workload + "/*.csv"):
+        shutil.copy(f, tmp_path)
+    trace = tmp_path / "trace.json"
+    with pytest.raises(SystemExit) as e:
+        with patch(
+            "sys.argv",
+            [
+                "omniperf",
+                "analyze",
+                "--path",
+                str(tmp_path),
+                "-b",
+                "2",
+                "--profile-self",
+                str(trace),
+            ],
+        ):
+            omniperf.main()
+    assert e.value.code == 0
+    assert self_profile.get_profiler() is None
+
+    out = capsys.readouterr().out
+    for stage in ["initialize_run", "build_dfs", "create_df_pmc", "eval_metric", "tty"]:
+        assert stage in out
+
+    events = json.load(open(trace))["traceEvents"]
+    assert any(e.get("cat") == "metric" for e in events)
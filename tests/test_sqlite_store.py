@@ -0,0 +1,109 @@
+import datetime
+import argparse
+import shutil
+from unittest.mock import patch
+import imp
+import pandas as pd
+import pytest
+
+from utils import csv_converter, remove_workload, sqlite_store
+from omniperf_analyze.utils import kernel_name
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+workload = "tests/workloads/SQ/mi200"
+
+
+@pytest.fixture(autouse=True)
+def name_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(kernel_name.CACHE_ENV, str(tmp_path / "kernel_names.json"))
+    monkeypatch.setattr(kernel_name, "_default_cache", None)
+
+
+def run_omniperf(argv):
+    with pytest.raises(SystemExit) as e:
+        with patch("sys.argv", ["omniperf"] + argv):
+            omniperf.main()
+    return e.value.code
+
+
+def store_info(store, path=workload, db="omniperf_asw_SQ_mi200"):
+    return {"workload": path, "db": db, "sqlite": str(store)}
+
+
+def test_import(tmp_path):
+    store = tmp_path / "omniperf_asw.db"
+    info = store_info(store)
+    client = csv_converter.connect(info)
+    added, unchanged, index_size = csv_converter.convert_folder(info, 5, client=client)
+    assert (added, unchanged) == (10, 0)
+    assert index_size > 0
+    assert sqlite_store.is_store(str(store))
+
+    db = client["omniperf_asw_SQ_mi200"]
+    assert sorted(db["pmc_perf"].indexes()) == sorted(csv_converter.DISPATCH_INDEXES)
+    assert db["sysinfo"].indexes() == []
+    pd.testing.assert_frame_equal(
+        db["pmc_perf"].to_frame(),
+        csv_converter.read_collection(workload + "/pmc_perf.csv", 5),
+        check_dtype=False,
+    )
+
+    entry = client["workload_names"]["names"].find_one()
+    assert entry["name"] == "omniperf_asw_SQ_mi200"
+    assert "pmc_perf" in entry["collections"]
+    assert isinstance(entry["imported"], datetime.datetime)
+
+    # A new client on the same file sees the same content
+    client = csv_converter.connect(info)
+    assert csv_converter.convert_folder(info, 5, client=client)[:2] == (0, 10)
+
+
+def test_remove(tmp_path):
+    store = tmp_path / "omniperf_asw.db"
+    for db in ["omniperf_asw_SQ_mi200", "omniperf_hpc_SQ_mi200"]:
+        csv_converter.convert_folder(store_info(store, db=db), 5, quiet=True)
+
+    args = argparse.Namespace(
+        host=None,
+        port=27018,
+        username=None,
+        workload="*",
+        team="asw",
+        older_than=None,
+        dry_run=False,
+        sqlite=str(store),
+    )
+    assert remove_workload.remove_workload(args) > 0
+    client = sqlite_store.StoreClient(str(store))
+    assert client.list_database_names() == ["omniperf_hpc_SQ_mi200", "workload_names"]
+
+
+def test_import_analyze(tmp_path):
+    path = tmp_path / "SQ" / "mi200"
+    shutil.copytree(workload, path)
+    store = str(tmp_path / "omniperf_asw.db")
+    argv = ["database", "--import", "--sqlite", store, "-t", "asw", "-k", "5"]
+    assert run_omniperf(argv + ["-w", str(path)]) == 0
+
+    assert (
+        run_omniperf(["analyze", "-p", str(path), "-o", str(tmp_path / "dir.txt")]) == 0
+    )
+    db_path = store + "/omniperf_asw_SQ_mi200"
+    assert run_omniperf(["analyze", "-p", db_path, "-o", str(tmp_path / "db.txt")]) == 0
+    # NB: analyze leaves its output file open, the last line may be unflushed
+    with open(tmp_path / "dir.txt") as a, open(tmp_path / "db.txt") as b:
+        assert a.read().rstrip() == b.read().rstrip()
+
+    assert sqlite_store.split_store_path(store) == (store, None)
+    assert sqlite_store.split_store_path(str(path)) is None
+
+
+def test_case_sensitive_fields(tmp_path):
+    collection = sqlite_store.StoreClient(str(tmp_path / "s.db"))["db"]["preagg_per_wave"]
+    collection.insert_many([{"Metric": "a", "Unit": "Gb"}], ordered=False)
+    collection.insert_many([{"Metric": "b", "unit": "pct"}], ordered=False)
+    collection.create_index([("unit", 1)])
+    assert collection.indexes() == [["unit"]]
+    assert collection.find({"unit": "pct"}) == [{"Metric": "b", "unit": "pct"}]
+    assert list(collection.to_frame().columns) == ["Metric", "Unit", "unit"]
@@ -0,0 +1,63 @@
+import os
+import pytest
+from unittest.mock import patch
+import imp
+
+from tests import generate_synthetic_workload
+from utils import perfagg
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+
+def test_generate_columns(tmp_path):
+    workload = generate_synthetic_workload.generate(
+        str(tmp_path), "synth", "mi200", 1500, num_kernels=7, num_gpus=2, chunk_size=500
+    )
+    for f in ["pmc_perf.csv", "sysinfo.csv", "roofline.csv", "SQ_LEVEL_WAVES.csv"]:
+        assert os.path.isfile(os.path.join(workload, f))
+
+    with open(os.path.join(workload, "pmc_perf.csv")) as f:
+        header = f.readline().strip().split(",")
+        rows = sum(1 for _ in f)
+    counters = generate_synthetic_workload.read_counters(
+        os.path.join(workload, "perfmon", "pmc_perf.txt")
+    )
+    assert rows == 1500
+    assert header[16 : 16 + len(counters)] == counters
+
+    # Counters collected in level counter passes are merged as in profile mode
+    shared = perfagg.workload_shared_counters(workload)
+    assert shared
+    for fbase, level_counters in shared.items():
+        for counter in level_counters:
+            assert counter in header
+    for counter in [
+        "GRBM_GUI_ACTIVE",
+        "GRBM_COUNT",
+        "SQ_WAVES",
+        "SQ_CYCLES",
+        "SQ_INSTS_VMEM",
+        "SQ_INSTS_LDS",
+        "SQ_IFETCH",
+    ]:
+        assert counter in header
+
+
+def test_analyze_synthetic_mi100(tmp_path):
+    workload = generate_synthetic_workload.generate(
+        str(tmp_path), "synth", "mi100", 1000, num_kernels=15
+    )
+    with pytest.raises(SystemExit) as e:
+        with patch("sys.argv", ["omniperf", "analyze", "--path", workload]):
+            omniperf.main()
+    assert e.value.code == 0
+
+
+def test_analyze_synthetic_mi200(tmp_path):
+    workload = generate_synthetic_workload.generate(
+        str(tmp_path), "synth", "mi200", 1000, num_kernels=15, num_gpus=4
+    )
+    with pytest.raises(SystemExit) as e:
+        with patch("sys.argv", ["omniperf", "analyze", "--path", workload]):
+            omniperf.main()
+    assert e.value.code == 0
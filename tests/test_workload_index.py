@@ -0,0 +1,67 @@
+import os
+import shutil
+import time
+from unittest.mock import patch
+import imp
+import pytest
+
+from omniperf_analyze.utils import workload_index
+
+omniperf = imp.load_source("omniperf", "src/omniperf")
+
+workloads = ["tests/workloads/SQ/mi200", "tests/workloads/mixbench/mi200"]
+
+
+def run_omniperf(argv):
+    with pytest.raises(SystemExit) as e:
+        with patch("sys.argv", ["omniperf"] + argv):
+            omniperf.main()
+    return e.value.code
+
+
+@pytest.fixture
+def root(tmp_path):
+    for workload in workloads:
+        shutil.copytree(workload, tmp_path / "root" / workload.split("/", 2)[-1])
+    return str(tmp_path / "root")
+
+
+def test_refresh(root, tmp_path):
+    index = str(tmp_path / "index.db")
+    assert workload_index.refresh(index, [root], num_jobs=2) == (2, 0, 0, 0)
+    assert workload_index.refresh(index, [root]) == (0, 2, 0, 0)
+
+    # A profile rewritten in place is scanned again, a deleted one forgotten
+    later = time.time() + 10
+    os.utime(os.path.join(root, "SQ", "mi200", "pmc_perf.csv"), (later, later))
+    shutil.rmtree(os.path.join(root, "mixbench"))
+    assert workload_index.refresh(index, [root]) == (1, 0, 1, 0)
+    assert list(workload_index.query_kernels(index, "*")["workload_name"].unique()) == [
+        "SQ"
+    ]
+
+
+def test_query(root, tmp_path):
+    index = str(tmp_path / "index.db")
+    workload_index.refresh(index, [root])
+
+    kernels = workload_index.query_kernels(index, "*")
+    assert sorted(kernels["workload_name"].unique()) == ["SQ", "mixbench"]
+    assert (kernels["count"] > 0).all()
+    assert (kernels["sum_ns"] >= kernels["mean_ns"]).all()
+    for _, group in kernels.groupby("path"):
+        assert group["pct"].sum() == pytest.approx(100)
+    assert workload_index.query_kernels(index, "no_such_kernel*").empty
+
+    metrics = workload_index.query_metrics(index, "VALU FLOPs")
+    assert len(metrics.index) == 2
+    assert metrics["value"].notna().all()
+    assert set(metrics["gpu_soc"]) == {"gfx90a"}
+
+
+def test_index_cli(root, tmp_path, capsys):
+    index = str(tmp_path / "index.db")
+    assert run_omniperf(["index", "-p", root, "-i", index]) == 0
+    assert "2 workloads indexed" in capsys.readouterr().out
+    assert run_omniperf(["index", "-i", index, "-m", "VALU*", "-k", "*"]) == 0
+    assert "rows in" in capsys.readouterr().out